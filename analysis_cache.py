@@ -0,0 +1,155 @@
+import pickle
+import sqlite3
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Dict, Iterator, List, Optional
+from daily_flip import ANALYSIS_COLUMNS, DailyFlipReport, analyze_history_matrices
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis changes, so reports cached by older code aren't reused
+ANALYSIS_VERSION = 2
+
+# Most keys looked up in one SQLite query
+_MAX_KEYS_PER_QUERY = 500
+
+REPORT_COLUMNS = [field.name for field in fields(DailyFlipReport)]
+
+def history_fingerprints(history: Dict[str, np.ndarray]) -> List[str]:
+    """Return a content hash of each row of item x day HISTORY matrices of ANALYSIS_COLUMNS."""
+
+    rows = np.ascontiguousarray(np.stack([history[column] for column in ANALYSIS_COLUMNS], axis=1))
+
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in rows]
+
+class AnalysisCache():
+    """Memoized DailyFlipReport rows, keyed by item, history fingerprint and parameters.
+
+    Keeps up to MAX_ENTRIES reports in memory, least recently used first out,
+    and with a PATH every report in a SQLite database too, so a new process
+    only recomputes items whose history changed.
+    """
+
+    def __init__(self, max_entries: int = 50_000, path: Optional[str] = None):
+        """Initialize an empty in-memory tier over the on-disk tier at PATH, if any."""
+
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path is not None:
+            with self._connect() as connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS analysis_cache (key TEXT PRIMARY KEY, report BLOB NOT NULL)")
+
+    def __len__(self) -> int:
+        """Return number of reports in memory."""
+
+        return len(self._entries)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a new connection in a transaction."""
+
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit and miss counts, and the fraction of lookups that hit."""
+
+        lookups = self.memory_hits + self.disk_hits + self.misses
+
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else float("nan"),
+        }
+
+    def get_many(self, keys: List[str]) -> Dict[str, tuple]:
+        """Return cached reports for whichever of KEYS have one."""
+
+        found = {}
+        missing = []
+        for key in keys:
+            report = self._entries.get(key)
+            if report is None:
+                missing.append(key)
+                continue
+            self._entries.move_to_end(key)
+            found[key] = report
+        self.memory_hits += len(found)
+
+        if missing and self.path is not None:
+            from_disk = {}
+            with self._connect() as connection:
+                for start in range(0, len(missing), _MAX_KEYS_PER_QUERY):
+                    batch = missing[start:start + _MAX_KEYS_PER_QUERY]
+                    rows = connection.execute(f"SELECT key, report FROM analysis_cache WHERE key IN ({','.join('?' * len(batch))})", batch)
+                    from_disk.update((key, pickle.loads(report)) for key, report in rows)
+            self.disk_hits += len(from_disk)
+            self._remember(from_disk)
+            found.update(from_disk)
+
+        self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, reports: Dict[str, tuple]) -> None:
+        """Store REPORTS by key."""
+
+        self._remember(reports)
+        if self.path is not None and reports:
+            with self._connect() as connection:
+                connection.executemany("INSERT OR REPLACE INTO analysis_cache VALUES (?, ?)", ((key, pickle.dumps(report)) for key, report in reports.items()))
+
+    def clear(self) -> None:
+        """Remove every cached report, in memory and on disk."""
+
+        self._entries.clear()
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM analysis_cache")
+
+    def _remember(self, reports: Dict[str, tuple]) -> None:
+        """Add REPORTS to the in-memory tier, evicting the least recently used past `max_entries`."""
+
+        self._entries.update(reports)
+        for key in reports:
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+def analyze_history_matrices_cached(items: List[Item], history: Dict[str, np.ndarray], moving_average_window_size: int, cache: AnalysisCache) -> pd.DataFrame:
+    """Return `analyze_history_matrices`, reusing CACHE's reports for items whose history is unchanged."""
+
+    keys = [f"{ANALYSIS_VERSION}:{moving_average_window_size}:{item.id}:{fingerprint}" for item, fingerprint in zip(items, history_fingerprints(history))]
+    reports = cache.get_many(keys)
+
+    missing = [index for index, key in enumerate(keys) if key not in reports]
+    if missing:
+        computed = analyze_history_matrices([items[index] for index in missing], {column: matrix[missing] for column, matrix in history.items()}, moving_average_window_size)
+        computed_reports = dict(zip((keys[index] for index in missing), computed[REPORT_COLUMNS].itertuples(index=False, name=None)))
+        cache.put_many(computed_reports)
+        reports.update(computed_reports)
+    logger.debug(f"Analyzed {len(missing)} of {len(items)} items; the rest were cached")
+
+    df = pd.DataFrame([reports[key] for key in keys], columns=REPORT_COLUMNS)
+    if missing:
+        df = df.astype(computed.dtypes.to_dict())
+
+    return df
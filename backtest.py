@@ -0,0 +1,136 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from daily_flip import ANALYSIS_COLUMNS, copper_column, roi_and_max_buy_count, rolling_mean
+from flip_screener import Predicate, flip_predicates
+from outliers import rolling_outlier_counts
+from tp_profit import listing_fee, proceeds
+
+logger = logging.getLogger(__name__)
+
+# History columns a backtest replays; also pass `utc_timestamp` to label days
+BACKTEST_COLUMNS = ANALYSIS_COLUMNS + [
+    "buy_price_min",
+    "sell_price_max",
+]
+
+@dataclass
+class BacktestResult():
+    """Outcome of replaying the daily flip strategy over history."""
+
+    # One row per day: invest, pnl, bought (items with a fill), hits (of those,
+    # items that made money), cumulative_pnl and drawdown, all in copper
+    daily: pd.DataFrame
+    # Item x day realized profit in copper; 0 where nothing was bought
+    pnl: np.ndarray
+    # Item x day items bought
+    bought: np.ndarray
+    total_pnl: float
+    total_invest: float
+    # Fraction of item-days with a fill that made money
+    hit_rate: float
+    # Largest fall in cumulative profit from its running peak, in copper
+    max_drawdown: float
+
+def flip_plan_matrices(history: Dict[str, np.ndarray], moving_average_window_size: int, buy_stdevs: float = 1.0, sell_stdevs: float = 1.0, outliers: bool = True) -> Dict[str, np.ndarray]:
+    """Return item x day matrices of the DailyFlipReport columns screened on, planned from history through each day.
+
+    The same plan `analyze_history_matrices` makes from the latest day, made
+    for every day at once: buy at the moving average less BUY_STDEVS
+    standard deviations, sell at the moving average plus SELL_STDEVS, and buy
+    at most 10% of the average volume when the trade is profitable after
+    fees. Prices are whole copper, NaN where there's no plan. With
+    OUTLIERS, `outlier_count` is counted over each day's trailing two
+    windows, like the analysis does; it's most of the cost.
+    """
+
+    buy_price = np.floor(rolling_mean(history["buy_price_avg"] - (buy_stdevs * history["buy_price_stdev"]), moving_average_window_size))
+    sell_price = np.floor(rolling_mean(history["sell_price_avg"] + (sell_stdevs * history["sell_price_stdev"]), moving_average_window_size))
+    buy_volume = rolling_mean(history["buy_sold"], moving_average_window_size)
+    sell_volume = rolling_mean(history["sell_sold"], moving_average_window_size)
+    roi, max_buy_count = roi_and_max_buy_count(buy_price, sell_price, buy_volume, sell_volume)
+
+    plan = {
+        "return_on_investment": roi,
+        "max_buy_count": max_buy_count,
+        "buy_price": buy_price,
+        "sell_price": sell_price,
+        "buy_volume": buy_volume,
+        "sell_volume": sell_volume,
+    }
+    if outliers:
+        plan["outlier_count"] = rolling_outlier_counts(history["buy_price_avg"], moving_average_window_size) + \
+            rolling_outlier_counts(history["sell_price_avg"], moving_average_window_size)
+
+    return plan
+
+def backtest_daily_flips(history: Dict[str, np.ndarray], moving_average_window_size: int, buy_stdevs: float = 1.0, sell_stdevs: float = 1.0, stack_size: int = 1, predicates: Optional[List[Predicate]] = None) -> BacktestResult:
+    """Replay the daily flip strategy over item x day HISTORY matrices of BACKTEST_COLUMNS.
+
+    Each day, every item's plan comes from the days before it only, and only
+    items whose plan passes PREDICATES (default `flip_predicates()`, as
+    `flip_scan.filter_flips` screens) are traded; add e.g.
+    `Predicate("outlier_count", maximum=0)` to skip items with outliers. Buy
+    orders fill if the day's lowest buy price reached ours, up to 10% of the
+    day's `buy_sold`; listings fill if the day's highest sell price reached
+    ours, up to 10% of `sell_sold`. Sales pay the listing and exchange fees;
+    items left unsold are delisted (losing the listing fee) and sold into buy
+    orders at the day's average buy price. Plans are rounded down to whole
+    stacks of STACK_SIZE.
+    """
+
+    predicates = flip_predicates() if predicates is None else predicates
+    plan = flip_plan_matrices(history, moving_average_window_size, buy_stdevs, sell_stdevs, outliers=any(predicate.column == "outlier_count" for predicate in predicates))
+    passing = np.ones(plan["buy_price"].shape, dtype=bool)
+    for predicate in predicates:
+        passing &= predicate.passes(plan[predicate.column])
+    planned = np.where(passing, np.floor(np.nan_to_num(plan["max_buy_count"]) / stack_size) * stack_size, 0.0)
+    # Trade each day on the plan made the evening before
+    buy_price, sell_price, planned = (np.concatenate([np.full((len(matrix), 1), value), matrix[:, :-1]], axis=1) for matrix, value in [(plan["buy_price"], np.nan), (plan["sell_price"], np.nan), (planned, 0.0)])
+
+    with np.errstate(invalid="ignore"):
+        bought = np.where(history["buy_price_min"] <= buy_price, np.minimum(planned, history["buy_sold"] // 10), 0.0)
+        sold = np.where(history["sell_price_max"] >= sell_price, np.minimum(bought, history["sell_sold"] // 10), 0.0)
+    bought, sold = np.nan_to_num(bought), np.nan_to_num(sold)
+    unsold = bought - sold
+
+    invest = bought * np.nan_to_num(buy_price)
+    # Fees are rounded per item, at whole-copper prices
+    sell_copper, dump_copper = copper_column(sell_price), copper_column(history["buy_price_avg"])
+    revenue = (sold * proceeds(sell_copper)) - \
+        (unsold * listing_fee(sell_copper)) + \
+        (unsold * proceeds(dump_copper))
+    pnl = revenue - invest
+
+    daily_pnl = pnl.sum(axis=0)
+    cumulative_pnl = np.cumsum(daily_pnl)
+    drawdown = np.maximum.accumulate(np.maximum(cumulative_pnl, 0)) - cumulative_pnl
+    traded = bought > 0
+    hits = traded & (pnl > 0)
+
+    daily = pd.DataFrame({
+        "invest": invest.sum(axis=0),
+        "pnl": daily_pnl,
+        "bought": np.count_nonzero(traded, axis=0),
+        "hits": np.count_nonzero(hits, axis=0),
+        "cumulative_pnl": cumulative_pnl,
+        "drawdown": drawdown,
+    })
+    if "utc_timestamp" in history:
+        daily.index = pd.to_datetime(np.fmax.reduce(history["utc_timestamp"], axis=0), unit="s", utc=True)
+
+    trade_count = int(np.count_nonzero(traded))
+    logger.debug(f"Backtested {pnl.shape[0]} items over {pnl.shape[1]} days: {trade_count} trades, {float(daily_pnl.sum()):.0f} copper")
+
+    return BacktestResult(
+        daily=daily,
+        pnl=pnl,
+        bought=bought,
+        total_pnl=float(daily_pnl.sum()),
+        total_invest=float(invest.sum()),
+        hit_rate=float(np.count_nonzero(hits)) / trade_count if trade_count else float("nan"),
+        max_drawdown=float(drawdown.max()) if len(drawdown) else 0.0)
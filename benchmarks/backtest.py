@@ -0,0 +1,49 @@
+"""Time walk-forward backtests of the daily flip strategy.
+
+Run from the repository root:
+
+    python -m benchmarks.backtest --items 2000 --days 730
+"""
+
+import argparse
+import tempfile
+import time
+
+from backtest import BACKTEST_COLUMNS, backtest_daily_flips
+from benchmarks.synthetic import generate_dailies
+from flip_screener import Predicate, flip_predicates
+from history_store import HistoryStore
+
+moving_average_window_size = 14
+stack_size = 250
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--max-outlier-count", type=int, default=None, help="Also skip items with more outliers")
+    args = parser.parse_args()
+
+    predicates = flip_predicates()
+    if args.max_outlier_count is not None:
+        predicates.append(Predicate("outlier_count", maximum=args.max_outlier_count))
+
+    items, entries = generate_dailies(args.items, args.days)
+    with tempfile.TemporaryDirectory() as path:
+        store = HistoryStore(path)
+        store.refresh(entries)
+        del entries
+
+        start = time.perf_counter()
+        history = store.matrices(items, args.days, BACKTEST_COLUMNS + ["utc_timestamp"])
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = backtest_daily_flips(history, moving_average_window_size, stack_size=stack_size, predicates=predicates)
+        backtest_seconds = time.perf_counter() - start
+
+    print(f"{args.items} items x {args.days} days: load {load_seconds:.3f}s, backtest {backtest_seconds:.3f}s")
+    print(f"PnL {result.total_pnl:,.0f}c on {result.total_invest:,.0f}c invested, hit rate {result.hit_rate:.1%}, max drawdown {result.max_drawdown:,.0f}c")
+
+if __name__ == "__main__":
+    main()
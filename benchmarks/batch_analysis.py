@@ -0,0 +1,51 @@
+"""Compare per-item and batched daily flip analysis.
+
+Run from the repository root:
+
+    python -m benchmarks.batch_analysis --sizes 1000 10000 25000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import generate_dailies
+from daily_flip import analysis_to_daily_flip_report, analyze_daily_flip, analyze_daily_flips, daily_flip_reports_to_pandas
+
+moving_average_window_size = 14
+
+def time_per_item(items, entries, sample_size: int) -> float:
+    """Return seconds the per-item path takes for ITEMS, extrapolated from SAMPLE_SIZE items."""
+
+    sample = items[:sample_size]
+    start = time.perf_counter()
+    daily_flip_reports_to_pandas([
+        analysis_to_daily_flip_report(analyze_daily_flip(item, entries[item.id][moving_average_window_size*2*-1:], moving_average_window_size))
+        for item in sample])
+
+    return (time.perf_counter() - start) * len(items) / len(sample)
+
+def time_batch(items, entries) -> float:
+    """Return seconds the batched path takes for ITEMS."""
+
+    start = time.perf_counter()
+    analyze_daily_flips(items, entries, moving_average_window_size)
+
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 25000])
+    parser.add_argument("--days", type=int, default=moving_average_window_size*2)
+    parser.add_argument("--per-item-sample", type=int, default=1000,
+                        help="Time the per-item path on at most this many items and extrapolate")
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'per-item (s)':>14} {'batch (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        items, entries = generate_dailies(size, args.days)
+        per_item_seconds = time_per_item(items, entries, args.per_item_sample)
+        batch_seconds = time_batch(items, entries)
+        print(f"{size:>8} {per_item_seconds:>14.3f} {batch_seconds:>10.3f} {per_item_seconds / batch_seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Time the vectorized trading post fee model.
+
+Run from the repository root:
+
+    python -m benchmarks.fees --prices 10000000
+
+tests/test_tp_profit.py checks the model against a scalar reference.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from tp_profit import break_even_sell_price, copper_profit, max_buy_price, profit
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prices", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    buy_price = rng.integers(1, 1_000_000, args.prices)
+    sell_price = buy_price + rng.integers(-buy_price // 4, buy_price // 2)
+    for name, function in [
+            ("float profit (unrounded)", lambda: profit(buy_price.astype(np.float64), sell_price.astype(np.float64))),
+            ("copper_profit", lambda: copper_profit(buy_price, sell_price)),
+            ("break_even_sell_price", lambda: break_even_sell_price(buy_price)),
+            ("max_buy_price", lambda: max_buy_price(sell_price))]:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        print(f"{name:<26} {seconds:.3f}s ({seconds / args.prices * 1e9:.1f} ns per price)")
+
+    unrounded = profit(buy_price.astype(np.float64), sell_price.astype(np.float64)) > 0
+    exact = copper_profit(buy_price, sell_price) > 0
+    print(f"Profitability flips from rounding: {np.count_nonzero(unrounded != exact)} of {args.prices} pairs")
+
+if __name__ == "__main__":
+    main()
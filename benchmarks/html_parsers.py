@@ -0,0 +1,49 @@
+"""Compare gw2bltc.com search page parser backends.
+
+Run from the repository root, on saved pages or a generated ipg=200 page:
+
+    python -m benchmarks.html_parsers [page.html ...]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_search_page
+from gw2bltc_parser import PARSERS
+from item import Item
+
+def measure(parse, html: str, repeat: int) -> tuple:
+    """Return best seconds, peak traced bytes and item count for PARSE over HTML."""
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = parse(html)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(html)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(seconds), peak_bytes, len(items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="Saved search results pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = {path: open(path, encoding="utf-8").read() for path in args.pages}
+    if not pages:
+        pages["<generated ipg=200>"] = generate_search_page([Item(id=item_id, name=f"Item {item_id}") for item_id in range(1, 201)])
+
+    print(f"{'page':<24} {'parser':<8} {'items':>6} {'time (ms)':>10} {'peak (KiB)':>11}")
+    for path, html in pages.items():
+        for name, parse in PARSERS.items():
+            seconds, peak_bytes, count = measure(parse, html, args.repeat)
+            print(f"{path[-24:]:<24} {name:<8} {count:>6} {seconds * 1000:>10.2f} {peak_bytes / 1024:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Time importing each module in a fresh interpreter, and check what it drags in.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time --check
+
+Scheduled jobs and worker processes pay these costs on every start. With
+--check, exits 1 if any module imports one of its forbidden modules or
+takes longer than its budget.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must only load when first used
+LAZY_MODULES = ["requests", "bs4", "plotly", "ipywidgets", "gw2tpdb"]
+
+# Module: (measured milliseconds, budget in milliseconds, modules it must not import).
+# Measured as the median of three `--repeat 7` runs on Python 3.11.7 with
+# numpy 1.26.4 and pandas 2.2.2; budgets are about 1.45x that, enough for
+# run-to-run noise but not for a new heavy import. Re-measure when
+# dependencies change.
+BUDGETS = {
+    "item": (11, 16, ["numpy", "pandas"] + LAZY_MODULES),
+    "tp_profit": (90, 130, ["pandas"] + LAZY_MODULES),
+    "coins": (106, 150, ["pandas"] + LAZY_MODULES),
+    "daily_flip": (367, 530, LAZY_MODULES),
+    "history_store": (358, 520, LAZY_MODULES),
+    "analysis_cache": (360, 520, LAZY_MODULES),
+    "flip_portfolio": (356, 520, LAZY_MODULES),
+    "flip_screener": (338, 490, LAZY_MODULES),
+    "item_index": (95, 140, ["pandas"] + LAZY_MODULES),
+    "gw2bltc": (67, 95, ["numpy", "pandas"] + LAZY_MODULES),
+    "listings_poller": (132, 190, ["pandas"] + LAZY_MODULES),
+    "flip_chart": (378, 550, LAZY_MODULES),
+    "flip_scan": (394, 570, LAZY_MODULES),
+    "trends": (355, 510, LAZY_MODULES),
+    "run_profile": (16, 24, ["numpy", "pandas"] + LAZY_MODULES),
+}
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds)
+print(",".join(sorted(name for name in sys.modules if "." not in name)))
+"""
+
+def measure(module: str, repeat: int) -> tuple:
+    """Return (best import seconds of REPEAT fresh interpreters, top-level modules loaded) for MODULE."""
+
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], capture_output=True, text=True, check=True, cwd=os.getcwd()).stdout.splitlines()
+        times.append(float(output[0]))
+
+    return min(times), set(output[1].split(","))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="exit 1 on a forbidden import or a blown budget")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16} {'ms':>8} {'measured':>8} {'budget':>8}  forbidden imports")
+    for module, (measured_ms, budget_ms, forbidden) in BUDGETS.items():
+        seconds, loaded = measure(module, args.repeat)
+        forbidden_loaded = sorted(loaded.intersection(forbidden))
+        print(f"{module:<16} {seconds * 1000:>8.1f} {measured_ms:>8} {budget_ms:>8}  {', '.join(forbidden_loaded) or '-'}")
+        if forbidden_loaded or seconds * 1000 > budget_ms:
+            failures.append(module)
+
+    if failures:
+        print(f"Over budget or importing forbidden modules: {', '.join(failures)}")
+        if args.check:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Compare serial and multi-process daily flip analysis over a history store.
+
+Run from the repository root:
+
+    python -m benchmarks.parallel_analysis --items 50000 --workers 1 2 4 8
+"""
+
+import os
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_dailies
+from history_store import HistoryStore
+from parallel_analysis import analyze_daily_flips_in_parallel
+
+moving_average_window_size = 14
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=moving_average_window_size*2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    items, entries = generate_dailies(args.items, args.days)
+    with tempfile.TemporaryDirectory() as path:
+        HistoryStore(path).refresh(entries)
+        del entries
+
+        serial = None
+        print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            reports = analyze_daily_flips_in_parallel(items, path, moving_average_window_size, max_workers=workers, chunk_size=args.chunk_size)
+            seconds = time.perf_counter() - start
+            if serial is None:
+                serial, serial_reports = seconds, reports
+            else:
+                pd.testing.assert_frame_equal(reports, serial_reports)
+            print(f"{workers:>8} {seconds:>8.3f} {serial / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
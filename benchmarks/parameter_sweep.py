@@ -0,0 +1,43 @@
+"""Compare a parameter sweep with rerunning the analysis per configuration.
+
+Run from the repository root:
+
+    python -m benchmarks.parameter_sweep --items 10000
+"""
+
+import argparse
+import time
+
+from itertools import product
+from benchmarks.synthetic import generate_dailies
+from daily_flip import ANALYSIS_COLUMNS, analyze_history_matrices, history_to_matrices
+from parameter_sweep import sweep_daily_flips
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 14, 21, 30])
+    parser.add_argument("--stdevs", type=float, nargs="+", default=[0.5, 1.0, 1.5, 2.0, 2.5])
+    parser.add_argument("--iqr-factors", type=float, nargs="+", default=[1.5, 3.0])
+    args = parser.parse_args()
+
+    items, entries = generate_dailies(args.items, 2 * max(args.windows))
+    history = history_to_matrices(items, entries, 2 * max(args.windows), ANALYSIS_COLUMNS)
+    del entries
+
+    start = time.perf_counter()
+    results = sweep_daily_flips(history, args.windows, args.stdevs, args.stdevs, args.iqr_factors)
+    sweep_seconds = time.perf_counter() - start
+
+    # Rerunning only supports the 1-stdev offsets, so time one run per window and scale up
+    start = time.perf_counter()
+    for window_size in args.windows:
+        analyze_history_matrices(items, {column: matrix[:, -2 * window_size:] for column, matrix in history.items()}, window_size)
+    rerun_seconds = (time.perf_counter() - start) * len(results) / len(args.windows)
+
+    print(f"{len(results)} configurations over {args.items} items")
+    print(f"sweep {sweep_seconds:.3f}s, estimated rerun {rerun_seconds:.3f}s ({rerun_seconds / sweep_seconds:.1f}x)")
+    print(results.sort_values("mean_roi", ascending=False).head(10).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Time flip portfolio planning over many candidate flips.
+
+Run from the repository root:
+
+    python -m benchmarks.portfolio --sizes 1000 10000 --budgets 100 1000 10000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import generate_dailies
+from coins import Coins
+from daily_flip import analyze_daily_flips
+from flip_portfolio import plan_flip_portfolio
+
+moving_average_window_size = 14
+stack_size = 250
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[100, 1000, 10000], help="Budgets in gold")
+    parser.add_argument("--max-item-share", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'budget':>8} {'flips':>6} {'plan (ms)':>10} {'gap':>8} {'optimal':>8}")
+    for size in args.sizes:
+        items, entries = generate_dailies(size, moving_average_window_size*2)
+        flips = analyze_daily_flips(items, entries, moving_average_window_size)
+        for gold in args.budgets:
+            seconds = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                portfolio = plan_flip_portfolio(flips, Coins(gold=gold), stack_size, max_item_share=args.max_item_share)
+                seconds.append(time.perf_counter() - start)
+            gap = (portfolio.upper_bound - portfolio.profit) / portfolio.upper_bound if portfolio.upper_bound else 0.0
+            print(f"{size:>8} {gold:>7}g {len(portfolio.flips):>6} {min(seconds) * 1000:>10.1f} {gap:>8.2e} {portfolio.optimal!s:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Time the daily flip pipeline at several sizes and flag regressions against a stored baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --check        # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline
+
+Every case runs on `generate_history_columns` data with a fixed seed, and
+reports the best of --repeat runs. Results go to --output as JSON. A case
+regresses when it's slower than its baseline by more than --tolerance and
+by at least --min-seconds, so millisecond noise doesn't count. Baselines
+are only comparable on the machine that recorded them.
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+
+import numpy as np
+import pandas as pd
+
+from typing import Any, Callable, Dict, List, Tuple
+from benchmarks.synthetic import entries_from_columns, generate_history_columns
+from coins import CoinArray, Coins
+from daily_flip import ANALYSIS_COLUMNS, analysis_to_daily_flip_report, analyze_daily_flip, analyze_history_matrices
+from flip_scan import filter_flips, sort_and_format_flips
+
+moving_average_window_size = 14
+stack_size = 250
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+def best_of(function: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """Return (fewest seconds of REPEAT calls of FUNCTION, its last result)."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+def scalar_coins(flips: pd.DataFrame) -> List[str]:
+    """Return a plan line per flip, with one Coins per amount as the notebook used to."""
+
+    lines = []
+    for buy_price, sell_price, buy_stacks in zip(flips["buy_price"], flips["sell_price"], flips["buy_stacks"]):
+        total = Coins(buy_price) * stack_size * buy_stacks
+        lines.append(f"{total} -> {Coins(sell_price) * stack_size * buy_stacks - total}")
+
+    return lines
+
+def coin_array(flips: pd.DataFrame) -> List[str]:
+    """Return `scalar_coins` lines, with CoinArray arithmetic over every flip at once."""
+
+    total = CoinArray(flips["buy_price"]) * (flips["buy_stacks"].to_numpy() * stack_size)
+    gain = CoinArray(flips["sell_price"]) * (flips["buy_stacks"].to_numpy() * stack_size) - total
+
+    return [f"{total} -> {gain}" for total, gain in zip(total.format(), gain.format())]
+
+def run_cases(size: int, days: int, repeat: int, per_item_sample: int, seed: int) -> Dict[str, float]:
+    """Return seconds per case for SIZE items of DAYS days; per-item cases are extrapolated from PER_ITEM_SAMPLE items."""
+
+    items, columns = generate_history_columns(size, days, seed)
+    history = {column: columns[column].reshape(size, days) for column in ANALYSIS_COLUMNS}
+    sample = items[:per_item_sample]
+    entries = entries_from_columns({column: values[:len(sample) * days] for column, values in columns.items()})
+    scale = size / len(sample)
+
+    results = {}
+    seconds, analyses = best_of(lambda: [analyze_daily_flip(item, entries[item.id], moving_average_window_size) for item in sample], repeat)
+    results["analyze_daily_flip"] = seconds * scale
+    seconds, _ = best_of(lambda: [analysis_to_daily_flip_report(analysis) for analysis in analyses], repeat)
+    results["analysis_to_daily_flip_report"] = seconds * scale
+    results["analyze_history_matrices"], all_flips = best_of(lambda: analyze_history_matrices(items, history, moving_average_window_size), repeat)
+    results["filter_flips"], flips = best_of(lambda: filter_flips(all_flips, min_buy_count=stack_size, min_buy_price=Coins(5), min_buy_volume=stack_size*10, min_sell_volume=stack_size*10), repeat)
+    results["sort_and_format_flips"], flips = best_of(lambda: sort_and_format_flips(flips, stack_size), repeat)
+    # Coin arithmetic over every item, not just the profitable ones, to scale with SIZE
+    all_flips = sort_and_format_flips(all_flips.fillna(0), stack_size)
+    results["coins"], scalar_lines = best_of(lambda: scalar_coins(all_flips), repeat)
+    results["coin_array"], array_lines = best_of(lambda: coin_array(all_flips), repeat)
+    assert scalar_lines == array_lines
+
+    return results
+
+def environment() -> Dict[str, str]:
+    """Return what the timings depend on besides the code."""
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.platform(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 60000])
+    parser.add_argument("--days", type=int, default=moving_average_window_size*2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--per-item-sample", type=int, default=200,
+                        help="Time the per-item cases on at most this many items and extrapolate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json", help="results file (default: %(default)s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="also save the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline (default: %(default)s)")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="ignore slowdowns smaller than this (default: %(default)s)")
+    parser.add_argument("--check", action="store_true", help="exit 1 on any regression")
+    args = parser.parse_args()
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    except FileNotFoundError:
+        baseline = {}
+
+    results = {}
+    regressions = []
+    print(f"{'case':<30} {'items':>6} {'seconds':>9} {'baseline':>9} {'change':>8}")
+    for size in args.sizes:
+        for case, seconds in run_cases(size, args.days, args.repeat, min(size, args.per_item_sample), args.seed).items():
+            key = f"{case}/{size}"
+            results[key] = seconds
+            if key not in baseline:
+                print(f"{case:<30} {size:>6} {seconds:>9.4f} {'-':>9}")
+                continue
+            regressed = seconds > baseline[key] * (1 + args.tolerance) and seconds - baseline[key] >= args.min_seconds
+            if regressed:
+                regressions.append(key)
+            print(f"{case:<30} {size:>6} {seconds:>9.4f} {baseline[key]:>9.4f} {seconds / baseline[key] - 1:>+7.0%}{'  REGRESSION' if regressed else ''}")
+
+    report = {
+        "environment": environment(),
+        "parameters": {"days": args.days, "repeat": args.repeat, "per_item_sample": args.per_item_sample, "seed": args.seed},
+        "results": results,
+    }
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=1)
+            file.write("\n")
+
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
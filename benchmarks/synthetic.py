@@ -0,0 +1,154 @@
+import numpy as np
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from daily_flip import HISTORY_COLUMNS
+from item import Item
+
+# Stand-in for gw2tpdb's HistoryEntry with the same fields
+SyntheticHistoryEntry = namedtuple("SyntheticHistoryEntry", HISTORY_COLUMNS)
+
+# Entry fields the trading post API reports as whole numbers
+_INTEGER_FIELDS = {
+    "id", "buy_delisted", "buy_listed", "buy_price_max", "buy_price_min", "buy_quantity_max", "buy_quantity_min", "buy_sold", "buy_value", "count",
+    "sell_delisted", "sell_listed", "sell_price_max", "sell_price_min", "sell_quantity_max", "sell_quantity_min", "sell_sold", "sell_value",
+}
+
+def generate_history_columns(item_count: int, day_count: int, seed: int = 0, spike_rate: float = 0.01) -> Tuple[List[Item], Dict[str, np.ndarray]]:
+    """Return ITEM_COUNT items and DAY_COUNT days of made-up daily history for each, as HISTORY_COLUMNS arrays.
+
+    Rows are grouped by item, oldest first, with the dtypes of
+    `history_store.entries_to_columns`. Each item's sell price follows a
+    random walk in log space with its own drift and volatility, and an
+    occasional lasting jump; the buy price sits a per-item spread below it.
+    Volumes are log-normal around a per-item level, a little higher on
+    weekends. On SPIKE_RATE of days, prices and volume spike for just that
+    day, which the analysis should count as outliers. The same SEED always
+    gives the same history.
+    """
+
+    rng = np.random.default_rng(seed)
+    shape = (item_count, day_count)
+    items = [Item(id=item_id, name=f"Item {item_id}") for item_id in range(1, item_count + 1)]
+    timestamps = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()) + (np.arange(day_count) * 24 * 60 * 60)
+
+    volatility = np.clip(rng.lognormal(np.log(0.03), 0.5, item_count), 0.005, 0.2)
+    drift = rng.normal(0, 0.002, item_count)
+    log_returns = rng.normal(drift[:, np.newaxis], volatility[:, np.newaxis], shape)
+    log_returns += np.where(rng.random(shape) < 0.005, np.log(rng.choice([0.5, 2], shape)), 0)
+    sell_price = np.exp(rng.uniform(np.log(10), np.log(50000), item_count)[:, np.newaxis] + np.cumsum(log_returns, axis=1))
+    spread = np.clip(rng.uniform(0.7, 0.95, item_count)[:, np.newaxis] * rng.normal(1, 0.02, shape), 0.5, 0.99)
+    buy_price = sell_price * spread
+
+    # 1970-01-01 was a Thursday, so weekdays 5 and 6 are Saturday and Sunday
+    weekend = ((timestamps // (24 * 60 * 60)) + 3) % 7 >= 5
+    volume = rng.lognormal(7, 1.5, item_count)[:, np.newaxis] * rng.lognormal(0, 0.3, shape) * np.where(weekend, 1.15, 1)
+
+    spikes = rng.random(shape) < spike_rate
+    price_spike = np.where(spikes, rng.choice([0.4, 2.5], shape) * rng.uniform(0.8, 1.2, shape), 1)
+    sell_price = np.maximum(2, sell_price * price_spike)
+    buy_price = np.maximum(1, buy_price * price_spike)
+    volume = volume * np.where(spikes, rng.uniform(3, 10, shape), 1)
+
+    buy_sold = np.floor(volume * rng.uniform(0.5, 1.5, shape))
+    sell_sold = np.floor(volume * rng.uniform(0.5, 1.5, shape))
+    buy_stdev = buy_price * rng.uniform(0, 0.05, shape)
+    sell_stdev = sell_price * rng.uniform(0, 0.05, shape)
+    buy_listed = np.floor(buy_sold * rng.uniform(1, 3, shape))
+    sell_listed = np.floor(sell_sold * rng.uniform(1, 3, shape))
+
+    columns = {
+        "id": np.repeat(np.arange(1, item_count + 1, dtype=np.int64), day_count),
+        "buy_delisted": np.floor(buy_listed * 0.1),
+        "buy_listed": buy_listed,
+        "buy_price_avg": buy_price,
+        "buy_price_max": np.floor(buy_price + buy_stdev * 2),
+        "buy_price_min": np.floor(np.maximum(1, buy_price - buy_stdev * 2)),
+        "buy_price_stdev": buy_stdev,
+        "buy_quantity_avg": buy_listed * 4.0,
+        "buy_quantity_max": buy_listed * 5,
+        "buy_quantity_min": buy_listed * 3,
+        "buy_quantity_stdev": buy_listed * 0.5,
+        "buy_sold": buy_sold,
+        "buy_value": np.floor(buy_sold * buy_price),
+        "count": np.full(shape, 24.0),
+        "sell_delisted": np.floor(sell_listed * 0.1),
+        "sell_listed": sell_listed,
+        "sell_price_avg": sell_price,
+        "sell_price_max": np.floor(sell_price + sell_stdev * 2),
+        "sell_price_min": np.floor(np.maximum(1, sell_price - sell_stdev * 2)),
+        "sell_price_stdev": sell_stdev,
+        "sell_quantity_avg": sell_listed * 4.0,
+        "sell_quantity_max": sell_listed * 5,
+        "sell_quantity_min": sell_listed * 3,
+        "sell_quantity_stdev": sell_listed * 0.5,
+        "sell_sold": sell_sold,
+        "sell_value": np.floor(sell_sold * sell_price),
+        "utc_timestamp": np.tile(timestamps, item_count),
+    }
+
+    return items, {column: np.ravel(columns[column]).astype(np.int64 if column in ("id", "utc_timestamp") else np.float64) for column in HISTORY_COLUMNS}
+
+def entries_from_columns(columns: Dict[str, np.ndarray]) -> Dict[int, List[SyntheticHistoryEntry]]:
+    """Return HISTORY_COLUMNS arrays grouped by item as entries, the way `Gw2TpDb.get_dailies` does."""
+
+    day_timestamps, day_indices = np.unique(columns["utc_timestamp"], return_inverse=True)
+    days = [datetime.fromtimestamp(int(timestamp), tz=timezone.utc) for timestamp in day_timestamps]
+    values = [
+        [days[index] for index in day_indices] if column == "utc_timestamp" else
+        columns[column].astype(np.int64).tolist() if column in _INTEGER_FIELDS else
+        columns[column].tolist()
+        for column in HISTORY_COLUMNS]
+
+    entries = {}
+    for entry in map(SyntheticHistoryEntry._make, zip(*values)):
+        entries.setdefault(entry.id, []).append(entry)
+
+    return entries
+
+def generate_dailies(item_count: int, day_count: int, seed: int = 0) -> Tuple[List[Item], Dict[int, List[SyntheticHistoryEntry]]]:
+    """Return ITEM_COUNT items and DAY_COUNT days of made-up daily history for each, as entries.
+
+    See `generate_history_columns`; the columnar form is much faster and
+    smaller for large N or D.
+    """
+
+    items, columns = generate_history_columns(item_count, day_count, seed)
+
+    return items, entries_from_columns(columns)
+
+def generate_search_page(items: List[Item]) -> str:
+    """Return a made-up gw2bltc.com search results page listing ITEMS.
+
+    Mirrors the site's markup, including its `body` inside `table`.
+    """
+
+    rows = "".join(f"""
+        <tr>
+            <td class="td-icon"><img src="https://render.guildwars2.com/file/{item.id:040X}/{item.id}.png" width="32" height="32"></td>
+            <td class="td-name"><a href="/en/item/{item.id}-{item.name.replace(' ', '-')}" class="rarity-fine">{item.name}</a><br><span class="level">Lvl. 0</span></td>
+            <td class="td-number">{item.id * 7 % 10000}</td>
+            <td class="td-number">{item.id * 13 % 10000}</td>
+            <td class="td-number">{item.id * 3 % 1000:,}</td>
+            <td class="td-number">{item.id * 11 % 1000:,}</td>
+            <td class="td-number">{item.id * 17 % 100}%</td>
+        </tr>""" for item in items)
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Trading Post Search - GW2BLTC</title><link rel="stylesheet" href="/css/main.css"></head>
+<body>
+<div class="container">
+    <div class="search-form"><form action="/en/tp/search"><input type="text" name="name"></form></div>
+    <table class="table-result">
+        <thead><tr><th>Item</th><th>Name</th><th>Sell</th><th>Buy</th><th>Supply</th><th>Demand</th><th>Profit</th></tr></thead>
+        <body>{rows}
+        </body>
+    </table>
+    <ul class="pagination"><li><a href="/en/tp/search?page=2">2</a></li></ul>
+</div>
+<script>var items = "<a href='/en/item/1'>not an item</a>";</script>
+</body>
+</html>
+"""
@@ -0,0 +1,132 @@
+"""Poll a local stand-in for the trading post API.
+
+Run from the repository root:
+
+    python -m benchmarks.trading_post --items 5000 --polls 5
+
+This only times polling; tests/test_listings_poller.py checks what a poll
+gets against the same stand-in.
+"""
+
+import json
+import random
+import argparse
+import tempfile
+import threading
+import time
+import os
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlparse
+from item import Item
+from http_client import HttpClient
+from listings_poller import ListingsPoller, read_snapshots
+
+class TradingPostStandIn(ThreadingHTTPServer):
+    """Serves made-up `/v2/commerce/prices` and `/v2/commerce/listings` responses.
+
+    Every RATE_LIMIT_EVERY-th request is answered with 429 and Retry-After: 0,
+    like the real API when requests come too fast. Ids above MAX_ITEM_ID
+    aren't on the trading post.
+    """
+
+    def __init__(self, max_item_id: int, rate_limit_every: int = 0, seed: int = 0):
+        """Listen on a free local port."""
+
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.max_item_id = max_item_id
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    @property
+    def url(self) -> str:
+        """Return the base URL to poll, in place of `listings_poller.gw2_api_url`."""
+
+        return f"http://127.0.0.1:{self.server_address[1]}/v2/commerce"
+
+    def prices(self, item_id: int) -> Tuple[int, int]:
+        """Return a made-up (buy, sell) unit price for ITEM_ID."""
+
+        sell = 10 + item_id * 7 % 50000 + self.rng.randint(0, 20)
+
+        return int(sell * 0.85), sell
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles one request to the stand-in."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            rate_limited = server.rate_limit_every and server.requests % server.rate_limit_every == 0
+            server.rate_limited += bool(rate_limited)
+        if rate_limited:
+            self._send(429, {"text": "too many requests"}, {"Retry-After": "0"})
+            return
+
+        url = urlparse(self.path)
+        ids = [int(item_id) for item_id in parse_qs(url.query).get("ids", [""])[0].split(",") if item_id]
+        known = [item_id for item_id in ids if item_id <= server.max_item_id]
+        if not known:
+            self._send(404, {"text": "all ids provided are invalid"})
+            return
+
+        records = []
+        for item_id in known:
+            buy, sell = server.prices(item_id)
+            if url.path.endswith("/prices"):
+                records.append({"id": item_id, "whitelisted": False, "buys": {"quantity": item_id * 3, "unit_price": buy}, "sells": {"quantity": item_id * 2, "unit_price": sell}})
+            elif url.path.endswith("/listings"):
+                records.append({
+                    "id": item_id,
+                    "buys": [{"listings": 1, "unit_price": buy - step, "quantity": 250} for step in range(0, 20, 2)],
+                    "sells": [{"listings": 1, "unit_price": sell + step, "quantity": 250} for step in range(0, 20, 2)],
+                })
+        self._send(206 if len(known) < len(ids) else 200, records)
+
+    def _send(self, status: int, body, headers: dict = {}):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--polls", type=int, default=5)
+    parser.add_argument("--rate-limit-every", type=int, default=7)
+    parser.add_argument("--rate", type=float, default=100, help="Client-side requests per second")
+    args = parser.parse_args()
+
+    server = TradingPostStandIn(max_item_id=args.items - 10, rate_limit_every=args.rate_limit_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    items = [Item(id=item_id, name=f"Item {item_id}") for item_id in range(1, args.items + 1)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "snapshots.bin")
+        client = HttpClient(default_rate_limit=(args.rate, args.rate), backoff_seconds=0.01)
+        poller = ListingsPoller(items, interval_seconds=10, hours=1, path=path, client=client, base_url=server.url)
+        start = time.perf_counter()
+        for _ in range(args.polls):
+            covered = poller.poll()
+        seconds = (time.perf_counter() - start) / args.polls
+        records = read_snapshots(path)
+    server.shutdown()
+
+    print(f"{covered} of {args.items} items per poll, {seconds:.3f}s per poll, {server.requests} requests ({server.rate_limited} rate-limited)")
+    print(f"{len(records)} records on disk ({records.itemsize} bytes each)")
+    print(f"client: {client.metrics.as_dict()}")
+    print(f"spread of item 1: {poller.spread(1)}c, depth {poller.depth(1)}, volatility {poller.volatility(1):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Time grouped trend and seasonality detection, cold and cached, against a per-item loop.
+
+Run from the repository root:
+
+    python -m benchmarks.trends --items 2000 --days 730
+
+Every other item's prices are raised by --weekend-effect on weekends, and
+the mean detected effects are printed. tests/test_trends.py checks the
+results; this only times them.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from datetime import timedelta
+from benchmarks.synthetic import generate_dailies
+from history_store import HistoryStore
+from trends import DAYS_PER_YEAR, TREND_HISTORY_COLUMNS, TrendCache, analyze_trends
+
+def reference_trends(history_store: HistoryStore, items: list) -> tuple:
+    """Return (price trends, price weekend effects) of ITEMS, fitting one item at a time."""
+
+    trends = []
+    weekend_effects = []
+    for item in items:
+        series = history_store.series(item.id, TREND_HISTORY_COLUMNS)
+        days = series["utc_timestamp"] // (24 * 60 * 60)
+        prices = np.log((series["buy_price_avg"] + series["sell_price_avg"]) / 2)
+        slope, intercept = np.polyfit(days, prices, 1)
+        residuals = prices - (intercept + slope * days)
+        weekend = (days + 3) % 7 >= 5
+        trends.append(np.expm1(slope * DAYS_PER_YEAR))
+        weekend_effects.append(np.expm1(residuals[weekend].mean() - residuals[~weekend].mean()))
+
+    return np.array(trends), np.array(weekend_effects)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--weekend-effect", type=float, default=0.1)
+    parser.add_argument("--reference-items", type=int, default=500)
+    args = parser.parse_args()
+
+    items, entries = generate_dailies(args.items, args.days)
+    for item in items[::2]:
+        entries[item.id] = [entry._replace(buy_price_avg=entry.buy_price_avg * (1 + args.weekend_effect), sell_price_avg=entry.sell_price_avg * (1 + args.weekend_effect))
+                            if entry.utc_timestamp.weekday() >= 5 else entry for entry in entries[item.id]]
+    last_entries = {item.id: entries[item.id][-1] for item in items}
+
+    with tempfile.TemporaryDirectory() as path:
+        history_store = HistoryStore(path)
+        history_store.refresh(entries)
+        del entries
+
+        start = time.perf_counter()
+        history, lengths = history_store.rows(items, TREND_HISTORY_COLUMNS)
+        report = analyze_trends(history, lengths)
+        print(f"analyze_trends:         {time.perf_counter() - start:.3f}s for {args.items} items x {args.days} days")
+
+        reference_items = items[:args.reference_items]
+        start = time.perf_counter()
+        reference_trends(history_store, reference_items)
+        seconds = time.perf_counter() - start
+        print(f"per-item loop:          {seconds:.3f}s for {len(reference_items)} items ({seconds / len(reference_items) * args.items:.1f}s extrapolated)")
+
+        detected = report.table["price_weekend_effect"].to_numpy()
+        print(f"weekend effect:         {np.mean(detected[::2]):+.3f} injected {args.weekend_effect:+.3f}, {np.mean(detected[1::2]):+.3f} injected +0")
+
+        cache = TrendCache()
+        for label in ["TrendCache cold", "TrendCache warm"]:
+            start = time.perf_counter()
+            cache.trends(history_store, items)
+            print(f"{label + ':':<23} {time.perf_counter() - start:.3f}s")
+
+        changed = items[:len(items) // 100]
+        history_store.refresh({item.id: [last_entries[item.id]._replace(utc_timestamp=last_entries[item.id].utc_timestamp + timedelta(days=1))] for item in changed})
+        cache.hits = cache.misses = 0
+        start = time.perf_counter()
+        cache.trends(history_store, items)
+        print(f"TrendCache, 1% new day: {time.perf_counter() - start:.3f}s ({cache.misses} recomputed)")
+
+if __name__ == "__main__":
+    main()
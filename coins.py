@@ -1,8 +1,14 @@
-from typing import Self
+import math
+
+import numpy as np
+
+from typing import Iterable, Iterator, List, Self, Tuple, Union
 
 class Coins():
     """Represents a combination of gold, silver, and copper coins."""
 
+    __slots__ = ("_copper",)
+
     def __init__(self, copper: int = 0, silver: int = 0, gold: int = 0):
         """Initialize a representation of gold, silver, and copper coins.
 
@@ -13,17 +19,16 @@ class Coins():
         - Coins(12345): 1 gold, 23 silver, and 45 copper
         - Coins(copper=45, silver=12): 0 gold, 12 silver, and 45 copper
         - Coins(gold=8): 8 gold, 0 silver, and 0 copper
+
+        Fractions of a copper are dropped.
         """
 
         if copper < 0 or silver < 0 or gold < 0:
             raise Exception("Cannot store negative coins.")
 
-        if (silver == 0 and gold == 0) and copper > 0:
-            self._gold, self._silver, self._copper = copper_to_gold_silver_copper(copper)
-        else:
-            self._gold = gold or 0
-            self._silver = silver or 0
-            self._copper = copper or 0
+        total = (copper or 0) + ((silver or 0) * 100) + ((gold or 0) * 10000)
+        # NaN marks an unknown amount, e.g. a price without enough history
+        self._copper = total if math.isnan(total) else int(total)
 
     def __repr__(self):
         """TODO"""
@@ -33,6 +38,29 @@ class Coins():
         """TODO"""
         return self._human_readable()
 
+    def __eq__(self, other: Self) -> bool:
+        """Return true if A is B."""
+
+        if not isinstance(other, Coins):
+            return NotImplemented
+
+        return self.to_copper() == other.to_copper()
+
+    def __hash__(self) -> int:
+        """Return hash of the amount."""
+
+        return hash(self.to_copper())
+
+    def __lt__(self, other: Self) -> bool:
+        """Return true if A is < B."""
+
+        return self.to_copper() < other.to_copper()
+
+    def __le__(self, other: Self) -> bool:
+        """Return true if A is <= B."""
+
+        return self.to_copper() <= other.to_copper()
+
     def __gt__(self, other: Self) -> bool:
         """Return true if A is > B."""
 
@@ -46,33 +74,50 @@ class Coins():
     def __add__(self, other: Self) -> Self:
         """Return the sum of two Coins."""
 
+        if not isinstance(other, Coins):
+            return NotImplemented
+
         return Coins(self.to_copper() + other.to_copper())
 
     def __sub__(self, other: Self) -> Self:
         """Return the difference of two Coins."""
 
+        if not isinstance(other, Coins):
+            return NotImplemented
+
         return Coins(self.to_copper() - other.to_copper())
 
     def __mul__(self, other: int|float) -> Self:
         """Return the produt of OTHER and self."""
 
+        if not isinstance(other, (int, float, np.integer, np.floating)):
+            return NotImplemented
+
         return Coins(self.to_copper() * other)
 
     def _human_readable(self) -> str:
         """Return human-readable representation of coinage."""
 
-        if self._gold == 0 and self._silver == 0:
+        if math.isnan(self._copper):
             return f"{self._copper}c"
 
-        if self._gold == 0:
-            return f"{self._silver}s {self._copper:>2}c"
-
-        return f"{self._gold}g {self._silver: >2}s {self._copper: >2}c"
+        return format_coins(*copper_to_gold_silver_copper(self._copper))
 
     def to_copper(self) -> int:
         """Return value in copper."""
 
-        return self._copper + (self._silver * 100) + (self._gold * 10000)
+        return self._copper
+
+def format_coins(gold: int, silver: int, copper: int) -> str:
+    """Return human-readable representation of GOLD, SILVER and COPPER coins."""
+
+    if gold == 0 and silver == 0:
+        return f"{copper}c"
+
+    if gold == 0:
+        return f"{silver}s {copper:>2}c"
+
+    return f"{gold}g {silver: >2}s {copper: >2}c"
 
 def copper_to_gold_silver_copper(copper: int) -> tuple:
     """TODO"""
@@ -81,3 +126,149 @@ def copper_to_gold_silver_copper(copper: int) -> tuple:
     silver = (copper - (gold * 10000)) // 100
 
     return int(gold), int(silver), int(copper - (gold * 10000) - (silver * 100))
+
+CoinArrayLike = Union["CoinArray", Coins, int, np.ndarray, Iterable]
+
+class CoinArray():
+    """Represents many amounts of coins, stored as an int64 array of copper.
+
+    The vectorized counterpart to Coins: arithmetic, comparisons and cumsum
+    work on whole arrays, so report columns can stay numeric until they are
+    formatted for display. Unlike Coins, amounts may be negative (e.g.
+    losses).
+    """
+
+    __slots__ = ("copper",)
+
+    def __init__(self, copper: CoinArrayLike = ()):
+        """Initialize from COPPER amounts: an array, a sequence of ints or Coins, or a CoinArray.
+
+        Fractions of a copper are dropped.
+        """
+
+        if isinstance(copper, CoinArray):
+            copper = copper.copper
+        copper = np.asarray(copper)
+        if copper.dtype == object:
+            copper = np.array([amount.to_copper() if isinstance(amount, Coins) else amount for amount in copper], dtype=np.float64)
+
+        if copper.dtype.kind == "f":
+            if np.isnan(copper).any():
+                raise Exception("Cannot store unknown coins.")
+            copper = np.floor(copper)
+        self.copper = copper.astype(np.int64)
+
+    def __repr__(self):
+        """Return representation listing each amount."""
+        return f"CoinArray([{', '.join(self.format())}])"
+
+    def __len__(self) -> int:
+        """Return number of amounts."""
+
+        return len(self.copper)
+
+    def __iter__(self) -> Iterator[Coins]:
+        """Iterate over amounts as Coins."""
+
+        return map(Coins, self.copper.tolist())
+
+    def __getitem__(self, key) -> Union[Coins, Self]:
+        """Return one amount as Coins, or a CoinArray for a slice, mask or index array."""
+
+        if isinstance(key, (int, np.integer)):
+            return Coins(int(self.copper[key]))
+
+        return CoinArray(self.copper[key])
+
+    def __eq__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A == B."""
+
+        return self.copper == _to_copper(other)
+
+    def __ne__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A != B."""
+
+        return self.copper != _to_copper(other)
+
+    def __lt__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A < B."""
+
+        return self.copper < _to_copper(other)
+
+    def __le__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A <= B."""
+
+        return self.copper <= _to_copper(other)
+
+    def __gt__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A > B."""
+
+        return self.copper > _to_copper(other)
+
+    def __ge__(self, other: CoinArrayLike) -> np.ndarray:
+        """Return elementwise A >= B."""
+
+        return self.copper >= _to_copper(other)
+
+    def __add__(self, other: CoinArrayLike) -> Self:
+        """Return elementwise sum."""
+
+        return CoinArray(self.copper + _to_copper(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other: CoinArrayLike) -> Self:
+        """Return elementwise difference."""
+
+        return CoinArray(self.copper - _to_copper(other))
+
+    def __rsub__(self, other: CoinArrayLike) -> Self:
+        """Return elementwise difference, OTHER - self."""
+
+        return CoinArray(_to_copper(other) - self.copper)
+
+    def __mul__(self, other: Union[int, float, np.ndarray]) -> Self:
+        """Return elementwise product with OTHER, dropping fractions of a copper."""
+
+        return CoinArray(self.copper * np.asarray(other))
+
+    __rmul__ = __mul__
+
+    def cumsum(self) -> Self:
+        """Return running totals."""
+
+        return CoinArray(np.cumsum(self.copper))
+
+    def sum(self) -> int:
+        """Return total in copper."""
+
+        return int(self.copper.sum())
+
+    def to_copper(self) -> np.ndarray:
+        """Return values in copper."""
+
+        return self.copper
+
+    def gold_silver_copper(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return arrays of gold, silver and copper coins making up each (absolute) amount."""
+
+        amounts = np.abs(self.copper)
+
+        return amounts // 10000, (amounts // 100) % 100, amounts % 100
+
+    def format(self) -> List[str]:
+        """Return human-readable representation of each amount, as Coins would."""
+
+        signs = np.where(self.copper < 0, "-", "")
+
+        return [sign + format_coins(gold, silver, copper) for sign, gold, silver, copper in zip(signs.tolist(), *(coins.tolist() for coins in self.gold_silver_copper()))]
+
+def _to_copper(other: CoinArrayLike) -> Union[int, np.ndarray]:
+    """Return OTHER's value in copper, for arithmetic with a CoinArray."""
+
+    if isinstance(other, (Coins, CoinArray)):
+        return other.to_copper()
+    if isinstance(other, (int, np.integer)):
+        return other
+
+    return CoinArray(other).copper
@@ -0,0 +1,485 @@
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import Dict, Iterable, List, Tuple, TYPE_CHECKING
+from coins import Coins
+from item import Item
+from tp_profit import proceeds, profit
+
+if TYPE_CHECKING:
+    from gw2tpdb.api.history import HistoryEntry
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = [
+    "id",
+    "buy_delisted",
+    "buy_listed",
+    "buy_price_avg",
+    "buy_price_max",
+    "buy_price_min",
+    "buy_price_stdev",
+    "buy_quantity_avg",
+    "buy_quantity_max",
+    "buy_quantity_min",
+    "buy_quantity_stdev",
+    "buy_sold",
+    "buy_value",
+    "count",
+    "sell_delisted",
+    "sell_listed",
+    "sell_price_avg",
+    "sell_price_max",
+    "sell_price_min",
+    "sell_price_stdev",
+    "sell_quantity_avg",
+    "sell_quantity_max",
+    "sell_quantity_min",
+    "sell_quantity_stdev",
+    "sell_sold",
+    "sell_value",
+    "utc_timestamp",
+]
+
+# History columns read by the batched analysis
+ANALYSIS_COLUMNS = [
+    "buy_price_avg",
+    "buy_price_stdev",
+    "buy_sold",
+    "sell_price_avg",
+    "sell_price_stdev",
+    "sell_sold",
+]
+
+# DailyFlipReport columns holding amounts of coins
+COIN_COLUMNS = [
+    "max_invest",
+    "buy_price",
+    "sell_price",
+]
+
+@dataclass
+class DailyFlipReport():
+    """TODO"""
+
+    gw2bltc_url: str
+    item_id: int
+    item_name: str
+    return_on_investment: float
+    max_buy_count: float
+    max_invest: Coins
+    buy_price: Coins
+    sell_price: Coins
+    buy_volume: int
+    sell_volume: int
+    outlier_count: int
+
+@dataclass
+class Analysis():
+    """TODO"""
+
+    item: Item
+    # TODO: Specify
+    df: pd.DataFrame
+    outlier_count: int
+
+def sort_history_by_timestamp(entries: List["HistoryEntry"], reverse: bool = False) -> List["HistoryEntry"]:
+    """Sort ENTRIES by timestamp field."""
+
+    return sorted(entries, key=attrgetter("utc_timestamp"), reverse=reverse)
+
+def history_to_pandas(entries: List["HistoryEntry"]) -> pd.DataFrame:
+    """Return n-dimensional numpy array for ENTRIES."""
+
+    return pd.DataFrame(entries, columns=HISTORY_COLUMNS)
+
+
+def analyze_daily_flip(item: Item, entries: List["HistoryEntry"], moving_average_window_size: int) -> Analysis:
+    """TODO"""
+
+    df = history_to_pandas(sort_history_by_timestamp(entries))
+
+    df["buy_price_avg_-1stdev"] = df["buy_price_avg"] - (1 * df["buy_price_stdev"])
+    df[f"buy_price_avg_-1stdev_{moving_average_window_size}d_ma"] = df["buy_price_avg_-1stdev"].rolling(moving_average_window_size).mean()
+    df["sell_price_avg_+1stdev"] = df["sell_price_avg"] + (1 * df["sell_price_stdev"])
+    df[f"sell_price_avg_+1stdev_{moving_average_window_size}d_ma"] = df["sell_price_avg_+1stdev"].rolling(moving_average_window_size).mean()
+
+    df["sell_price_avg_pct_change"] = df["sell_price_avg"].pct_change(fill_method=None)
+    sell_price_pct_change_point_75_quantile = df["sell_price_avg_pct_change"].quantile(0.75)
+    sell_price_pct_change_point_25_quantile = df["sell_price_avg_pct_change"].quantile(0.25)
+    sell_price_pct_change_interquartile_range = sell_price_pct_change_point_75_quantile - sell_price_pct_change_point_25_quantile
+    df["outlier_sell_price_avg_pct_change"] = df["sell_price_avg_pct_change"].apply(math.fabs) > sell_price_pct_change_point_75_quantile + (1.5 * sell_price_pct_change_interquartile_range)
+
+    df["buy_price_avg_pct_change"] = df["buy_price_avg"].pct_change(fill_method=None)
+    buy_price_pct_change_point_75_quantile = df["buy_price_avg_pct_change"].quantile(0.75)
+    buy_price_pct_change_point_25_quantile = df["buy_price_avg_pct_change"].quantile(0.25)
+    buy_price_pct_change_interquartile_range = buy_price_pct_change_point_75_quantile - buy_price_pct_change_point_25_quantile
+    df["outlier_buy_price_avg_pct_change"] = df["buy_price_avg_pct_change"].apply(math.fabs) > buy_price_pct_change_point_75_quantile + (1.5 * buy_price_pct_change_interquartile_range)
+
+    sell_outlier_count = len([x for x in df["outlier_sell_price_avg_pct_change"][-1*moving_average_window_size:] if x])
+    buy_outlier_count = len([x for x in df["outlier_buy_price_avg_pct_change"][-1*moving_average_window_size:] if x])
+    """
+    if (item.id == 36038):
+        logger.debug(item)
+        logger.debug(sell_price_pct_change_point_75_quantile + (1.5 * sell_price_pct_change_interquartile_range))
+        logger.debug(df[[
+            "utc_timestamp",
+            #"sell_price_avg_pct_change",
+            "outlier_sell_price_avg_pct_change",
+            #"buy_price_avg_pct_change",
+            "outlier_buy_price_avg_pct_change",
+        ]])
+    """
+
+    """
+    df["same_day_flip_profit"] = same_day_flip_profit(df,
+                                    buy_price_column_name="buy_price_avg",
+                                    sell_price_column_name="sell_price_avg")
+    """
+    df["same_day_flip_profit_1stdev"] = profit(df[f"buy_price_avg_-1stdev_{moving_average_window_size}d_ma"],
+                                    df[f"sell_price_avg_+1stdev_{moving_average_window_size}d_ma"])
+    """
+    df["same_day_flip_profit_2stdev"] = same_day_flip_profit(df,
+                                    buy_price_column_name="buy_price_avg_-2stdev",
+                                    sell_price_column_name="sell_price_avg_+1stdev")
+    """
+    #df["same_day_flip_roi"] = (df["same_day_flip_profit"] + df["buy_price_avg"]) / df["buy_price_avg"]
+    df["same_day_flip_1stdev_roi"] = (df["same_day_flip_profit_1stdev"] + df[f"buy_price_avg_-1stdev_{moving_average_window_size}d_ma"]) / df[f"buy_price_avg_-1stdev_{moving_average_window_size}d_ma"]
+    #df["same_day_flip_2stdev_roi"] = (df["same_day_flip_profit_2stdev"] + df["buy_price_avg_-2stdev"]) / df["buy_price_avg_-2stdev"]
+
+    # Moving averages
+    df[f"buy_sold_{moving_average_window_size}d_ma"] = df["buy_sold"].rolling(moving_average_window_size).mean()
+    #df["buy_value_30d_ma"] = df["buy_value"].rolling(30).mean()
+
+    #df["sell_sold_7d_ma"] = df["sell_sold"].rolling(7).mean()
+    #df["sell_sold_14d_ma"] = df["sell_sold"].rolling(14).mean()
+    #df["sell_sold_30d_ma"] = df["sell_sold"].rolling(30).mean()
+    df[f"sell_sold_{moving_average_window_size}d_ma"] = df["sell_sold"].rolling(moving_average_window_size).mean()
+
+    #df["sell_value_{moving_average_window_size}d_ma"] = df["sell_value"].rolling(moving_average_window_size).mean()
+
+    #df["same_day_flip_roi_30d_ma"] = df["same_day_flip_roi"].rolling(30).mean()
+    #df["same_day_flip_1stdev_roi_7d_ma"] = df["same_day_flip_1stdev_roi"].rolling(7).mean()
+    #df["same_day_flip_1stdev_roi_14d_ma"] = df["same_day_flip_1stdev_roi"].rolling(14).mean()
+    #df["same_day_flip_1stdev_roi_30d_ma"] = df["same_day_flip_1stdev_roi"].rolling(30).mean()
+    #df[f"same_day_flip_1stdev_roi_{moving_average_window_size}d_ma"] = df["same_day_flip_1stdev_roi"].rolling(moving_average_window_size).mean()
+    #df["same_day_flip_2stdev_roi_30d_ma"] = df["same_day_flip_2stdev_roi"].rolling(30).mean()
+
+    #df["10%_sell_sold"] = df["sell_sold"] * 0.1
+    #df["10%_sell_sold_7d_ma"] = df["10%_sell_sold"].rolling(7).mean()
+    #df["10%_sell_sold_14d_ma"] = df["10%_sell_sold"].rolling(14).mean()
+    #df[f"10%_sell_sold_{moving_average_window_size}d_ma"] = df["10%_sell_sold"].rolling(moving_average_window_size).mean()
+    #df["10%_sell_sold_30d_stdev"] = df["10%_sell_sold"].rolling(30).std()
+    #df["10%_sell_sold_30d_ma+2stdev"] = df["10%_sell_sold_30d_ma"] + (2 * df["10%_sell_sold_30d_stdev"])
+    #df["10%_sell_sold_30d_ma-2stdev"] = df["10%_sell_sold_30d_ma"] - (2 * df["10%_sell_sold_30d_stdev"])
+
+    #df["10%_sell_value"] = df["sell_value"] * 0.1
+    #df["10%_sell_value_30d_ma"] = df["10%_sell_value"].rolling(30).mean()
+    #df["10%_sell_value_30d_stdev"] = df["10%_sell_value"].rolling(30).std()
+    #df["10%_sell_value_30d_ma+2stdev"] = df["10%_sell_value_30d_ma"] + (2 * df["10%_sell_value_30d_stdev"])
+    #df["10%_sell_value_30d_ma-2stdev"] = df["10%_sell_value_30d_ma"] - (2 * df["10%_sell_value_30d_stdev"])
+
+    #df["roi_value_on_10%_sell_value"] = (df["10%_sell_value"] * df["same_day_flip_roi"]) - df["10%_sell_value"]
+    #df["roi_value_on_10%_sell_value_30d_rolling_sum"] = df["roi_value_on_10%_sell_value"].rolling(30).sum()
+    #df["roi_value_on_10%_sell_value_30d_rolling_std"] = df["roi_value_on_10%_sell_value"].rolling(30).std()
+
+    # Expected total profit if you sold 10% of volume every day for 30 days
+    #df["roi_value_on_10%_sell_value_30d_rolling_sum_30d_ma"] = df["roi_value_on_10%_sell_value_30d_rolling_sum"].rolling(30).mean()
+
+    return Analysis(item, df[[
+        #"buy_sold",
+        f"buy_sold_{moving_average_window_size}d_ma",
+        #"buy_value",
+        #"buy_value_30d_ma",
+        #"buy_price_avg",
+        #"buy_price_avg_-1stdev",
+        f"buy_price_avg_-1stdev_{moving_average_window_size}d_ma",
+        #"buy_price_avg_-2stdev",
+
+        #"sell_sold",
+        #"sell_sold_7d_ma",
+        #"sell_sold_14d_ma",
+        f"sell_sold_{moving_average_window_size}d_ma",
+        #"sell_value",
+        #"sell_value_30d_ma",
+        #"sell_price_min",
+        #"sell_price_avg",
+        #"sell_price_avg_+1stdev",
+        f"sell_price_avg_+1stdev_{moving_average_window_size}d_ma",
+        #"sell_price_avg_+2stdev",
+
+        #"buy_price_avg_-2stdev",
+        #"sell_price_avg_+2stdev",
+
+        #"same_day_flip_profit",
+        #"same_day_flip_roi",
+        #"same_day_flip_roi_30d_ma",
+        "same_day_flip_1stdev_roi",
+        #"same_day_flip_1stdev_roi_14d_ma",
+        #f"same_day_flip_1stdev_roi_{moving_average_window_size}d_ma",
+        #"same_day_flip_2stdev_roi_30d_ma",
+
+        #"10%_sell_sold",
+        #"10%_sell_sold_30d_ma-2stdev",
+        #"10%_sell_sold_7d_ma",
+        #"10%_sell_sold_14d_ma",
+        #f"10%_sell_sold_{moving_average_window_size}d_ma",
+        #"10%_sell_sold_30d_ma+2stdev",
+        #"10%_sell_value",
+        #"10%_sell_value_30d_ma-2stdev",
+        #"10%_sell_value_30d_ma",
+        #"10%_sell_value_30d_ma+2stdev",
+        #"roi_value_on_10%_sell_value",
+        #"roi_value_on_10%_sell_value_30d_rolling_sum",
+        #"roi_value_on_10%_sell_value_30d_rolling_std",
+        #"roi_value_on_10%_sell_value_30d_rolling_sum_30d_ma",
+        #f"sell_price_avg_pct_change_{moving_average_window_size}d_ma",
+    ]], outlier_count=buy_outlier_count+sell_outlier_count)
+
+def analysis_to_daily_flip_report(analysis: Analysis) -> DailyFlipReport:
+    """TODO"""
+
+    gw2bltc_url = f"https://www.gw2bltc.com/en/item/{analysis.item.id}"
+    buy_volume, buy_price, sell_volume, sell_price, _ = analysis.df.iloc[-1]
+    roi, max_buy_count = (float(value[0]) for value in roi_and_max_buy_count(*(np.array([value]) for value in (buy_price, sell_price, buy_volume, sell_volume))))
+
+    return DailyFlipReport(
+        gw2bltc_url=gw2bltc_url,
+        item_id=analysis.item.id,
+        item_name=analysis.item.name,
+        return_on_investment=roi,
+        sell_volume=sell_volume,
+        buy_volume=buy_volume,
+        max_buy_count=max_buy_count,
+        buy_price=Coins(buy_price),
+        max_invest=Coins(np.floor(buy_price) * max_buy_count),
+        sell_price=Coins(sell_price),
+        outlier_count=analysis.outlier_count,
+    )
+
+def daily_flip_reports_to_pandas(reports: List[DailyFlipReport]) -> pd.DataFrame:
+    """Return a DataFrame with one row per DailyFlipReport in REPORTS."""
+
+    df = pd.DataFrame([report.__dict__ for report in reports])
+    for column in COIN_COLUMNS:
+        if column in df:
+            df[column] = copper_column([coins.to_copper() for coins in df[column]])
+
+    return df
+
+def analyze_daily_flips(items: List[Item], entries: Dict[int, List["HistoryEntry"]], moving_average_window_size: int) -> pd.DataFrame:
+    """Return a DailyFlipReport table for ITEMS, analyzing every item at once.
+
+    Equivalent to `analysis_to_daily_flip_report(analyze_daily_flip(item,
+    entries[item.id][-2*moving_average_window_size:], ...))` for each item,
+    but works on one item x day matrix per column instead of one DataFrame per
+    item. Items without history entries are skipped. The COIN_COLUMNS hold
+    int64 copper; wrap them in `coins.CoinArray` to format them.
+    """
+
+    items = [item for item in items if entries.get(item.id)]
+    if not items:
+        return pd.DataFrame(columns=[field.name for field in fields(DailyFlipReport)])
+
+    history = history_to_matrices(items, entries, moving_average_window_size*2, ANALYSIS_COLUMNS)
+
+    return analyze_history_matrices(items, history, moving_average_window_size)
+
+def analyze_history_matrices(items: List[Item], history: Dict[str, np.ndarray], moving_average_window_size: int) -> pd.DataFrame:
+    """Return a DailyFlipReport table for ITEMS from item x day HISTORY matrices.
+
+    HISTORY maps each of ANALYSIS_COLUMNS to a matrix whose row i holds
+    ITEMS[i]'s trailing days, as built by `history_to_matrices`.
+    """
+
+    buy_price = rolling_mean(history["buy_price_avg"] - (1 * history["buy_price_stdev"]), moving_average_window_size)[:, -1]
+    sell_price = rolling_mean(history["sell_price_avg"] + (1 * history["sell_price_stdev"]), moving_average_window_size)[:, -1]
+    buy_volume = rolling_mean(history["buy_sold"], moving_average_window_size)[:, -1]
+    sell_volume = rolling_mean(history["sell_sold"], moving_average_window_size)[:, -1]
+
+    outlier_count = outlier_counts(history["buy_price_avg"], moving_average_window_size) + \
+        outlier_counts(history["sell_price_avg"], moving_average_window_size)
+
+    return daily_flip_report_table(items, buy_price, sell_price, buy_volume, sell_volume, outlier_count)
+
+def copper_column(copper: Iterable[float]) -> np.ndarray:
+    """Return COPPER amounts as int64, dropping fractions of a copper; unknown (NaN) amounts become 0."""
+
+    copper = np.asarray(copper, dtype=np.float64)
+
+    return np.floor(np.nan_to_num(copper, nan=0.0)).astype(np.int64)
+
+def roi_and_max_buy_count(buy_price: np.ndarray, sell_price: np.ndarray, buy_volume: np.ndarray, sell_volume: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the return on investment and how many to buy, elementwise, for flips at BUY_PRICE and SELL_PRICE.
+
+    Prices are rounded down to whole copper, and the return is what
+    `tp_profit.proceeds` keeps per copper spent; NaN if the buy price is
+    under a copper. Buys at most 10% of the lower of BUY_VOLUME and
+    SELL_VOLUME, and only when the flip is profitable after fees.
+    """
+
+    # Orders and listings are in whole copper, and fees are rounded per item
+    buy_copper, sell_copper = np.floor(buy_price), np.floor(sell_price)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where((buy_copper >= 1) & (sell_copper == sell_copper), proceeds(copper_column(sell_copper)) / buy_copper, np.nan)
+        # Same as `min(buy_volume // 10, sell_volume // 10)`, including NaNs
+        max_volume = np.where((sell_volume // 10) < (buy_volume // 10), sell_volume // 10, buy_volume // 10)
+        max_buy_count = np.where(roi > 1.0, max_volume, 0.0)
+
+    return roi, max_buy_count
+
+def daily_flip_report_table(items: List[Item], buy_price: np.ndarray, sell_price: np.ndarray, buy_volume: np.ndarray, sell_volume: np.ndarray, outlier_count: np.ndarray) -> pd.DataFrame:
+    """Return a DailyFlipReport table for ITEMS from their latest moving averages."""
+
+    roi, max_buy_count = roi_and_max_buy_count(buy_price, sell_price, buy_volume, sell_volume)
+
+    return pd.DataFrame({
+        "gw2bltc_url": [f"https://www.gw2bltc.com/en/item/{item.id}" for item in items],
+        "item_id": [item.id for item in items],
+        "item_name": [item.name for item in items],
+        "return_on_investment": roi,
+        "max_buy_count": max_buy_count,
+        "max_invest": copper_column(np.floor(buy_price) * max_buy_count),
+        "buy_price": copper_column(buy_price),
+        "sell_price": copper_column(sell_price),
+        "buy_volume": buy_volume,
+        "sell_volume": sell_volume,
+        "outlier_count": outlier_count,
+    })
+
+def history_to_matrices(items: List[Item], entries: Dict[int, List["HistoryEntry"]], days: int, columns: List[str]) -> Dict[str, np.ndarray]:
+    """Return an item x day matrix per column for the trailing DAYS of ENTRIES.
+
+    Row i holds ITEMS[i]'s last DAYS entries sorted by timestamp, aligned to
+    the right; items with a shorter history are padded with NaN on the left.
+    """
+
+    histories = [sort_history_by_timestamp(entries[item.id][-1*days:]) for item in items]
+    lengths = np.fromiter(map(len, histories), dtype=np.intp, count=len(histories))
+    values = np.array([attrgetter(*columns)(entry) for history in histories for entry in history], dtype=np.float64).reshape(-1, len(columns))
+
+    return {column: right_align(values[:, index], lengths, days) for index, column in enumerate(columns)}
+
+def right_align(values: np.ndarray, lengths: np.ndarray, days: int) -> np.ndarray:
+    """Return a row x DAYS matrix of VALUES, LENGTHS[i] consecutive values per row.
+
+    Each row's values are aligned to the right and padded with NaN on the left.
+    """
+
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    # Position of each value within its row, offset so the last value lands in the last column
+    cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(days - lengths, lengths)
+    matrix = np.full((len(lengths), days), np.nan)
+    matrix[rows, cols] = values
+
+    return matrix
+
+def rolling_mean(matrix: np.ndarray, window_size: int) -> np.ndarray:
+    """Return the WINDOW_SIZE-day moving average along each row of MATRIX.
+
+    Bit-for-bit equivalent to `pd.Series(row).rolling(window_size).mean()` for
+    each row: this replays pandas' Kahan-compensated add/remove kernel one day
+    at a time, vectorized across rows. Leading NaN padding doesn't change the
+    result.
+    """
+
+    rows, days = matrix.shape
+    output = np.full((rows, days), np.nan)
+    nobs = np.zeros(rows, dtype=np.int64)
+    neg_ct = np.zeros(rows, dtype=np.int64)
+    sum_x = np.zeros(rows)
+    compensation_add = np.zeros(rows)
+    compensation_remove = np.zeros(rows)
+    num_consecutive_same_value = np.zeros(rows, dtype=np.int64)
+    prev_value = matrix[:, 0].copy() if days else np.zeros(rows)
+
+    for day in range(days):
+        if day >= window_size:
+            value = matrix[:, day - window_size]
+            present = value == value
+            y = -value - compensation_remove
+            t = sum_x + y
+            compensation_remove = np.where(present, t - sum_x - y, compensation_remove)
+            sum_x = np.where(present, t, sum_x)
+            nobs -= present
+            neg_ct -= present & np.signbit(value)
+
+        value = matrix[:, day]
+        present = value == value
+        y = value - compensation_add
+        t = sum_x + y
+        compensation_add = np.where(present, t - sum_x - y, compensation_add)
+        sum_x = np.where(present, t, sum_x)
+        nobs += present
+        neg_ct += present & np.signbit(value)
+        num_consecutive_same_value = np.where(present, np.where(value == prev_value, num_consecutive_same_value + 1, 1), num_consecutive_same_value)
+        prev_value = np.where(present, value, prev_value)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = sum_x / nobs
+        result = np.where(num_consecutive_same_value >= nobs, prev_value, result)
+        result = np.where((neg_ct == 0) & (result < 0), 0, result)
+        result = np.where((neg_ct == nobs) & (result > 0), 0, result)
+        output[:, day] = np.where((nobs >= window_size) & (nobs > 0), result, np.nan)
+
+    return output
+
+def pct_change(matrix: np.ndarray) -> np.ndarray:
+    """Return the day-over-day percent change along each row of MATRIX."""
+
+    changes = np.full(matrix.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes[:, 1:] = matrix[:, 1:] / matrix[:, :-1] - 1
+
+    return changes
+
+def nanquantile(matrix: np.ndarray, quantile: float) -> np.ndarray:
+    """Return the QUANTILE of each row of MATRIX, ignoring NaNs.
+
+    Uses the same linear interpolation as `pd.Series.quantile`.
+    """
+
+    return sorted_nanquantile(np.sort(matrix, axis=1), np.count_nonzero(matrix == matrix, axis=1), quantile)
+
+def sorted_nanquantile(ordered: np.ndarray, counts: np.ndarray, quantile: float) -> np.ndarray:
+    """Return `nanquantile` of rows already sorted in ORDERED (NaNs last), with COUNTS non-NaN values each."""
+
+    rows = np.arange(ordered.shape[0])
+    virtual_indexes = (counts - 1) * quantile
+    previous_indexes = np.floor(virtual_indexes)
+    next_indexes = previous_indexes + 1
+    above_bounds = virtual_indexes >= counts - 1
+    previous_indexes[above_bounds] = -1
+    next_indexes[above_bounds] = -1
+    gamma = virtual_indexes - previous_indexes
+    previous_indexes = np.where(above_bounds, counts - 1, previous_indexes).astype(np.intp)
+    next_indexes = np.where(above_bounds, counts - 1, next_indexes).astype(np.intp)
+
+    previous = ordered[rows, previous_indexes.clip(0)]
+    following = ordered[rows, next_indexes.clip(0)]
+    with np.errstate(invalid="ignore"):
+        difference = following - previous
+        quantiles = np.where(gamma >= 0.5, following - difference * (1 - gamma), previous + difference * gamma)
+
+    return np.where(counts > 0, quantiles, np.nan)
+
+def outlier_counts(prices: np.ndarray, window_size: int, iqr_factor: float = 1.5) -> np.ndarray:
+    """Return how many of the last WINDOW_SIZE daily price changes in each row of PRICES are outliers.
+
+    A change is an outlier when its magnitude exceeds the 75th percentile plus
+    IQR_FACTOR times the interquartile range of the row's percent changes.
+    """
+
+    changes = pct_change(prices)
+    point_75_quantile = nanquantile(changes, 0.75)
+    point_25_quantile = nanquantile(changes, 0.25)
+    interquartile_range = point_75_quantile - point_25_quantile
+    with np.errstate(invalid="ignore"):
+        outliers = np.abs(changes) > (point_75_quantile + (iqr_factor * interquartile_range))[:, np.newaxis]
+
+    return np.count_nonzero(outliers[:, -1*window_size:], axis=1)
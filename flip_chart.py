@@ -0,0 +1,136 @@
+import logging
+import threading
+
+import numpy as np
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from history_store import HistoryStore
+
+logger = logging.getLogger(__name__)
+
+# (column, trace name, subplot row, trace type) of each trace, in plotting order
+CHART_TRACES = [
+    ("sell_price_avg", "Sell price", 1, "scatter"),
+    ("buy_price_avg", "Buy price", 1, "scatter"),
+    ("sell_listed", "Supply", 2, "scatter"),
+    ("buy_listed", "Demand", 2, "scatter"),
+    ("sell_sold", "Sell volume", 3, "bar"),
+    ("buy_sold", "Buy volume", 3, "bar"),
+]
+CHART_COLUMNS = [column for column, _, _, _ in CHART_TRACES]
+
+def downsample(timestamps: np.ndarray, columns: Dict[str, np.ndarray], max_points: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Return TIMESTAMPS and COLUMNS averaged over equal buckets of days, at most MAX_POINTS of them.
+
+    Each bucket is stamped with its first day; missing (NaN) days are left
+    out of the averages.
+    """
+
+    if len(timestamps) <= max_points:
+        return timestamps, columns
+
+    starts = np.arange(0, len(timestamps), -(-len(timestamps) // max_points))
+    downsampled = {}
+    for column, values in columns.items():
+        present = values == values
+        sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            downsampled[column] = np.where(counts > 0, sums / counts, np.nan)
+
+    return timestamps[starts], downsampled
+
+class FlipChartData():
+    """Ready-to-plot chart series of the last DAYS days of items in HISTORY_STORE.
+
+    Series are copied out of the store, downsampled to MAX_POINTS and kept
+    for the MAX_ENTRIES most recently charted items, so charting an item
+    again is a dictionary lookup. `prefetch` prepares items on a background
+    thread before they're asked for.
+    """
+
+    def __init__(self, history_store: HistoryStore, days: int = 90, max_points: int = 200, max_entries: int = 256):
+        """Initialize with no series prepared."""
+
+        self.history_store = history_store
+        self.days = days
+        self.max_points = max_points
+        self.max_entries = max_entries
+        self._series: OrderedDict[int, Dict[str, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def series(self, item_id: int) -> Dict[str, np.ndarray]:
+        """Return ITEM_ID's `utc_timestamp` (as datetime64) and CHART_COLUMNS arrays."""
+
+        with self._lock:
+            series = self._series.get(item_id)
+            if series is not None:
+                self._series.move_to_end(item_id)
+                return series
+
+        series = self._prepare(item_id)
+        with self._lock:
+            self._series[item_id] = series
+            while len(self._series) > self.max_entries:
+                self._series.popitem(last=False)
+
+        return series
+
+    def prefetch(self, item_ids: Iterable[int]) -> threading.Thread:
+        """Prepare ITEM_IDS' series on a daemon thread, in order; return the thread."""
+
+        item_ids = list(item_ids)[:self.max_entries]
+
+        def _prefetch():
+            for item_id in item_ids:
+                try:
+                    self.series(item_id)
+                except Exception as e:
+                    logger.error(f"Error preparing chart of {item_id}: {e}")
+
+        thread = threading.Thread(target=_prefetch, name="chart-prefetch", daemon=True)
+        thread.start()
+
+        return thread
+
+    def _prepare(self, item_id: int) -> Dict[str, np.ndarray]:
+        """Return ITEM_ID's series, read from the store."""
+
+        stored = self.history_store.series(item_id, ["utc_timestamp"] + CHART_COLUMNS, last=self.days)
+        timestamps, columns = downsample(stored["utc_timestamp"], {column: np.array(stored[column]) for column in CHART_COLUMNS}, self.max_points)
+
+        return {"utc_timestamp": timestamps.astype("datetime64[s]"), **columns}
+
+class FlipChart():
+    """One figure of price, listings and volume history, redrawn in place for each item.
+
+    `figure` is a plotly FigureWidget to display once; `show` swaps its
+    traces' data for another item's series from CHART_DATA instead of
+    building a new figure.
+    """
+
+    def __init__(self, chart_data: FlipChartData):
+        """Initialize an empty figure."""
+
+        # Only the notebook needs plotly
+        import plotly.graph_objects
+        from plotly.subplots import make_subplots
+
+        self.chart_data = chart_data
+        figure = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.02)
+        for _, name, row, trace_type in CHART_TRACES:
+            trace = plotly.graph_objects.Bar if trace_type == "bar" else plotly.graph_objects.Scatter
+            figure.add_trace(trace(x=[], y=[], name=name), row=row, col=1)
+        figure.update_layout(hovermode="x")
+        self.figure = plotly.graph_objects.FigureWidget(figure)
+
+    def show(self, item_id: int, title: Optional[str] = None) -> None:
+        """Redraw the figure with ITEM_ID's series, titled TITLE."""
+
+        series = self.chart_data.series(item_id)
+        with self.figure.batch_update():
+            for trace, column in zip(self.figure.data, CHART_COLUMNS):
+                trace.x = series["utc_timestamp"]
+                trace.y = series[column]
+            self.figure.layout.title.text = title
@@ -0,0 +1,262 @@
+import bisect
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from coins import Coins
+from tp_profit import copper_profit
+
+logger = logging.getLogger(__name__)
+
+# Profit (in copper) a solution must improve on the best one by to count as better
+_EPSILON = 1e-6
+
+# Largest table (items x capacity steps) the exact core solve fills before
+# falling back to branch and bound; about 1 bit per cell is kept
+DEFAULT_MAX_DP_CELLS = 200_000_000
+
+@dataclass
+class FlipPortfolio():
+    """Stacks to buy of each flip, chosen to maximize expected profit within a budget."""
+
+    # Flips with at least one stack to buy, with `plan_stacks`, `plan_invest`
+    # (copper) and `plan_profit` (copper) columns
+    flips: pd.DataFrame
+    budget: Coins
+    invest: Coins
+    # Expected profit in copper
+    profit: float
+    # Expected profit in copper of the LP relaxation; no plan can do better
+    upper_bound: float
+    # Whether the plan is proven optimal, rather than the best found within `node_limit`
+    optimal: bool
+
+def plan_flip_portfolio(flips: pd.DataFrame, budget: Coins, stack_size: int, max_item_share: Optional[float] = None, node_limit: int = 200_000, max_dp_cells: int = DEFAULT_MAX_DP_CELLS) -> FlipPortfolio:
+    """Return how many stacks of each of FLIPS to buy to maximize expected profit within BUDGET.
+
+    FLIPS is a DailyFlipReport table (coin columns in copper). Each flip can be
+    bought in whole stacks of STACK_SIZE at `buy_price`, at most
+    `max_buy_count` items, and sold at `sell_price` less trading post fees.
+    With MAX_ITEM_SHARE, no flip takes more than that fraction of BUDGET.
+
+    This is a bounded knapsack. The greedy solution by ROI and its LP
+    relaxation bound the optimum from both sides; when they differ, flips
+    that provably can't change are fixed and the rest are solved exactly by
+    dynamic programming over the budget left for them, in steps of the
+    largest common divisor of their stack costs. If that table would have
+    more than MAX_DP_CELLS cells, they are solved by branch and bound
+    instead, giving up after NODE_LIMIT nodes with the best plan found so
+    far.
+    """
+
+    capacity = budget.to_copper()
+    buy_price = flips["buy_price"].to_numpy(dtype=np.float64)
+    stack_cost = (buy_price * stack_size).astype(np.int64)
+    stack_profit = (copper_profit(buy_price, flips["sell_price"].to_numpy()) * stack_size).astype(np.float64)
+    max_stacks = np.floor(np.nan_to_num(flips["max_buy_count"].to_numpy(dtype=np.float64)) / stack_size).astype(np.int64)
+    if max_item_share is not None:
+        max_stacks = np.minimum(max_stacks, np.floor_divide(int(capacity * max_item_share), np.maximum(stack_cost, 1)))
+
+    candidates = np.flatnonzero((stack_cost > 0) & (stack_profit > 0) & (max_stacks > 0))
+    # Best profit per copper first
+    candidates = candidates[np.argsort(-stack_profit[candidates] / stack_cost[candidates], kind="stable")]
+    stacks, upper_bound, optimal = _solve_bounded_knapsack(stack_cost[candidates], stack_profit[candidates], max_stacks[candidates], capacity, node_limit, max_dp_cells)
+
+    plan = flips.iloc[candidates[stacks > 0]].copy()
+    plan["plan_stacks"] = stacks[stacks > 0]
+    plan["plan_invest"] = plan["plan_stacks"] * stack_cost[candidates[stacks > 0]]
+    plan["plan_profit"] = plan["plan_stacks"] * stack_profit[candidates[stacks > 0]]
+    plan.reset_index(drop=True, inplace=True)
+    logger.debug(f"Planned {len(plan)} of {len(flips)} flips ({'optimal' if optimal else 'best found'}, {float(plan['plan_profit'].sum()):.0f} of at most {upper_bound:.0f} copper profit)")
+
+    return FlipPortfolio(
+        flips=plan,
+        budget=budget,
+        invest=Coins(int(plan["plan_invest"].sum())),
+        profit=float(plan["plan_profit"].sum()),
+        upper_bound=upper_bound,
+        optimal=optimal)
+
+def _solve_bounded_knapsack(cost: np.ndarray, value: np.ndarray, count: np.ndarray, capacity: int, node_limit: int, max_dp_cells: int = DEFAULT_MAX_DP_CELLS) -> Tuple[np.ndarray, float, bool]:
+    """Return (units of each item, LP bound, whether optimal) maximizing total VALUE within CAPACITY.
+
+    Items must be sorted by VALUE/COST, best first, and take up to COUNT units each.
+    """
+
+    stacks = _greedy(cost, value, count, capacity)
+    lower_bound = float(stacks @ value)
+    cumulative_cost = np.concatenate([[0], np.cumsum(count * cost)])
+    cumulative_value = np.concatenate([[0.0], np.cumsum(count * value)])
+    # The break item is the first that doesn't fit whole
+    break_index = int(np.searchsorted(cumulative_cost, capacity, side="right")) - 1
+    if break_index >= len(cost):
+        return stacks, lower_bound, True
+
+    ratio = value[break_index] / cost[break_index]
+    upper_bound = float(cumulative_value[break_index] + (capacity - cumulative_cost[break_index]) * ratio)
+    if upper_bound - lower_bound <= _EPSILON:
+        return stacks, upper_bound, True
+
+    # Changing an item by one unit from its LP value moves the bound by its
+    # reduced value; if that alone falls below the greedy plan, fix the item
+    reduced_value = value - cost * ratio
+    positions = np.arange(len(cost))
+    fixed_full = (positions < break_index) & (upper_bound - reduced_value < lower_bound - _EPSILON)
+    fixed_empty = (positions > break_index) & (upper_bound + reduced_value < lower_bound - _EPSILON)
+    core = np.flatnonzero(~fixed_full & ~fixed_empty)
+
+    core_capacity = capacity - int(count[fixed_full] @ cost[fixed_full])
+    step = int(np.gcd.reduce(cost[core]))
+    parts = _binary_parts(count[core])
+    # Stack profits are whole copper, but check before relying on it
+    whole = np.array_equal(value[core], np.floor(value[core]))
+    if whole and sum(map(len, parts)) * (core_capacity // step + 1) <= max_dp_cells:
+        core_stacks, optimal = _dynamic_program(cost[core] // step, value[core], parts, core_capacity // step), True
+    else:
+        core_stacks, optimal = _branch_and_bound(cost[core], value[core], count[core], core_capacity, node_limit)
+    if core_stacks @ value[core] > lower_bound - value[fixed_full] @ count[fixed_full] + _EPSILON:
+        stacks = np.where(fixed_full, count, 0)
+        stacks[core] = core_stacks
+
+    return stacks, upper_bound, optimal
+
+def _greedy(cost: np.ndarray, value: np.ndarray, count: np.ndarray, capacity: int) -> np.ndarray:
+    """Return units of each item from filling CAPACITY in order, as many units of each as fit."""
+
+    stacks = np.zeros(len(cost), dtype=np.int64)
+    cumulative_cost = np.cumsum(count * cost)
+    # Every item before the break item fits whole
+    break_index = int(np.searchsorted(cumulative_cost, capacity, side="right"))
+    stacks[:break_index] = count[:break_index]
+    remaining = capacity - (int(cumulative_cost[break_index - 1]) if break_index else 0)
+
+    # Then fill what's left with worse items, as long as any of them fit
+    cheapest = np.minimum.accumulate(cost[::-1])[::-1]
+    for index in range(break_index, len(cost)):
+        if remaining < cheapest[index]:
+            break
+        stacks[index] = min(int(count[index]), remaining // int(cost[index]))
+        remaining -= int(stacks[index] * cost[index])
+
+    return stacks
+
+def _binary_parts(count: np.ndarray) -> List[List[int]]:
+    """Return, for each of COUNT, unit counts 1, 2, 4, ... and a remainder that add up to any number of units up to it."""
+
+    parts = []
+    for units in count.tolist():
+        item_parts = []
+        part = 1
+        while units > 0:
+            item_parts.append(min(part, units))
+            units -= part
+            part *= 2
+        parts.append(item_parts)
+
+    return parts
+
+def _dynamic_program(cost: np.ndarray, value: np.ndarray, parts: List[List[int]], capacity: int) -> np.ndarray:
+    """Return units of each item maximizing total VALUE (whole numbers) within CAPACITY, exactly.
+
+    Each item is split into PARTS (see `_binary_parts`) taken whole or not
+    at all, and the best value within every capacity up to CAPACITY is
+    kept, along with which parts were taken, packed 8 capacities a byte.
+    """
+
+    step = max(1, int(np.gcd.reduce(value.astype(np.int64))))
+    value = value.astype(np.int64) // step
+    best = np.zeros(capacity + 1, dtype=np.int32 if sum(units for item_parts in parts for units in item_parts) * int(value.max(initial=0)) < 2**31 else np.int64)
+    taken = []
+    for item, item_parts in enumerate(parts):
+        for part in item_parts:
+            part_cost = int(cost[item]) * part
+            if part_cost > capacity:
+                continue
+            with_part = best[:capacity + 1 - part_cost] + int(value[item]) * part
+            taken.append((item, part, part_cost, np.packbits(with_part > best[part_cost:])))
+            np.maximum(best[part_cost:], with_part, out=best[part_cost:])
+
+    units = np.zeros(len(parts), dtype=np.int64)
+    remaining = capacity
+    for item, part, part_cost, packed_take in reversed(taken):
+        offset = remaining - part_cost
+        if offset >= 0 and packed_take[offset >> 3] & (0x80 >> (offset & 7)):
+            units[item] += part
+            remaining -= part_cost
+
+    return units
+
+def _branch_and_bound(cost: np.ndarray, value: np.ndarray, count: np.ndarray, capacity: int, node_limit: int) -> Tuple[np.ndarray, bool]:
+    """Return (units of each item, whether optimal) maximizing total VALUE within CAPACITY.
+
+    Depth-first search taking as many units of each item as fit, then
+    backtracking one unit at a time, pruned by the LP bound of the items
+    left. Items must be sorted by VALUE/COST, best first.
+    """
+
+    best = _greedy(cost, value, count, capacity)
+    best_value = float(best @ value)
+    item_count = len(cost)
+    costs, values, counts = cost.tolist(), value.tolist(), count.tolist()
+    ratios = (value / cost).tolist()
+    cumulative_cost = np.concatenate([[0], np.cumsum(count * cost)]).tolist()
+    cumulative_value = np.concatenate([[0.0], np.cumsum(count * value)]).tolist()
+    cheapest = np.append(np.minimum.accumulate(cost[::-1])[::-1], np.iinfo(np.int64).max).tolist()
+
+    def upper_bound(index: int, remaining: int) -> float:
+        """Return the LP bound on value from items INDEX onwards within REMAINING."""
+
+        target = cumulative_cost[index] + remaining
+        last = bisect.bisect_right(cumulative_cost, target, lo=index) - 1
+        bound = cumulative_value[last] - cumulative_value[index]
+        if last < item_count:
+            bound += (target - cumulative_cost[last]) * ratios[last]
+
+        return bound
+
+    units: List[int] = [0] * item_count
+    # Items with a unit count chosen, outermost first
+    path: List[int] = []
+    index, remaining, total = 0, capacity, 0.0
+    nodes = 0
+    while nodes < node_limit:
+        nodes += 1
+        if index < item_count and remaining >= cheapest[index] and total + upper_bound(index, remaining) > best_value + _EPSILON:
+            units[index] = min(counts[index], remaining // costs[index])
+            remaining -= units[index] * costs[index]
+            total += units[index] * values[index]
+            path.append(index)
+            index += 1
+            continue
+
+        if index >= item_count or remaining < cheapest[index]:
+            if total > best_value + _EPSILON:
+                best_value = total
+                best = np.zeros(item_count, dtype=np.int64)
+                best[path] = [units[item] for item in path]
+
+        # Backtrack to the innermost item with a unit to give up that might still pay off
+        while path:
+            item = path.pop()
+            if units[item] == 0:
+                continue
+            units[item] -= 1
+            remaining += costs[item]
+            total -= values[item]
+            if total + upper_bound(item + 1, remaining) > best_value + _EPSILON:
+                path.append(item)
+                index = item + 1
+                break
+            # Giving up more units of this item only lowers the bound
+            remaining += units[item] * costs[item]
+            total -= units[item] * values[item]
+            units[item] = 0
+        else:
+            return best, True
+
+    logger.debug(f"Branch and bound stopped after {node_limit} nodes")
+
+    return best, False
@@ -0,0 +1,345 @@
+"""Scan the most sold items for profitable daily flips and write a report.
+
+Run from the repository root, once or on a schedule:
+
+    python -m flip_scan --output flips.csv
+    python -m flip_scan --output flips.parquet --every 3600
+    python -m flip_scan --metrics flips.prom --profile-analysis analysis.stacks
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from typing import Iterator, List, Optional, Tuple, TYPE_CHECKING
+from analysis_cache import AnalysisCache, analyze_history_matrices_cached
+from coins import Coins
+from daily_flip import ANALYSIS_COLUMNS, analyze_history_matrices, history_to_matrices
+from flip_screener import FlipScreener, flip_predicates
+from gw2bltc import get_top_n_sold_items
+from gw2bltc_cache import TopSoldItemsCache
+from history_store import DEFAULT_CHUNK_SIZE, HistoryStore, iter_dailies
+from item import Item
+from http_client import default_client
+from run_profile import RunProfile
+from tp_profit import break_even_sell_price, max_buy_price
+
+if TYPE_CHECKING:
+    from gw2tpdb import Gw2TpDb
+
+logger = logging.getLogger(__name__)
+
+# Exit codes; argparse exits with 2 on bad arguments
+EXIT_OK = 0
+# No items or no history could be fetched
+EXIT_FETCH_FAILED = 1
+# The report couldn't be written
+EXIT_WRITE_FAILED = 3
+# Every item was filtered out and --fail-on-no-flips was given; an empty report is still written
+EXIT_NO_FLIPS = 4
+# Anything else went wrong; see the log
+EXIT_ERROR = 5
+
+REPORT_FORMATS = ["csv", "parquet", "json"]
+
+def filter_flips(flips: pd.DataFrame, min_sell_volume: int = 0, min_buy_volume: int = 0, min_buy_count: int = 0, min_buy_price: Coins = Coins()) -> pd.DataFrame:
+    """Remove unprofitable flips."""
+
+    screen = FlipScreener(flips, presorted=False).screen(flip_predicates(min_sell_volume, min_buy_volume, min_buy_count, min_buy_price))
+    removed = [f"{count} items ({predicate} failed)" for predicate, count in screen.eliminated.items() if count]
+    if removed:
+        logger.debug("Removed " + ", ".join(removed))
+
+    return screen.flips
+
+def sort_and_format_flips(flips: pd.DataFrame, stack_size: int) -> pd.DataFrame:
+    """Rank FLIPS by return on investment and add buy plan columns for stacks of STACK_SIZE."""
+
+    flips = flips.sort_values(by="return_on_investment", ascending=False)
+    flips.reset_index(drop=True, inplace=True)
+
+    flips["roi"] = flips["return_on_investment"] - 1
+    # Coin columns are int64 copper; see `CoinArray` for formatting them
+    flips["buy_stacks"] = np.floor(flips["max_buy_count"] / stack_size).astype(np.int64)
+    flips["buy_stack_price"] = flips["buy_price"] * stack_size
+    flips["total_buy_price"] = flips["buy_price"] * stack_size * flips["buy_stacks"]
+    flips["sell_stack_price"] = flips["sell_price"] * stack_size
+    flips["invest"] = flips["buy_price"] * flips["buy_stacks"] * stack_size
+    flips["invest_cum_sum"] = flips["invest"].cumsum()
+    # How far prices can move before the flip stops paying
+    flips["break_even_sell_price"] = break_even_sell_price(flips["buy_price"].to_numpy())
+    flips["max_buy_price"] = max_buy_price(flips["sell_price"].to_numpy())
+
+    return flips
+
+def write_report(flips: pd.DataFrame, path: str, report_format: Optional[str] = None) -> bool:
+    """Write FLIPS to PATH as REPORT_FORMAT (default from PATH's extension); return false on failure.
+
+    The report is written to a temporary file first, so readers of PATH
+    never see a partial report.
+    """
+
+    report_format = report_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if report_format not in REPORT_FORMATS:
+        logger.error(f"Unknown report format '{report_format}'; expected one of {', '.join(REPORT_FORMATS)}")
+        return False
+
+    temporary_path = f"{path}.tmp"
+    try:
+        if report_format == "csv":
+            flips.to_csv(temporary_path, index=False)
+        elif report_format == "parquet":
+            flips.to_parquet(temporary_path, index=False)
+        else:
+            flips.to_json(temporary_path, orient="records", indent=1)
+        os.replace(temporary_path, path)
+    except (OSError, ImportError, ValueError) as e:
+        logger.error(f"Error writing report to '{path}': {e}")
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return False
+
+    return True
+
+def iter_daily_flips(db: "Gw2TpDb", items: List[Item], moving_average_window_size: int, chunk_size: int = DEFAULT_CHUNK_SIZE, analysis_cache: Optional[AnalysisCache] = None, profile: Optional[RunProfile] = None) -> Iterator[pd.DataFrame]:
+    """Yield DailyFlipReport tables of ITEMS with history in DB, CHUNK_SIZE items at a time.
+
+    Only each item's trailing 2 * MOVING_AVERAGE_WINDOW_SIZE days are kept,
+    and a chunk's history is dropped before the next is fetched, so memory
+    stays flat however many ITEMS there are as long as callers don't keep
+    every table (e.g. filter each one). Reports come from ANALYSIS_CACHE
+    where possible. Fetching and analysis time add up in PROFILE's
+    "history" and "analyze" stages.
+    """
+
+    profile = profile or RunProfile()
+    items_by_id = {item.id: item for item in items}
+    days = moving_average_window_size*2
+    chunks = iter_dailies(db, list(items_by_id), chunk_size, last_days=days)
+    while True:
+        # With auto_update, the database may fetch from the network too
+        with profile.stage("history"):
+            entries = next(chunks, None)
+        if entries is None:
+            return
+
+        chunk_items = [items_by_id[item_id] for item_id in entries if item_id in items_by_id]
+        if not chunk_items:
+            continue
+        with profile.stage("analyze", len(chunk_items)):
+            history = history_to_matrices(chunk_items, entries, days, ANALYSIS_COLUMNS)
+            del entries
+            if analysis_cache is not None:
+                flips = analyze_history_matrices_cached(chunk_items, history, moving_average_window_size, analysis_cache)
+            else:
+                flips = analyze_history_matrices(chunk_items, history, moving_average_window_size)
+        yield flips
+
+class FlipScanner():
+    """Fetches, analyzes, filters and ranks the top N_ITEMS most sold items.
+
+    Holds the database, history store and caches between scans, so later
+    scans in the same process only fetch and reanalyze what changed. With
+    CHUNK_SIZE, history is instead streamed from the database that many
+    items at a time and never stored, so memory stays flat for scans of
+    the whole trading post.
+    """
+
+    def __init__(self, n_items: int = 1000, moving_average_window_size: int = 14, stack_size: int = 250, min_buy_price: Coins = Coins(5), database_path: str = "gw2trader.sqlite", history_path: str = "history", items_cache_path: str = "gw2bltc.sqlite", analysis_cache_path: Optional[str] = "analysis.sqlite", chunk_size: Optional[int] = None):
+        """Initialize a scanner that opens its database on first scan."""
+
+        self.n_items = n_items
+        self.moving_average_window_size = moving_average_window_size
+        self.stack_size = stack_size
+        self.min_buy_price = min_buy_price
+        self.database_path = database_path
+        self.items_cache = TopSoldItemsCache(items_cache_path)
+        self.history_store = HistoryStore(history_path)
+        self.analysis_cache = AnalysisCache(path=analysis_cache_path)
+        self.chunk_size = chunk_size
+        self._db: Optional["Gw2TpDb"] = None
+
+    @property
+    def db(self) -> "Gw2TpDb":
+        """Return the trading post database, opening it on first use."""
+
+        if self._db is None:
+            # Importing gw2tpdb is slow, and --help shouldn't need it
+            from gw2tpdb import Gw2TpDb
+            self._db = Gw2TpDb(database_path=self.database_path, auto_update=True)
+
+        return self._db
+
+    def scan(self, profile: Optional[RunProfile] = None) -> Tuple[int, pd.DataFrame]:
+        """Return (exit code, ranked flips) of one scan, timing its stages in PROFILE."""
+
+        profile = profile or RunProfile()
+        http_metrics = default_client().metrics
+        http_before = http_metrics.as_dict()
+        with profile.stage("top_sold_items") as stage:
+            items = get_top_n_sold_items(self.n_items, cache=self.items_cache)
+            stage.items = len(items)
+        http_after = http_metrics.as_dict()
+        profile.count(**{f"http_{name}": http_after[name] - http_before[name] for name in ["requests", "retries", "failures", "bytes"]})
+        if not items:
+            logger.error(f"Couldn't find {self.n_items} top-sold items")
+            return EXIT_FETCH_FAILED, pd.DataFrame()
+
+        cache_before = self.analysis_cache.stats()
+        flips = self._analyze_stored(items, profile) if self.chunk_size is None else self._analyze_streamed(items, profile)
+        cache_after = self.analysis_cache.stats()
+        profile.count(**{f"analysis_cache_{name}": cache_after[name] - cache_before[name] for name in ["memory_hits", "disk_hits", "misses"]})
+        if flips is None:
+            return EXIT_FETCH_FAILED, pd.DataFrame()
+
+        with profile.stage("rank", len(flips)):
+            good_flips = sort_and_format_flips(flips, self.stack_size)
+        profile.count(flips=len(good_flips))
+        if good_flips.empty:
+            logger.info("Preconditions eliminated all candidate items. No profitable flips.")
+            return EXIT_NO_FLIPS, good_flips
+
+        logger.info(f"Found {good_flips.shape[0]} profitable flips among {len(items)} items")
+
+        return EXIT_OK, good_flips
+
+    def filter_flips(self, flips: pd.DataFrame) -> pd.DataFrame:
+        """Return FLIPS worth at least a stack with this scanner's minimums."""
+
+        return filter_flips(
+            flips,
+            min_buy_count=self.stack_size,
+            min_buy_price=self.min_buy_price,
+            # Use stack_size*10 so our min 10%-of-volume is likely to be >1 stack
+            min_buy_volume=self.stack_size*10,
+            min_sell_volume=self.stack_size*10)
+
+    def _analyze_stored(self, items: List[Item], profile: RunProfile) -> Optional[pd.DataFrame]:
+        """Return filtered flips of ITEMS after refreshing them all in the history store, or None."""
+
+        # With auto_update, the database may fetch from the network too
+        with profile.stage("history", len(items)):
+            if not self.history_store.refresh_from_db(self.db, [item.id for item in items]):
+                return None
+            items = [item for item in items if item.id in self.history_store]
+
+        with profile.stage("matrices", len(items)):
+            history = self.history_store.matrices(items, self.moving_average_window_size*2, ANALYSIS_COLUMNS)
+
+        with profile.stage("analyze", len(items)):
+            all_flips = analyze_history_matrices_cached(items, history, self.moving_average_window_size, self.analysis_cache)
+
+        with profile.stage("filter", len(all_flips)):
+            return self.filter_flips(all_flips)
+
+    def _analyze_streamed(self, items: List[Item], profile: RunProfile) -> Optional[pd.DataFrame]:
+        """Return filtered flips of ITEMS, streaming their history chunk by chunk, or None."""
+
+        chunks = []
+        for flips in iter_daily_flips(self.db, items, self.moving_average_window_size, self.chunk_size, self.analysis_cache, profile):
+            with profile.stage("filter", len(flips)):
+                chunks.append(self.filter_flips(flips))
+        if not chunks:
+            logger.error(f"No daily history for {len(items)} items")
+            return None
+
+        return pd.concat(chunks, ignore_index=True)
+
+def run(scanner: FlipScanner, output: str, report_format: Optional[str] = None, metrics_path: Optional[str] = None, samples_path: Optional[str] = None, fail_on_no_flips: bool = False) -> int:
+    """Scan once with SCANNER and write the report to OUTPUT; return the exit code.
+
+    A scan that finds no flips succeeds, unless FAIL_ON_NO_FLIPS. With
+    METRICS_PATH, also write the run's RunProfile summary there, as JSON or
+    Prometheus text by extension. With SAMPLES_PATH, sample the analysis
+    stage's call stacks and write them there in collapsed format. Neither
+    failing changes the exit code.
+    """
+
+    profile = RunProfile(sampled_stages=["analyze"] if samples_path else [])
+    try:
+        exit_code, flips = scanner.scan(profile)
+        if exit_code in (EXIT_OK, EXIT_NO_FLIPS):
+            with profile.stage("write_report", len(flips)):
+                if not write_report(flips, output, report_format):
+                    exit_code = EXIT_WRITE_FAILED
+        if exit_code == EXIT_NO_FLIPS and not fail_on_no_flips:
+            exit_code = EXIT_OK
+    except Exception:
+        logger.exception("Error scanning flips")
+        exit_code = EXIT_ERROR
+    profile.log()
+    logger.info(f"Scan finished in {profile.summary()['wall_seconds']:.1f}s with exit code {exit_code}")
+
+    profile.count(exit_code=exit_code)
+    if metrics_path is not None:
+        profile.write(metrics_path)
+    if samples_path is not None and "analyze" in profile.samplers:
+        try:
+            profile.samplers["analyze"].write_collapsed(samples_path)
+        except OSError as e:
+            logger.error(f"Error writing analysis samples to '{samples_path}': {e}")
+
+    return exit_code
+
+def run_every(scanner: FlipScanner, interval_seconds: float, output: str, report_format: Optional[str] = None, stop: Optional[threading.Event] = None, metrics_path: Optional[str] = None, samples_path: Optional[str] = None, fail_on_no_flips: bool = False) -> int:
+    """Scan every INTERVAL_SECONDS until STOP is set or interrupted; return the last exit code."""
+
+    stop = stop or threading.Event()
+    exit_code = EXIT_OK
+    try:
+        while not stop.is_set():
+            start = time.monotonic()
+            exit_code = run(scanner, output, report_format, metrics_path, samples_path, fail_on_no_flips)
+            stop.wait(max(0, interval_seconds - (time.monotonic() - start)))
+    except KeyboardInterrupt:
+        logger.info("Interrupted; stopping")
+
+    return exit_code
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line; return the exit code."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", default="flips.csv", help="report path (default: %(default)s)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, help="report format (default: from the output's extension)")
+    parser.add_argument("--items", type=int, default=1000, help="number of most sold items to scan (default: %(default)s)")
+    parser.add_argument("--window", type=int, default=14, help="moving average window in days (default: %(default)s)")
+    parser.add_argument("--stack-size", type=int, default=250, help="items per stack (default: %(default)s)")
+    parser.add_argument("--min-buy-price", type=int, default=5, help="minimum buy price in copper (default: %(default)s)")
+    parser.add_argument("--database", default="gw2trader.sqlite", help="trading post database (default: %(default)s)")
+    parser.add_argument("--history", default="history", help="history store directory (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, metavar="ITEMS", help="stream history this many items at a time instead of storing it, for scans of many items")
+    parser.add_argument("--metrics", metavar="PATH", help="write run metrics to PATH, as JSON (.json) or Prometheus text (.prom)")
+    parser.add_argument("--profile-analysis", metavar="PATH", help="sample the analysis stage's call stacks to PATH, in collapsed (flame graph) format")
+    parser.add_argument("--fail-on-no-flips", action="store_true", help=f"exit with {EXIT_NO_FLIPS} when every item is filtered out")
+    parser.add_argument("--every", type=float, metavar="SECONDS", help="keep running, scanning every SECONDS")
+    parser.add_argument("--log-file", help="log to this file instead of stderr")
+    parser.add_argument("--verbose", "-v", action="store_true", help="log debug messages")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-8s [%(name)s] %(message)s",
+        filename=args.log_file,
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    scanner = FlipScanner(
+        n_items=args.items,
+        moving_average_window_size=args.window,
+        stack_size=args.stack_size,
+        min_buy_price=Coins(args.min_buy_price),
+        database_path=args.database,
+        history_path=args.history,
+        chunk_size=args.chunk_size)
+    if args.every is not None:
+        return run_every(scanner, args.every, args.output, args.format, metrics_path=args.metrics, samples_path=args.profile_analysis, fail_on_no_flips=args.fail_on_no_flips)
+
+    return run(scanner, args.output, args.format, args.metrics, args.profile_analysis, args.fail_on_no_flips)
+
+if __name__ == "__main__":
+    sys.exit(main())
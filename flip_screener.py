@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+from coins import Coins
+
+if TYPE_CHECKING:
+    import ipywidgets
+
+@dataclass(frozen=True)
+class Predicate():
+    """Keeps flips whose COLUMN is at least MINIMUM and at most MAXIMUM; None is unbounded.
+
+    Flips whose COLUMN is NaN never pass.
+    """
+
+    column: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+    def __str__(self) -> str:
+        """Return e.g. 'buy_price in [5, 10000]'."""
+
+        if self.maximum is None:
+            return f"{self.column} >= {self.minimum:g}" if self.minimum is not None else f"{self.column} known"
+        if self.minimum is None:
+            return f"{self.column} <= {self.maximum:g}"
+
+        return f"{self.column} in [{self.minimum:g}, {self.maximum:g}]"
+
+    def passes(self, values: np.ndarray) -> np.ndarray:
+        """Return which of VALUES, of this predicate's column, pass it."""
+
+        passes = ~np.isnan(values)
+        if self.minimum is not None:
+            passes &= values >= self.minimum
+        if self.maximum is not None:
+            passes &= values <= self.maximum
+
+        return passes
+
+@dataclass
+class Screen():
+    """Flips that pass every predicate of a screen, and how many each predicate took out."""
+
+    # The passing rows of the screened DailyFlipReport table, index kept
+    flips: pd.DataFrame
+    # Predicate: flips it was the first, in order, to fail
+    eliminated: Dict[Predicate, int]
+    # Predicate: flips failing it, whatever else they fail
+    failing: Dict[Predicate, int]
+
+def flip_predicates(min_sell_volume: int = 0, min_buy_volume: int = 0, min_buy_count: int = 0, min_buy_price: Coins = Coins()) -> List[Predicate]:
+    """Return the predicates of profitable flips with the given minimums; see `flip_scan.filter_flips`."""
+
+    return [
+        Predicate("return_on_investment", 1),
+        Predicate("sell_volume", min_sell_volume),
+        Predicate("buy_volume", min_buy_volume),
+        Predicate("max_buy_count", min_buy_count),
+        Predicate("buy_price", min_buy_price.to_copper()),
+    ]
+
+class FlipScreener():
+    """Screens one DailyFlipReport table by any predicates, as often as needed.
+
+    With PRESORTED, each column a predicate reads is sorted once, on first
+    use, so a predicate is a pair of binary searches whose failing rows are
+    the two ends of the sort order; otherwise predicates compare every
+    value, which is cheaper when screening only once. A screen marks each
+    row with the first predicate it fails, so one mask and all elimination
+    counts come from a single pass; re-screening with new bounds never
+    reruns the analysis.
+    """
+
+    def __init__(self, flips: pd.DataFrame, presorted: bool = True):
+        """Initialize a screener of FLIPS."""
+
+        self.flips = flips
+        self.presorted = presorted
+        # Column: (row order by value, NaN last; values in that order; number not NaN)
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray, int]] = {}
+
+    def __len__(self) -> int:
+        """Return number of flips screened."""
+
+        return len(self.flips)
+
+    def sorted_column(self, column: str) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Return (row order by value, NaN last; sorted values; number not NaN) of COLUMN."""
+
+        if column not in self._sorted:
+            values = self.flips[column].to_numpy(dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            values = values[order]
+            self._sorted[column] = (order, values, len(values) - int(np.count_nonzero(np.isnan(values))))
+
+        return self._sorted[column]
+
+    def passing_range(self, predicate: Predicate) -> Tuple[int, int]:
+        """Return the [start, end) positions in PREDICATE's column's sort order that pass it."""
+
+        _, values, known = self.sorted_column(predicate.column)
+        start = int(np.searchsorted(values[:known], predicate.minimum, side="left")) if predicate.minimum is not None else 0
+        end = int(np.searchsorted(values[:known], predicate.maximum, side="right")) if predicate.maximum is not None else known
+
+        return start, max(start, end)
+
+    def ranked_predicate(self, column: str, start: int, end: int) -> Predicate:
+        """Return the predicate passing the values at positions [START, END) of COLUMN's sort order, and values equal to them."""
+
+        _, values, known = self.sorted_column(column)
+        if start >= min(end, known):
+            # Nothing passes
+            return Predicate(column, np.inf, -np.inf)
+
+        return Predicate(column, float(values[start]) if start > 0 else None, float(values[end - 1]) if end < known else None)
+
+    def mask(self, predicates: List[Predicate]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows passing every one of PREDICATES, index of the first predicate each row fails or len(PREDICATES))."""
+
+        first_failed = np.full(len(self.flips), len(predicates), dtype=np.intp)
+        # Later predicates first, so earlier ones overwrite them
+        for index in range(len(predicates) - 1, -1, -1):
+            if not self.presorted:
+                first_failed[~predicates[index].passes(self.flips[predicates[index].column].to_numpy(dtype=np.float64))] = index
+                continue
+            order = self.sorted_column(predicates[index].column)[0]
+            start, end = self.passing_range(predicates[index])
+            first_failed[order[:start]] = index
+            first_failed[order[end:]] = index
+
+        return first_failed == len(predicates), first_failed
+
+    def screen(self, predicates: List[Predicate]) -> Screen:
+        """Return the flips passing every one of PREDICATES, and per-predicate counts."""
+
+        passing, first_failed = self.mask(predicates)
+        eliminated = np.bincount(first_failed, minlength=len(predicates) + 1)
+        failing = {}
+        for predicate in predicates:
+            if self.presorted:
+                start, end = self.passing_range(predicate)
+                failing[predicate] = len(self.flips) - (end - start)
+            else:
+                failing[predicate] = len(self.flips) - int(np.count_nonzero(predicate.passes(self.flips[predicate.column].to_numpy(dtype=np.float64))))
+
+        return Screen(self.flips[passing], dict(zip(predicates, eliminated[:-1].tolist())), failing)
+
+def screener_controls(screener: FlipScreener, predicates: List[Predicate], on_screen: Callable[[Screen], None], continuous_update: bool = True) -> "ipywidgets.VBox":
+    """Return ipywidgets sliders for the bounds of PREDICATES, calling ON_SCREEN with each new screen.
+
+    Each slider runs over the ranks of its column's known values rather than
+    the values themselves, so heavy-tailed columns such as volumes are as
+    easy to set as prices. ON_SCREEN is called once with PREDICATES' screen
+    right away; without CONTINUOUS_UPDATE, only when a slider is released.
+    """
+
+    import ipywidgets as widgets
+
+    predicates = list(predicates)
+    sliders = []
+    labels = []
+
+    def label(predicate: Predicate, screen: Screen) -> str:
+        """Return the description of PREDICATE with how many flips it takes out."""
+
+        return f"{predicate}: {screen.eliminated[predicate]} eliminated, {screen.failing[predicate]} failing"
+
+    def update(index: int, ranks: Tuple[int, int]) -> None:
+        """Replace the bounds of predicate INDEX with the values at RANKS and rescreen."""
+
+        predicates[index] = screener.ranked_predicate(predicates[index].column, *ranks)
+        screen = screener.screen(predicates)
+        for predicate, predicate_label in zip(predicates, labels):
+            predicate_label.value = label(predicate, screen)
+        on_screen(screen)
+
+    for index, predicate in enumerate(predicates):
+        known = screener.sorted_column(predicate.column)[2]
+        slider = widgets.IntRangeSlider(
+            value=screener.passing_range(predicate),
+            min=0,
+            max=known,
+            description=predicate.column,
+            readout=False,
+            continuous_update=continuous_update,
+            layout={"width": "500px"},
+            style={"description_width": "160px"})
+        slider.observe(lambda change, index=index: update(index, change["new"]), names="value")
+        sliders.append(slider)
+        labels.append(widgets.Label())
+
+    screen = screener.screen(predicates)
+    for predicate, predicate_label in zip(predicates, labels):
+        predicate_label.value = label(predicate, screen)
+    on_screen(screen)
+
+    return widgets.VBox([widgets.HBox([slider, predicate_label]) for slider, predicate_label in zip(sliders, labels)])
@@ -1,69 +1,143 @@
-import re
-import requests
+import time
 import logging
+import functools
 
 from typing import List, Optional
 from item import Item
-from urllib.parse import urlencode
-from bs4 import BeautifulSoup
+from gw2bltc_cache import CachedPage, TopSoldItemsCache
+from gw2bltc_parser import DEFAULT_PARSER, PARSERS, parse_with_soup
+from http_client import HttpClient, HttpRequest, HttpResponse, default_client
 
 logger = logging.getLogger(__name__)
 
-def get_top_sold_items(count: int = 200, deadline_seconds: int = 20, page: int = 1) -> Optional[List[Item]]:
-    """Return most sold items as known by gw2bltc.com."""
+gw2bltc_url="https://www.gw2bltc.com/en/tp/search"
+
+def get_top_sold_items(count: int = 200, deadline_seconds: float = 20, page: int = 1, client: Optional[HttpClient] = None, sort: str = "sold-day", cache: Optional[TopSoldItemsCache] = None, parser: str = DEFAULT_PARSER) -> Optional[List[Item]]:
+    """Return most sold items as known by gw2bltc.com.
+
+    With a CACHE, fresh pages are returned without a request, stale ones are
+    returned while they're revalidated in the background, and expired ones
+    are revalidated with a conditional request. PARSER names the HTML parser
+    backend (see `parse_top_sold_items`). Requests go through CLIENT (default
+    `http_client.default_client()`).
+    """
+
+    cached_page = cache.get(count, sort, page) if cache is not None else None
+    if cached_page is not None:
+        if cache.is_fresh(cached_page):
+            return cached_page.items
+        if cache.is_usable_while_revalidating(cached_page):
+            cache.revalidate_in_background(count, sort, page, lambda: _fetch_top_sold_items(count, deadline_seconds, page, client, sort, cache, cached_page, parser))
+            return cached_page.items
+
+    return _fetch_top_sold_items(count, deadline_seconds, page, client, sort, cache, cached_page, parser)
+
+def _fetch_top_sold_items(count: int, deadline_seconds: float, page: int, client: Optional[HttpClient], sort: str, cache: Optional[TopSoldItemsCache], cached_page: Optional[CachedPage], parser: str) -> Optional[List[Item]]:
+    """Request a search results page, revalidating CACHED_PAGE if there is one."""
+
+    request = _top_sold_items_request(count, page, sort, cached_page)
+    response = (client or default_client()).fetch(request, deadline_seconds)
+
+    return _top_sold_items_from_response(response, count, page, sort, cache, cached_page, parser)
+
+def _top_sold_items_request(count: int, page: int, sort: str, cached_page: Optional[CachedPage]) -> HttpRequest:
+    """Return the request for a search results page, conditional on CACHED_PAGE if there is one."""
 
-    gw2bltc_url="https://www.gw2bltc.com/en/tp/search"
     params = {
         "ipg": count,
-        "sort": "sold-day",
+        "sort": sort,
         "page": page,
     }
-    url = f"{gw2bltc_url}?{urlencode(params)}"
 
-    try:
-        response = requests.get(url, timeout=deadline_seconds)
-        response.raise_for_status()
-    except requests.exceptions.Timeout as e:
-        logger.error(f"Timed out (deadline={deadline_seconds} seconds) getting '{url}': {e}")
+    headers = {}
+    if cached_page is not None and cached_page.etag:
+        headers["If-None-Match"] = cached_page.etag
+    if cached_page is not None and cached_page.last_modified:
+        headers["If-Modified-Since"] = cached_page.last_modified
+
+    return HttpRequest.get(gw2bltc_url, params, headers)
+
+def _top_sold_items_from_response(response: Optional[HttpResponse], count: int, page: int, sort: str, cache: Optional[TopSoldItemsCache], cached_page: Optional[CachedPage], parser: str) -> Optional[List[Item]]:
+    """Return items in RESPONSE to a search results page request, caching them; None if it failed."""
+
+    # The client has already logged why
+    if response is None:
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error getting '{url}': {e}")
+
+    if response.status_code == 304 and cached_page is not None:
+        logger.debug(f"Not modified: '{response.url}'")
+        cache.touch(count, sort, page)
+        return cached_page.items
+
+    if response.status_code >= 400:
+        logger.error(f"Error getting '{response.url}': {response.status_code}")
         return None
 
+    items = parse_top_sold_items(response.text, parser)
+    if cache is not None:
+        cache.put(count, sort, page, CachedPage(
+            items=items,
+            fetched_at=time.time(),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")))
+
+    return items
+
+def parse_top_sold_items(html: str, parser: str = DEFAULT_PARSER) -> List[Item]:
+    """Return items listed in a gw2bltc.com search results page.
+
+    PARSER names a backend in `gw2bltc_parser.PARSERS`. If the "stream"
+    backend, an incremental extractor run here over the whole page, finds
+    nothing, BeautifulSoup gets a second look.
+    """
+
+    items = PARSERS[parser](html)
+    if not items and parser == "stream":
+        logger.debug("Stream parser found no items; falling back to BeautifulSoup")
+        items = parse_with_soup(html)
+
+    return items
+
+def get_top_n_sold_items(n: int = 1000, page_size: int = 200, deadline_seconds: float = 30, client: Optional[HttpClient] = None, cache: Optional[TopSoldItemsCache] = None, parser: str = DEFAULT_PARSER) -> List[Item]:
+    """Return up to N most sold items from gw2bltc.com, fetching pages concurrently.
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    # Use of `body` instead of `tbody` is intentional.
-    # GW2BLTC uses invalid HTML
-    items = soup.select(".table-result body .td-name > a")
+    Pages go through CLIENT (default `http_client.default_client()`), which
+    rate-limits and retries them, and must all finish within
+    DEADLINE_SECONDS. Pages that still fail are logged and left out, so the
+    result may hold fewer than N items. Pages are looked up in CACHE first,
+    as in `get_top_sold_items`.
+    """
 
-    def _link_to_item(link) -> Item:
-        """TODO"""
+    client = client or default_client()
+    sort = "sold-day"
+    pages = range(1, -(-n // page_size) + 1)
 
-        href = link.get("href")
-        item_id = int(re.search(".*item/(\d*)", href).group(1))
-        item_name = link.contents[0]
+    results = {}
+    to_fetch = {}
+    for page in pages:
+        cached_page = cache.get(page_size, sort, page) if cache is not None else None
+        if cached_page is not None and cache.is_fresh(cached_page):
+            results[page] = cached_page.items
+        elif cached_page is not None and cache.is_usable_while_revalidating(cached_page):
+            results[page] = cached_page.items
+            cache.revalidate_in_background(page_size, sort, page, functools.partial(_fetch_top_sold_items, page_size, deadline_seconds, page, client, sort, cache, cached_page, parser))
+        else:
+            to_fetch[page] = cached_page
 
-        return Item(
-            id=item_id,
-            name=item_name)
+    responses = client.fetch_all([_top_sold_items_request(page_size, page, sort, cached_page) for page, cached_page in to_fetch.items()], deadline_seconds)
+    for (page, cached_page), response in zip(to_fetch.items(), responses):
+        results[page] = _top_sold_items_from_response(response, page_size, page, sort, cache, cached_page, parser)
 
-    return list(map(_link_to_item, items))
+    missing_pages = [page for page in pages if results[page] is None]
+    if missing_pages:
+        logger.debug(f"Some top sold items missing (pages {missing_pages})")
 
-def get_top_1000_sold_items() -> Optional[List[Item]]:
-    """Return list of top-1000 most-sold items from gw2bltc.com."""
+    return [item for page in pages if results[page] is not None for item in results[page]][:n]
 
-    top_sold_items = []
-    for top_sold_items_opt in [
-            get_top_sold_items(200, page=1),
-            get_top_sold_items(200, page=2),
-            get_top_sold_items(200, page=3),
-            get_top_sold_items(200, page=4),
-            get_top_sold_items(200, page=5),
-    ]:
-        if top_sold_items_opt is None:
-            logger.debug("Some top sold items missing")
-            return None
+def get_top_1000_sold_items(cache: Optional[TopSoldItemsCache] = None) -> Optional[List[Item]]:
+    """Return list of top-1000 most-sold items from gw2bltc.com.
 
-        top_sold_items += top_sold_items_opt
+    Return None only if no page could be fetched.
+    """
 
-    return top_sold_items
+    return get_top_n_sold_items(1000, cache=cache) or None
@@ -0,0 +1,134 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedPage():
+    """A parsed gw2bltc.com search results page and its HTTP validators."""
+
+    items: List[Item]
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+class TopSoldItemsCache():
+    """SQLite-backed cache of top-sold item pages, keyed by (count, sort, page).
+
+    Pages younger than TTL_SECONDS are fresh and used without a request.
+    Pages up to STALE_SECONDS past that are served as-is while they are
+    revalidated in the background. Older pages must be revalidated first,
+    using their ETag/Last-Modified so an unchanged page costs a 304.
+    """
+
+    def __init__(self, path: str = "gw2bltc.sqlite", ttl_seconds: float = 6 * 60 * 60, stale_seconds: float = 18 * 60 * 60):
+        """Initialize a cache stored in the SQLite database at PATH."""
+
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+        with self._connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS top_sold_items (
+                    count INTEGER NOT NULL,
+                    sort TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    items TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    PRIMARY KEY (count, sort, page)
+                )""")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a new connection in a transaction; connections aren't shared across threads."""
+
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, count: int, sort: str, page: int) -> Optional[CachedPage]:
+        """Return the cached page, however old, or None."""
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT items, fetched_at, etag, last_modified FROM top_sold_items WHERE count = ? AND sort = ? AND page = ?",
+                (count, sort, page)).fetchone()
+        if row is None:
+            return None
+
+        items, fetched_at, etag, last_modified = row
+
+        return CachedPage(
+            items=[Item(id=item_id, name=name) for item_id, name in json.loads(items)],
+            fetched_at=fetched_at,
+            etag=etag,
+            last_modified=last_modified)
+
+    def put(self, count: int, sort: str, page: int, cached_page: CachedPage) -> None:
+        """Store CACHED_PAGE."""
+
+        items = json.dumps([[item.id, item.name] for item in cached_page.items], separators=(",", ":"))
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO top_sold_items VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (count, sort, page, items, cached_page.fetched_at, cached_page.etag, cached_page.last_modified))
+
+    def touch(self, count: int, sort: str, page: int) -> None:
+        """Mark the cached page as just fetched, e.g. after a 304."""
+
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE top_sold_items SET fetched_at = ? WHERE count = ? AND sort = ? AND page = ?",
+                (time.time(), count, sort, page))
+
+    def clear(self) -> None:
+        """Remove every cached page."""
+
+        with self._connect() as connection:
+            connection.execute("DELETE FROM top_sold_items")
+
+    def is_fresh(self, cached_page: CachedPage) -> bool:
+        """Return true if CACHED_PAGE can be used without revalidation."""
+
+        return time.time() - cached_page.fetched_at < self.ttl_seconds
+
+    def is_usable_while_revalidating(self, cached_page: CachedPage) -> bool:
+        """Return true if CACHED_PAGE is stale but may be served while it is revalidated."""
+
+        return time.time() - cached_page.fetched_at < self.ttl_seconds + self.stale_seconds
+
+    def revalidate_in_background(self, count: int, sort: str, page: int, revalidate: Callable[[], None]) -> None:
+        """Call REVALIDATE on a daemon thread, unless the page is already being revalidated."""
+
+        key = (count, sort, page)
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def _revalidate():
+            try:
+                revalidate()
+            except Exception as e:
+                logger.error(f"Error revalidating top sold items {key}: {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=_revalidate, name=f"gw2bltc-revalidate-{page}", daemon=True).start()
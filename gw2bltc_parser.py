@@ -0,0 +1,177 @@
+import re
+import codecs
+import logging
+
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+# Elements that never have an end tag, so are never pushed on the open-element
+# stack; the same set BeautifulSoup treats as empty
+VOID_ELEMENTS = {
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img", "input",
+    "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+}
+
+def href_to_item_id(href: str) -> int:
+    """Return the item id in a gw2bltc.com item link."""
+
+    return int(re.search(r".*item/(\d*)", href).group(1))
+
+class _OpenElement(NamedTuple):
+    """An element on the extractor's open-element stack."""
+
+    tag: Optional[str]
+    is_td_name: bool
+    is_table_result: bool
+    # Whether a strict ancestor has class `table-result`
+    in_result: bool
+    # Whether a strict ancestor is a `body` inside a `.table-result`
+    in_result_body: bool
+
+class TopSoldItemsExtractor(HTMLParser):
+    """Incrementally extract items from a gw2bltc.com search results page.
+
+    Matches the same links as the CSS selector `.table-result body .td-name
+    > a`, keeping an open-element stack like BeautifulSoup's html.parser
+    builder does, so GW2BLTC's `body` inside `table` works the same way. Feed
+    it chunks of HTML as they arrive and collect finished items with
+    `pop_items`.
+    """
+
+    def __init__(self):
+        """Initialize an extractor with nothing fed yet."""
+
+        super().__init__(convert_charrefs=True)
+        # Open elements, innermost last
+        self._stack: List[_OpenElement] = []
+        self._items = []
+        # Item id, name so far and stack depth of the link being read, if any
+        self._link_item_id = None
+        self._link_name = None
+        self._link_depth = 0
+
+    def pop_items(self) -> List[Item]:
+        """Return items found since the last call."""
+
+        items, self._items = self._items, []
+
+        return items
+
+    def handle_starttag(self, tag, attrs):
+        """Track open elements and start reading matching links."""
+
+        # `link.contents[0]` stops at the link's first child element
+        self._finish_link_name()
+
+        if tag in VOID_ELEMENTS:
+            return
+
+        classes = []
+        href = None
+        for name, value in attrs:
+            if name == "class" and value:
+                classes = value.split()
+            elif name == "href":
+                href = value
+
+        parent = self._stack[-1] if self._stack else _OpenElement(None, False, False, False, False)
+        in_result = parent.in_result or parent.is_table_result
+        in_result_body = parent.in_result_body or (parent.tag == "body" and parent.in_result)
+
+        if tag == "a" and parent.is_td_name and parent.in_result_body and self._link_item_id is None and href is not None:
+            self._link_item_id = href_to_item_id(href)
+            self._link_name = ""
+            self._link_depth = len(self._stack) + 1
+
+        self._stack.append(_OpenElement(tag, "td-name" in classes, "table-result" in classes, in_result, in_result_body))
+
+    def handle_startendtag(self, tag, attrs):
+        """Treat `<tag/>` as an element with no content."""
+
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        """Close the most recent open TAG, and anything opened inside it."""
+
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index].tag == tag:
+                del self._stack[index:]
+                break
+
+        if self._link_item_id is not None and len(self._stack) < self._link_depth:
+            self._finish_link_name()
+            self._link_item_id = None
+
+    def handle_data(self, data):
+        """Collect the text of the link being read."""
+
+        if self._link_name is not None:
+            self._link_name += data
+
+    def close(self):
+        """Finish the page, including a link left open at the end."""
+
+        super().close()
+        self._finish_link_name()
+        self._link_item_id = None
+
+    def _finish_link_name(self) -> None:
+        """Record the item for the link being read, if its name is still being collected."""
+
+        if self._link_name is not None:
+            self._items.append(Item(id=self._link_item_id, name=self._link_name))
+            self._link_name = None
+
+def iter_top_sold_items(chunks: Iterable[Union[bytes, str]], encoding: Optional[str] = None) -> Iterator[Item]:
+    """Yield items from a search results page as CHUNKS of it arrive.
+
+    Byte chunks are decoded with ENCODING (default UTF-8).
+    """
+
+    extractor = TopSoldItemsExtractor()
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from extractor.pop_items()
+    extractor.feed(decoder.decode(b"", final=True))
+    extractor.close()
+    yield from extractor.pop_items()
+
+def parse_with_stream(html: str) -> List[Item]:
+    """Return items in a search results page using the streaming extractor."""
+
+    return list(iter_top_sold_items([html]))
+
+def parse_with_soup(html: str) -> List[Item]:
+    """Return items in a search results page using BeautifulSoup."""
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    # Use of `body` instead of `tbody` is intentional.
+    # GW2BLTC uses invalid HTML
+    items = soup.select(".table-result body .td-name > a")
+
+    def _link_to_item(link) -> Item:
+        """TODO"""
+
+        href = link.get("href")
+        item_id = href_to_item_id(href)
+        item_name = link.contents[0]
+
+        return Item(
+            id=item_id,
+            name=item_name)
+
+    return list(map(_link_to_item, items))
+
+PARSERS: Dict[str, Callable[[str], List[Item]]] = {
+    "stream": parse_with_stream,
+    "soup": parse_with_soup,
+}
+DEFAULT_PARSER = "stream"
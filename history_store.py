@@ -0,0 +1,361 @@
+import os
+import time
+import shutil
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Self, Tuple, TYPE_CHECKING
+from daily_flip import HISTORY_COLUMNS, right_align, sort_history_by_timestamp
+from item import Item
+
+if TYPE_CHECKING:
+    from gw2tpdb import Gw2TpDb
+    from gw2tpdb.api.history import HistoryEntry
+
+logger = logging.getLogger(__name__)
+
+# Columns stored as int64; the rest are float64 so missing values can be NaN
+INTEGER_COLUMNS = ["id", "utc_timestamp"]
+
+# Items whose history is fetched from the database at once
+DEFAULT_CHUNK_SIZE = 1000
+
+# How old an item's latest stored day may get before its history is fetched again
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# File in a store's directory naming the directory of its current version
+CURRENT_FILE = "CURRENT"
+
+# How long a version directory may go without its index before it's taken for a crashed write and removed
+ABANDONED_WRITE_SECONDS = 60 * 60
+
+def _to_epoch_seconds(timestamps: list) -> np.ndarray:
+    """Return TIMESTAMPS (datetimes, strings or epoch seconds) as int64 epoch seconds."""
+
+    if not timestamps:
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(timestamps[0], (int, float, np.integer, np.floating)):
+        return np.asarray(timestamps, dtype=np.int64)
+    if isinstance(timestamps[0], datetime):
+        return np.fromiter((timestamp.timestamp() for timestamp in timestamps), dtype=np.float64, count=len(timestamps)).astype(np.int64)
+
+    return (pd.to_datetime(timestamps, utc=True).as_unit("s").asi8).astype(np.int64)
+
+def entries_to_columns(entries: Dict[int, List["HistoryEntry"]]) -> Dict[str, np.ndarray]:
+    """Return one array per HISTORY_COLUMNS for every entry in ENTRIES, grouped by item."""
+
+    rows = [entry for item_entries in entries.values() for entry in item_entries]
+    values = list(zip(*map(attrgetter(*HISTORY_COLUMNS), rows))) if rows else [[] for _ in HISTORY_COLUMNS]
+    item_ids = np.fromiter((item_id for item_id, item_entries in entries.items() for _ in item_entries), dtype=np.int64, count=len(rows))
+
+    columns = {}
+    for column, column_values in zip(HISTORY_COLUMNS, values):
+        if column == "utc_timestamp":
+            columns[column] = _to_epoch_seconds(list(column_values))
+        elif column == "id":
+            # Group by the key in ENTRIES, which is what callers look items up by
+            columns[column] = item_ids
+        else:
+            # None becomes NaN
+            columns[column] = np.array(column_values, dtype=np.float64)
+
+    return columns
+
+def iter_dailies(db: "Gw2TpDb", item_ids: List[int], chunk_size: int = DEFAULT_CHUNK_SIZE, last_days: Optional[int] = None) -> Iterator[Dict[int, List["HistoryEntry"]]]:
+    """Yield DB's daily history for ITEM_IDS, CHUNK_SIZE items at a time.
+
+    Each item's entries are sorted by timestamp; with LAST_DAYS, only its
+    trailing LAST_DAYS are kept, so the rest can be freed as soon as the
+    chunk is fetched. Items without history are left out, and chunks DB has
+    no history for are logged and skipped. Memory use is bounded by
+    CHUNK_SIZE, not by the number of ITEM_IDS.
+    """
+
+    failed = 0
+    for start in range(0, len(item_ids), chunk_size):
+        chunk = item_ids[start:start + chunk_size]
+        entries = db.get_dailies(chunk)
+        if entries is None:
+            logger.error(f"No daily history for items {start} to {start + len(chunk) - 1} of {len(item_ids)}")
+            failed += len(chunk)
+            continue
+
+        yield {item_id: sort_history_by_timestamp(item_entries)[-last_days if last_days else 0:] for item_id, item_entries in entries.items() if item_entries}
+
+    if failed:
+        logger.debug(f"Got no daily history for {failed} of {len(item_ids)} items")
+
+def _version_number(name: str) -> int:
+    """Return the number of version directory NAME, or 0 if NAME isn't one."""
+
+    return int(name[1:]) if name.startswith("v") and name[1:].isdigit() else 0
+
+@dataclass(frozen=True)
+class _StoreVersion():
+    """One written version of a store: its columns and the index into them."""
+
+    # Directory under the store's path, or "" for none yet
+    name: str = ""
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    item_ids: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    positions: Dict[int, int] = field(default_factory=dict)
+
+class HistoryStore():
+    """Columnar on-disk store of daily history, memory-mapped for reading.
+
+    Each of HISTORY_COLUMNS is a `.npy` file, with every item's rows stored
+    contiguously in timestamp order. An index of item ids and row offsets
+    locates an item's rows, so reading any slice of an item's series is a
+    zero-copy view of the memory map.
+
+    Every write makes a new version directory and then points CURRENT_FILE
+    at it, so readers in other processes only ever open a matching index and
+    columns. Readers in this process see one version per call. Versions are
+    whole copies: each refresh that adds rows rewrites every column, so it
+    costs time and disk in proportion to the whole store, not the rows added.
+    Concurrent writers each get their own version directory, but don't merge
+    their rows; the last to finish becomes current.
+    """
+
+    def __init__(self, path: str):
+        """Open the store in directory PATH, which may not exist yet."""
+
+        self.path = path
+        self._version = _StoreVersion()
+        # Item id: when this store last fetched its history
+        self._fetched_at: Dict[int, float] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        """Return number of items with history."""
+
+        return len(self._version.item_ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        """Return true if ITEM_ID has history in the store."""
+
+        return item_id in self._version.positions
+
+    @classmethod
+    def from_db(cls, path: str, db: "Gw2TpDb", item_ids: List[int]) -> Optional[Self]:
+        """Return a store at PATH holding DB's daily history for ITEM_IDS."""
+
+        store = cls(path)
+        if not store.refresh_from_db(db, item_ids):
+            return None
+
+        return store
+
+    def refresh_from_db(self, db: "Gw2TpDb", item_ids: List[int], chunk_size: int = DEFAULT_CHUNK_SIZE, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS) -> bool:
+        """Add DB's daily history for ITEM_IDS newer than what's stored; return false on failure.
+
+        Only items not in the store, or whose latest stored day is more than
+        MAX_AGE_SECONDS old and that this store hasn't fetched in that time,
+        are fetched. History is fetched CHUNK_SIZE items at a time and kept
+        as columns, so only one chunk's entries are alive at once; the store
+        is written once.
+        """
+
+        now = time.time()
+        stale_before = now - max_age_seconds
+        item_ids = [item_id for item_id in item_ids if self._fetched_at.get(item_id, stale_before) <= stale_before and (self.last_timestamp(item_id) or stale_before) <= stale_before]
+        if not item_ids:
+            return True
+
+        chunks = [entries_to_columns(entries) for entries in iter_dailies(db, item_ids, chunk_size)]
+        if not chunks:
+            logger.error(f"No daily history for {len(item_ids)} items")
+            return False
+        self._fetched_at.update(dict.fromkeys(item_ids, now))
+
+        self.refresh_columns({column: np.concatenate([chunk[column] for chunk in chunks]) for column in HISTORY_COLUMNS})
+
+        return True
+
+    def refresh(self, entries: Dict[int, List["HistoryEntry"]]) -> int:
+        """Add ENTRIES newer than each item's last stored day; return number of rows added."""
+
+        return self.refresh_columns(entries_to_columns(entries))
+
+    def refresh_columns(self, new_columns: Dict[str, np.ndarray]) -> int:
+        """Add rows of NEW_COLUMNS, as from `entries_to_columns`, newer than each item's last stored day; return number added."""
+
+        version = self._version
+        positions = np.searchsorted(version.item_ids, new_columns["id"])
+        stored = (positions < len(version.item_ids)) & (version.item_ids[np.minimum(positions, len(version.item_ids) - 1)] == new_columns["id"]) if len(version.item_ids) else np.zeros(len(positions), dtype=bool)
+        last_timestamps = np.full(len(positions), np.iinfo(np.int64).min)
+        if stored.any():
+            last_timestamps[stored] = version.columns["utc_timestamp"][version.offsets[positions[stored] + 1] - 1]
+        is_new = new_columns["utc_timestamp"] > last_timestamps
+        new_columns = {column: values[is_new] for column, values in new_columns.items()}
+
+        added = int(is_new.sum())
+        if added == 0:
+            return 0
+
+        columns = {column: np.concatenate([np.asarray(version.columns.get(column, np.zeros(0, dtype=new_columns[column].dtype))), new_columns[column]]) for column in HISTORY_COLUMNS}
+        order = np.lexsort((columns["utc_timestamp"], columns["id"]))
+        self._write({column: values[order] for column, values in columns.items()})
+        logger.debug(f"Added {added} history rows for {len(np.unique(new_columns['id']))} items to '{self.path}'")
+
+        return added
+
+    def last_timestamp(self, item_id: int) -> Optional[int]:
+        """Return ITEM_ID's latest stored day in epoch seconds, or None."""
+
+        version = self._version
+        position = version.positions.get(item_id)
+        if position is None:
+            return None
+
+        return int(version.columns["utc_timestamp"][version.offsets[position + 1] - 1])
+
+    def series(self, item_id: int, columns: Optional[Iterable[str]] = None, last: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return read-only views of ITEM_ID's COLUMNS (default all), oldest first.
+
+        With LAST, only the trailing LAST days are returned.
+        """
+
+        version = self._version
+        position = version.positions.get(item_id)
+        start, end = (version.offsets[position], version.offsets[position + 1]) if position is not None else (0, 0)
+        if last is not None:
+            start = max(start, end - last)
+
+        return {column: version.columns[column][start:end] for column in (columns or HISTORY_COLUMNS)}
+
+    def dataframe(self, item_id: int, columns: Optional[List[str]] = None, last: Optional[int] = None) -> pd.DataFrame:
+        """Return ITEM_ID's history like `history_to_pandas`, with UTC datetime timestamps."""
+
+        columns = columns or HISTORY_COLUMNS
+        df = pd.DataFrame(self.series(item_id, columns, last=last), columns=columns, copy=False)
+        if "utc_timestamp" in df:
+            df["utc_timestamp"] = pd.to_datetime(df["utc_timestamp"], unit="s", utc=True)
+
+        return df
+
+    def matrices(self, items: List[Item], days: int, columns: List[str]) -> Dict[str, np.ndarray]:
+        """Return an item x day matrix per column for ITEMS' trailing DAYS.
+
+        Same layout as `daily_flip.history_to_matrices`, without building any
+        per-row objects. Every item must be in the store.
+        """
+
+        version = self._version
+        rows, lengths = self._row_indices(version, items, days)
+
+        return {column: right_align(version.columns[column][rows].astype(np.float64), lengths, days) for column in columns}
+
+    def rows(self, items: List[Item], columns: List[str], days: Optional[int] = None) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Return ITEMS' rows of COLUMNS back to back, and how many rows each item has.
+
+        Each item's rows are oldest first; with DAYS, only its trailing DAYS.
+        Unlike `matrices`, items with long histories don't pad the rest.
+        Every item must be in the store.
+        """
+
+        version = self._version
+        rows, lengths = self._row_indices(version, items, days)
+
+        return {column: version.columns[column][rows] for column in columns}, lengths
+
+    @staticmethod
+    def _row_indices(version: _StoreVersion, items: List[Item], days: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return indices of ITEMS' trailing DAYS rows (all with None) in VERSION's columns, and each item's count."""
+
+        positions = np.array([version.positions[item.id] for item in items], dtype=np.intp)
+        ends = version.offsets[positions + 1]
+        starts = version.offsets[positions] if days is None else np.maximum(version.offsets[positions], ends - days)
+        lengths = ends - starts
+        rows = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+        return rows, lengths
+
+    def _load(self) -> None:
+        """Memory-map the current version's columns and index, if any."""
+
+        while True:
+            name = self._current_name()
+            if not name:
+                return
+            directory = os.path.join(self.path, name)
+            index_path = os.path.join(directory, "index.npz")
+            try:
+                with np.load(index_path) as index:
+                    item_ids = index["item_ids"]
+                    offsets = index["offsets"]
+                columns = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in HISTORY_COLUMNS}
+            except FileNotFoundError:
+                # A writer removed the version after we read its name; load the one replacing it
+                if name != self._current_name():
+                    continue
+                raise
+            break
+
+        self._version = _StoreVersion(name, columns, item_ids, offsets, {int(item_id): position for position, item_id in enumerate(item_ids)})
+
+    def _current_name(self) -> str:
+        """Return the directory of the current version under `path`, or "" if none has been written."""
+
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _write(self, columns: Dict[str, np.ndarray]) -> None:
+        """Write COLUMNS, sorted by item id and timestamp, as a new version and reload the store."""
+
+        os.makedirs(self.path, exist_ok=True)
+        item_ids, starts = np.unique(columns["id"], return_index=True)
+        offsets = np.append(starts, len(columns["id"])).astype(np.int64)
+
+        previous = self._current_name()
+        number = _version_number(previous) + 1
+        while True:
+            name = f"v{number}"
+            directory = os.path.join(self.path, name)
+            try:
+                # Fails if another writer, running or crashed, already has this version
+                os.mkdir(directory)
+                break
+            except FileExistsError:
+                number += 1
+        for column in HISTORY_COLUMNS:
+            dtype = np.int64 if column in INTEGER_COLUMNS else np.float64
+            np.save(os.path.join(directory, f"{column}.npy"), columns[column].astype(dtype))
+        np.savez(os.path.join(directory, "index.npz"), item_ids=item_ids, offsets=offsets)
+
+        # Readers switch to the new version all at once
+        temporary_path = os.path.join(self.path, f"{CURRENT_FILE}.{name}.tmp")
+        with open(temporary_path, "w") as file:
+            file.write(name)
+        os.replace(temporary_path, os.path.join(self.path, CURRENT_FILE))
+
+        self._load()
+        self._remove_old_versions(before=previous)
+
+    def _remove_old_versions(self, before: str) -> None:
+        """Remove versions older than BEFORE: finished ones, and unfinished ones left by a crashed write.
+
+        BEFORE itself is kept, as a reader that just read its name can still
+        open it, and so are newer versions other writers may still be writing.
+        """
+
+        for entry in os.listdir(self.path):
+            entry_path = os.path.join(self.path, entry)
+            if not (0 < _version_number(entry) < _version_number(before)):
+                continue
+            try:
+                finished = os.path.exists(os.path.join(entry_path, "index.npz"))
+                if finished or time.time() - os.path.getmtime(entry_path) > ABANDONED_WRITE_SECONDS:
+                    shutil.rmtree(entry_path)
+            except OSError as e:
+                # E.g. still memory-mapped on Windows; removed by a later write
+                logger.debug(f"Couldn't remove old history store version '{entry_path}': {e}")
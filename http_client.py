@@ -0,0 +1,322 @@
+import json
+import time
+import random
+import asyncio
+import bisect
+import logging
+import threading
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram's buckets; the last is unbounded
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Statuses worth retrying: rate limited, or the server is struggling
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpRequest(NamedTuple):
+    """A GET request; responses to requests with the same URL and headers are shared."""
+
+    url: str
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+    @classmethod
+    def get(cls, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> "HttpRequest":
+        """Return a request for URL with query PARAMS and HEADERS."""
+
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+
+        return cls(url, tuple(sorted((headers or {}).items())))
+
+@dataclass
+class HttpResponse():
+    """A complete response."""
+
+    url: str
+    status_code: int
+    # Case-insensitive, as HTTP header names are
+    headers: Mapping[str, str]
+    content: bytes
+    encoding: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Return the body decoded as text."""
+
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        """Return the body parsed as JSON."""
+
+        return json.loads(self.content)
+
+class HttpError(Exception):
+    """A request that failed after every retry, or ran out of time."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TokenBucket():
+    """Allows RATE requests per second on average, in bursts of up to CAPACITY.
+
+    Thread-safe and independent of any event loop: `reserve` takes a token
+    and says how long to wait before using it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """Initialize a full bucket."""
+
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; return seconds until it may be used."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+
+            return max(0.0, -self._tokens / self.rate)
+
+@dataclass
+class HttpMetrics():
+    """Counters for an HttpClient; safe to read while requests are in flight."""
+
+    # Requests sent, including retries
+    requests: int = 0
+    retries: int = 0
+    # Requests given up on
+    failures: int = 0
+    # Requests answered by an identical one already in flight
+    coalesced: int = 0
+    bytes: int = 0
+    # Requests per LATENCY_BUCKETS bucket
+    latency_counts: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **counts: int) -> None:
+        """Add COUNTS to the named counters."""
+
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def observe_latency(self, seconds: float) -> None:
+        """Count a request that took SECONDS."""
+
+        with self._lock:
+            self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return a snapshot of every counter, with the histogram keyed by bucket bound."""
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "coalesced": self.coalesced,
+                "bytes": self.bytes,
+                "latency_seconds": dict(zip(LATENCY_BUCKETS, self.latency_counts)),
+            }
+
+class HttpClient():
+    """Rate-limited, retrying HTTP client shared by the external data fetchers.
+
+    Requests run on a pool of MAX_CONCURRENCY threads over one keep-alive
+    `requests.Session`, and are awaited with asyncio so a batch can be in
+    flight at once. Each host gets a token bucket (RATE_LIMITS maps a host to
+    (requests per second, burst), else DEFAULT_RATE_LIMIT) and at most
+    MAX_PER_HOST requests in flight. 429 and 5xx responses and connection
+    errors are retried up to RETRIES times with full-jitter exponential
+    backoff, honoring Retry-After. Identical requests in flight at the same
+    time share one response.
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, Tuple[float, float]]] = None, default_rate_limit: Tuple[float, float] = (5, 10), max_concurrency: int = 8, max_per_host: int = 4, retries: int = 3, backoff_seconds: float = 0.5, max_backoff_seconds: float = 30, timeout_seconds: float = 20):
+        """Initialize a client with no connections open yet."""
+
+        self.rate_limits = dict(rate_limits or {})
+        self.default_rate_limit = default_rate_limit
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.metrics = HttpMetrics()
+
+        # requests is slow to import, so only clients that are made pay for it
+        import requests
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="http")
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        # asyncio primitives belong to one event loop, so keep them per loop
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    def close(self) -> None:
+        """Close connections and stop the request threads."""
+
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    async def get(self, request: Union[HttpRequest, str], deadline: Optional[float] = None) -> HttpResponse:
+        """Return the response to REQUEST, raising HttpError if it fails.
+
+        DEADLINE is a `time.monotonic()` time by which to give up.
+        """
+
+        request = HttpRequest(request) if isinstance(request, str) else request
+        in_flight, _ = self._state()
+        task = in_flight.get(request)
+        if task is not None:
+            self.metrics.add(coalesced=1)
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._get(request, deadline))
+        in_flight[request] = task
+        task.add_done_callback(lambda _: in_flight.pop(request, None))
+
+        return await asyncio.shield(task)
+
+    async def get_all(self, batch: Iterable[Union[HttpRequest, str]], deadline_seconds: Optional[float] = None) -> List[Optional[HttpResponse]]:
+        """Return responses to the requests in BATCH in order, None for those that failed, all within DEADLINE_SECONDS."""
+
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+
+        async def _get_or_none(request):
+            try:
+                return await self.get(request, deadline)
+            except HttpError as e:
+                logger.error(f"{e}")
+                return None
+
+        return list(await asyncio.gather(*map(_get_or_none, batch)))
+
+    def fetch(self, request: Union[HttpRequest, str], deadline_seconds: Optional[float] = None) -> Optional[HttpResponse]:
+        """Return the response to REQUEST, or None if it failed; for code without an event loop."""
+
+        return self.fetch_all([request], deadline_seconds)[0]
+
+    def fetch_all(self, batch: Iterable[Union[HttpRequest, str]], deadline_seconds: Optional[float] = None) -> List[Optional[HttpResponse]]:
+        """Return `get_all`, for code without an event loop (including notebooks, which have one running)."""
+
+        coroutine = self.get_all(list(batch), deadline_seconds)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # Can't block the running loop on itself, so run a private one
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    async def _get(self, request: HttpRequest, deadline: Optional[float]) -> HttpResponse:
+        """Send REQUEST until it succeeds, runs out of retries or passes DEADLINE."""
+
+        import requests
+
+        host = urlsplit(request.url).netloc
+        _, host_semaphores = self._state()
+        semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        bucket = self._bucket(host)
+        loop = asyncio.get_running_loop()
+
+        # The deadline may pass before the first attempt
+        response, error = None, None
+        for attempt in range(self.retries + 1):
+            wait_seconds = bucket.reserve()
+            if deadline is not None and time.monotonic() + wait_seconds >= deadline:
+                break
+            await asyncio.sleep(wait_seconds)
+
+            async with semaphore:
+                timeout_seconds = self.timeout_seconds if deadline is None else min(self.timeout_seconds, max(0.001, deadline - time.monotonic()))
+                start = time.monotonic()
+                try:
+                    response = await loop.run_in_executor(self._executor, self._send, request, timeout_seconds)
+                    error = None
+                except requests.exceptions.RequestException as e:
+                    response, error = None, e
+                self.metrics.observe_latency(time.monotonic() - start)
+                self.metrics.add(requests=1, bytes=len(response.content) if response is not None else 0)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+
+            retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+            logger.debug(f"{'Got ' + str(response.status_code) if response is not None else f'Error: {error}'} from '{request.url}' (attempt {attempt + 1})")
+            if attempt == self.retries:
+                break
+
+            backoff_seconds = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt)))
+            if retry_after.isdigit():
+                backoff_seconds = max(backoff_seconds, float(retry_after))
+            if deadline is not None and time.monotonic() + backoff_seconds >= deadline:
+                break
+            self.metrics.add(retries=1)
+            await asyncio.sleep(backoff_seconds)
+
+        self.metrics.add(failures=1)
+        raise HttpError(f"Gave up on '{request.url}'", response.status_code if response is not None else None)
+
+    def _send(self, request: HttpRequest, timeout_seconds: float) -> HttpResponse:
+        """Send REQUEST and read the whole response, on a request thread."""
+
+        import requests
+
+        with self.session.get(request.url, headers=dict(request.headers), timeout=timeout_seconds) as response:
+            return HttpResponse(
+                url=request.url,
+                status_code=response.status_code,
+                headers=requests.structures.CaseInsensitiveDict(response.headers),
+                content=response.content,
+                encoding=response.encoding)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """Return HOST's token bucket."""
+
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(*self.rate_limits.get(host, self.default_rate_limit))
+
+            return self._buckets[host]
+
+    def _state(self) -> Tuple[Dict[HttpRequest, asyncio.Future], Dict[str, asyncio.Semaphore]]:
+        """Return the running loop's (in-flight requests, per-host semaphores)."""
+
+        return self._loop_state.setdefault(asyncio.get_running_loop(), ({}, {}))
+
+_default_client: Optional[HttpClient] = None
+_default_client_lock = threading.Lock()
+
+def default_client() -> HttpClient:
+    """Return the HttpClient shared by every fetcher, creating it on first use."""
+
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient(rate_limits={
+                # Be gentle with a site run by volunteers
+                "www.gw2bltc.com": (2, 5),
+                # The API allows 600 requests per minute
+                "api.guildwars2.com": (10, 20),
+            })
+
+        return _default_client
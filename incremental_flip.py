@@ -0,0 +1,321 @@
+import pickle
+import logging
+
+import numpy as np
+import pandas as pd
+
+from operator import attrgetter
+from typing import Dict, List, Optional, Self, TYPE_CHECKING
+from daily_flip import analyze_daily_flips, daily_flip_report_table, history_to_matrices, sort_history_by_timestamp
+from item import Item
+from outliers import OutlierTracker
+
+if TYPE_CHECKING:
+    from gw2tpdb.api.history import HistoryEntry
+
+logger = logging.getLogger(__name__)
+
+# History columns kept per item, in ring buffer order
+COLUMNS = [
+    "buy_price_avg",
+    "buy_price_stdev",
+    "buy_sold",
+    "sell_price_avg",
+    "sell_price_stdev",
+    "sell_sold",
+]
+BUY_PRICE_AVG, BUY_PRICE_STDEV, BUY_SOLD, SELL_PRICE_AVG, SELL_PRICE_STDEV, SELL_SOLD = range(len(COLUMNS))
+
+# Days added to or removed from an item's running sums before they're summed afresh from its ring buffer.
+# The coin columns (buy_price, sell_price, max_invest) are floored from these
+# float sums, so a drift of one ulp can move them by a whole copper at a
+# boundary; only this periodic resum keeps them matching `analyze_daily_flips`.
+DEFAULT_RESUM_EVERY = 64
+
+# Moving-average series tracked per item
+SERIES = [
+    "buy_price_avg_-1stdev",
+    "sell_price_avg_+1stdev",
+    "buy_sold",
+    "sell_sold",
+]
+
+def _series(values: np.ndarray) -> np.ndarray:
+    """Return the moving-average series for raw history VALUES (COLUMNS on axis -2)."""
+
+    return np.stack([
+        values[..., BUY_PRICE_AVG, :] - (1 * values[..., BUY_PRICE_STDEV, :]),
+        values[..., SELL_PRICE_AVG, :] + (1 * values[..., SELL_PRICE_STDEV, :]),
+        values[..., BUY_SOLD, :],
+        values[..., SELL_SOLD, :],
+    ], axis=-2)
+
+class DailyFlipState():
+    """Running per-item state for updating daily flip reports as history arrives.
+
+    Keeps the trailing `moving_average_window_size*2` days of each item in a
+    ring buffer, plus rolling sums and sums of squares over the last
+    `moving_average_window_size` days, and an `OutlierTracker` per side of
+    the book. New daily entries update an item in O(log days), so a poll
+    that brings in one new day per item only recomputes the reports of
+    items that changed.
+
+    Adding and removing days makes running sums drift from the exact sums,
+    so each item's are summed afresh from its ring buffer once RESUM_EVERY
+    days have been added or removed. They can still differ from `analyze_daily_flips` by
+    a few ulps; use `check_consistency` and `recompute` to fall back to a
+    full recompute.
+    """
+
+    def __init__(self, moving_average_window_size: int, resum_every: int = DEFAULT_RESUM_EVERY):
+        """Initialize an empty state for MOVING_AVERAGE_WINDOW_SIZE-day averages."""
+
+        self.moving_average_window_size = moving_average_window_size
+        # Coin columns are floored from running sums; see DEFAULT_RESUM_EVERY
+        self.resum_every = resum_every
+        self.items: List[Item] = []
+        self.last_timestamps = []
+        self._rows: Dict[int, int] = {}
+        days = moving_average_window_size * 2
+        self._history = np.full((0, len(COLUMNS), days), np.nan)
+        # Ring buffer slot holding each item's oldest day (and next to be overwritten)
+        self._heads = np.zeros(0, dtype=np.intp)
+        self._sums = np.zeros((0, len(SERIES)))
+        self._sums_of_squares = np.zeros((0, len(SERIES)))
+        self._counts = np.zeros((0, len(SERIES)), dtype=np.int64)
+        # Days added to or removed from each item's running sums since they were last summed afresh
+        self._updates = np.zeros(0, dtype=np.int64)
+        # Buy and sell price outlier trackers of each item
+        self._outliers: List[List[OutlierTracker]] = []
+
+    def __len__(self) -> int:
+        """Return number of tracked items."""
+
+        return len(self.items)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Self]:
+        """Return state saved at PATH, or None if there is none."""
+
+        try:
+            with open(path, "rb") as file:
+                state = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError) as e:
+            logger.error(f"Ignoring unreadable flip state '{path}': {e}")
+            return None
+
+        if not isinstance(state, cls):
+            logger.error(f"Ignoring flip state '{path}': not a {cls.__name__}")
+            return None
+
+        return state
+
+    def save(self, path: str) -> None:
+        """Save state to PATH."""
+
+        with open(path, "wb") as file:
+            pickle.dump(self, file)
+
+    def update(self, items: List[Item], entries: Dict[int, List["HistoryEntry"]]) -> pd.DataFrame:
+        """Apply new ENTRIES for ITEMS and return DailyFlipReports for items that changed.
+
+        Only entries newer than the last one seen for an item are applied; a
+        changed copy of the latest entry replaces it. Untracked items, and
+        items with more new entries than the ring buffer holds, are recomputed
+        from scratch.
+        """
+
+        days = self.moving_average_window_size * 2
+        changed = []
+        to_recompute = []
+        for item in items:
+            history = entries.get(item.id)
+            if not history:
+                continue
+
+            row = self._rows.get(item.id)
+            if row is None:
+                to_recompute.append(item)
+                continue
+
+            last_timestamp = self.last_timestamps[row]
+            history = sort_history_by_timestamp(history[-1*days:])
+            new_entries = [entry for entry in history if entry.utc_timestamp > last_timestamp]
+            if len(new_entries) >= days:
+                to_recompute.append(item)
+                continue
+
+            latest = [entry for entry in history if entry.utc_timestamp == last_timestamp]
+            revised = bool(latest) and self._replace_latest(row, latest[-1])
+            for entry in new_entries:
+                self._append(row, entry)
+            if new_entries or revised:
+                changed.append(row)
+
+        drifted = [row for row in changed if self._updates[row] >= self.resum_every]
+        if drifted:
+            self._resum(np.array(drifted, dtype=np.intp))
+
+        if to_recompute:
+            self.recompute(to_recompute, entries)
+            changed += [self._rows[item.id] for item in to_recompute if item.id in self._rows]
+
+        logger.debug(f"Updated {len(changed)} of {len(self.items)} flip states ({len(to_recompute)} recomputed)")
+
+        return self.reports(sorted(set(changed)))
+
+    def recompute(self, items: List[Item], entries: Dict[int, List["HistoryEntry"]]) -> None:
+        """Rebuild state for ITEMS from ENTRIES, starting tracking of any new ones."""
+
+        days = self.moving_average_window_size * 2
+        items = [item for item in items if entries.get(item.id)]
+        if not items:
+            return
+
+        new_items = [item for item in items if item.id not in self._rows]
+        if new_items:
+            self._grow(new_items)
+
+        rows = np.array([self._rows[item.id] for item in items], dtype=np.intp)
+        matrices = history_to_matrices(items, entries, days, COLUMNS)
+        history = np.stack([matrices[column] for column in COLUMNS], axis=1)
+        self._history[rows] = history
+        self._heads[rows] = 0
+        for row, item, prices in zip(rows, items, history[:, [BUY_PRICE_AVG, SELL_PRICE_AVG]]):
+            self.items[row] = item
+            self.last_timestamps[row] = max(entry.utc_timestamp for entry in entries[item.id][-1*days:])
+            self._track_outliers(row, prices)
+        self._resum(rows)
+
+    def reports(self, rows: Optional[List[int]] = None) -> pd.DataFrame:
+        """Return DailyFlipReports for ROWS of the state, or for every tracked item."""
+
+        if rows is None:
+            rows = range(len(self.items))
+        rows = np.asarray(rows, dtype=np.intp)
+        moving_averages = self.moving_averages(rows)
+
+        return daily_flip_report_table(
+            [self.items[row] for row in rows],
+            buy_price=moving_averages[:, 0],
+            sell_price=moving_averages[:, 1],
+            buy_volume=moving_averages[:, 2],
+            sell_volume=moving_averages[:, 3],
+            outlier_count=np.array([sum(tracker.outlier_count() for tracker in self._outliers[row]) for row in rows], dtype=np.int64))
+
+    def moving_averages(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return item x SERIES moving averages of ROWS (default all); NaN unless the whole window is present."""
+
+        rows = slice(None) if rows is None else rows
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self._counts[rows] == self.moving_average_window_size, self._sums[rows] / self.moving_average_window_size, np.nan)
+
+    def moving_stdevs(self) -> np.ndarray:
+        """Return item x SERIES moving sample standard deviations over the window."""
+
+        window_size = self.moving_average_window_size
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variance = (self._sums_of_squares - (self._sums ** 2) / window_size) / (window_size - 1)
+            return np.where(self._counts == window_size, np.sqrt(np.maximum(variance, 0)), np.nan)
+
+    def check_consistency(self, entries: Dict[int, List["HistoryEntry"]], rtol: float = 1e-9) -> List[int]:
+        """Return ids of items whose reports disagree with `analyze_daily_flips` over ENTRIES."""
+
+        items = [item for item in self.items if entries.get(item.id)]
+        expected = analyze_daily_flips(items, entries, self.moving_average_window_size).set_index("item_id")
+        actual = self.reports([self._rows[item.id] for item in items]).set_index("item_id")
+
+        mismatched = np.zeros(len(expected), dtype=bool)
+        for column in ["return_on_investment", "max_buy_count", "max_invest", "buy_price", "sell_price", "buy_volume", "sell_volume", "outlier_count"]:
+            mismatched |= ~np.isclose(actual[column].to_numpy(dtype=np.float64), expected[column].to_numpy(dtype=np.float64), rtol=rtol, equal_nan=True)
+        item_ids = expected.index[mismatched].tolist()
+        if item_ids:
+            logger.debug(f"Flip state inconsistent for {len(item_ids)} items: {item_ids}")
+
+        return item_ids
+
+    def _grow(self, items: List[Item]) -> None:
+        """Add empty rows for untracked ITEMS."""
+
+        count = len(items)
+        for item in items:
+            self._rows[item.id] = len(self.items)
+            self.items.append(item)
+            self.last_timestamps.append(None)
+            self._outliers.append([OutlierTracker(self.moving_average_window_size) for _ in range(2)])
+        self._history = np.concatenate([self._history, np.full((count,) + self._history.shape[1:], np.nan)])
+        self._heads = np.concatenate([self._heads, np.zeros(count, dtype=np.intp)])
+        self._sums = np.concatenate([self._sums, np.zeros((count, len(SERIES)))])
+        self._sums_of_squares = np.concatenate([self._sums_of_squares, np.zeros((count, len(SERIES)))])
+        self._counts = np.concatenate([self._counts, np.zeros((count, len(SERIES)), dtype=np.int64)])
+        self._updates = np.concatenate([self._updates, np.zeros(count, dtype=np.int64)])
+
+    def _ordered_history(self, rows: np.ndarray) -> np.ndarray:
+        """Return ROWS' ring buffers ordered oldest to newest."""
+
+        days = self._history.shape[-1]
+        order = (self._heads[rows, np.newaxis] + np.arange(days)) % days
+
+        return np.take_along_axis(self._history[rows], order[:, np.newaxis, :], axis=-1)
+
+    def _resum(self, rows: np.ndarray) -> None:
+        """Sum ROWS' windows afresh from their ring buffers."""
+
+        window = _series(self._ordered_history(rows))[..., -1*self.moving_average_window_size:]
+        self._sums[rows] = np.nansum(window, axis=-1)
+        self._sums_of_squares[rows] = np.nansum(window ** 2, axis=-1)
+        self._counts[rows] = np.count_nonzero(window == window, axis=-1)
+        self._updates[rows] = 0
+
+    def _add(self, row: int, series: np.ndarray, sign: int) -> None:
+        """Add (SIGN=1) or remove (SIGN=-1) one day of SERIES values from ROW's running sums."""
+
+        present = series == series
+        self._sums[row] += np.where(present, sign * series, 0)
+        self._sums_of_squares[row] += np.where(present, sign * series ** 2, 0)
+        self._counts[row] += sign * present
+        self._updates[row] += 1
+
+    def _append(self, row: int, entry: "HistoryEntry") -> None:
+        """Push ENTRY as ROW's newest day."""
+
+        days = self._history.shape[-1]
+        head = self._heads[row]
+        values = np.array(attrgetter(*COLUMNS)(entry), dtype=np.float64)
+
+        leaving = self._history[row, :, (head - self.moving_average_window_size) % days]
+        self._add(row, _series(leaving[:, np.newaxis])[:, 0], -1)
+        self._add(row, _series(values[:, np.newaxis])[:, 0], 1)
+
+        self._history[row, :, head] = values
+        self._heads[row] = (head + 1) % days
+        self.last_timestamps[row] = entry.utc_timestamp
+        for tracker, price in zip(self._outliers[row], values[[BUY_PRICE_AVG, SELL_PRICE_AVG]]):
+            tracker.push(price)
+
+    def _replace_latest(self, row: int, entry: "HistoryEntry") -> bool:
+        """Replace ROW's newest day with ENTRY; return whether it changed."""
+
+        days = self._history.shape[-1]
+        newest = (self._heads[row] - 1) % days
+        values = np.array(attrgetter(*COLUMNS)(entry), dtype=np.float64)
+        if np.array_equal(self._history[row, :, newest], values, equal_nan=True):
+            return False
+
+        self._add(row, _series(self._history[row, :, newest][:, np.newaxis])[:, 0], -1)
+        self._add(row, _series(values[:, np.newaxis])[:, 0], 1)
+        self._history[row, :, newest] = values
+        # Revisions are rare, so replay the buffer rather than undo the last push
+        self._track_outliers(row, self._ordered_history(np.array([row]))[0, [BUY_PRICE_AVG, SELL_PRICE_AVG]])
+
+        return True
+
+    def _track_outliers(self, row: int, prices: np.ndarray) -> None:
+        """Restart ROW's outlier trackers from its buy and sell PRICES, oldest day first."""
+
+        self._outliers[row] = [OutlierTracker(self.moving_average_window_size) for _ in range(2)]
+        for tracker, side in zip(self._outliers[row], prices):
+            for price in side:
+                tracker.push(price)
@@ -0,0 +1,238 @@
+"""Look up items by id or name without network requests.
+
+Run from the repository root:
+
+    python -m item_index --update        # fetch every tradable item once
+    python -m item_index "coffee beans"  # search the saved index
+"""
+
+import sys
+import bisect
+import argparse
+import logging
+
+import numpy as np
+
+from typing import Dict, Iterable, List, Optional, Self, Tuple, TYPE_CHECKING
+from item import Item
+
+if TYPE_CHECKING:
+    from http_client import HttpClient
+
+logger = logging.getLogger(__name__)
+
+gw2_api_url = "https://api.guildwars2.com/v2"
+
+# Most ids the items API accepts per request
+MAX_IDS_PER_REQUEST = 200
+
+def normalize_name(name: str) -> str:
+    """Return NAME case-folded with runs of whitespace collapsed, for matching."""
+
+    return " ".join(name.casefold().split())
+
+def trigrams(name: str) -> List[str]:
+    """Return the distinct three-letter substrings of normalized NAME, padded so word starts count double."""
+
+    padded = f"  {normalize_name(name)} "
+
+    return list(dict.fromkeys(padded[index:index + 3] for index in range(len(padded) - 2)))
+
+class ItemIndex():
+    """Items by id, and by name prefix or similarity.
+
+    Ids are kept in one int32 array and names as interned strings, with a
+    dict from id to position for constant-time lookup. Normalized names are
+    also kept sorted for prefix search, and each trigram maps to an array of
+    the sorted positions of names containing it, so a fuzzy search only
+    touches the names sharing a trigram with the query.
+    """
+
+    def __init__(self, items: Iterable[Item] = ()):
+        """Initialize an index of ITEMS; later items replace earlier ones with the same id."""
+
+        names_by_id = {item.id: item.name for item in items}
+        self._ids = np.fromiter(names_by_id.keys(), dtype=np.int32, count=len(names_by_id))
+        self._names = [sys.intern(name) for name in names_by_id.values()]
+        self._positions = {item_id: position for position, item_id in enumerate(names_by_id)}
+
+        normalized = [normalize_name(name) for name in self._names]
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        self._sorted_names = [normalized[position] for position in order]
+        self._sorted_positions = np.array(order, dtype=np.int32)
+
+        postings: Dict[str, List[int]] = {}
+        self._trigram_counts = np.zeros(len(self._names), dtype=np.int32)
+        for position, name in enumerate(self._names):
+            name_trigrams = trigrams(name)
+            self._trigram_counts[position] = len(name_trigrams)
+            for trigram in name_trigrams:
+                postings.setdefault(trigram, []).append(position)
+        self._postings = {trigram: np.array(positions, dtype=np.int32) for trigram, positions in postings.items()}
+
+    def __len__(self) -> int:
+        """Return number of items."""
+
+        return len(self._names)
+
+    def __contains__(self, item_id: int) -> bool:
+        """Return true if ITEM_ID is indexed."""
+
+        return item_id in self._positions
+
+    def __getitem__(self, item_id: int) -> Item:
+        """Return the item with ITEM_ID, raising KeyError if it isn't indexed."""
+
+        return self._item(self._positions[item_id])
+
+    def __iter__(self):
+        """Iterate over every item."""
+
+        return map(self._item, range(len(self)))
+
+    def get(self, item_id: int) -> Optional[Item]:
+        """Return the item with ITEM_ID, or None."""
+
+        position = self._positions.get(item_id)
+
+        return self._item(position) if position is not None else None
+
+    def with_items(self, items: Iterable[Item]) -> Self:
+        """Return an index of this index's items and ITEMS, which take precedence."""
+
+        return ItemIndex([*self, *items])
+
+    def starting_with(self, prefix: str, limit: int = 10) -> List[Item]:
+        """Return up to LIMIT items whose names start with PREFIX, ignoring case, shortest first."""
+
+        prefix = normalize_name(prefix)
+        start = bisect.bisect_left(self._sorted_names, prefix)
+        end = bisect.bisect_left(self._sorted_names, prefix + "\U0010ffff", lo=start)
+        positions = sorted(self._sorted_positions[start:end], key=lambda position: (len(self._names[position]), self._names[position]))
+
+        return [self._item(position) for position in positions[:limit]]
+
+    def similar_to(self, query: str, limit: int = 10, min_similarity: float = 0.4) -> List[Tuple[Item, float]]:
+        """Return up to LIMIT (item, similarity) whose names share trigrams with QUERY, most similar first.
+
+        Similarity is the Dice coefficient of the trigram sets, from 0 to 1;
+        pairs under MIN_SIMILARITY are left out.
+        """
+
+        query_trigrams = trigrams(query)
+        postings = [self._postings[trigram] for trigram in query_trigrams if trigram in self._postings]
+        if not postings:
+            return []
+
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        similarities = 2 * shared / (len(query_trigrams) + self._trigram_counts[candidates])
+        keep = similarities >= min_similarity
+        candidates, similarities = candidates[keep], similarities[keep]
+        if len(candidates) > limit:
+            best = np.argpartition(-similarities, limit - 1)[:limit]
+            candidates, similarities = candidates[best], similarities[best]
+        order = np.lexsort((candidates, -similarities))
+
+        return [(self._item(candidates[index]), float(similarities[index])) for index in order]
+
+    def search(self, query: str, limit: int = 10) -> List[Item]:
+        """Return up to LIMIT items best matching QUERY: an id, a name prefix, or a misspelled name."""
+
+        query = query.strip()
+        if query.isdigit():
+            item = self.get(int(query))
+            return [item] if item is not None else []
+
+        matches = {item.id: item for item in self.starting_with(query, limit)}
+        if len(matches) < limit:
+            for item, _ in self.similar_to(query, limit):
+                matches.setdefault(item.id, item)
+
+        return list(matches.values())[:limit]
+
+    def save(self, path: str) -> None:
+        """Write the items to PATH, an `.npz` file."""
+
+        with open(path, "wb") as file:
+            # A fixed-width string array holds any name, and loads without pickle
+            np.savez_compressed(file, ids=self._ids, names=np.array(self._names, dtype=str))
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Self]:
+        """Return the index saved at PATH, or None if there is none or it can't be read."""
+
+        try:
+            with np.load(path) as saved:
+                ids, names = saved["ids"], saved["names"].tolist()
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Error loading item index from '{path}': {e}")
+            return None
+
+        return cls(Item(id=int(item_id), name=name) for item_id, name in zip(ids, names))
+
+    def _item(self, position: int) -> Item:
+        """Return the item at POSITION."""
+
+        return Item(id=int(self._ids[position]), name=self._names[position])
+
+def get_tradable_items(client: Optional["HttpClient"] = None, deadline_seconds: float = 300) -> Optional[List[Item]]:
+    """Return every item on the trading post, from the official API, or None.
+
+    Items whose details couldn't be fetched within DEADLINE_SECONDS are left
+    out. Requests go through CLIENT (default `http_client.default_client()`).
+    """
+
+    from http_client import HttpRequest, default_client
+
+    client = client or default_client()
+    response = client.fetch(f"{gw2_api_url}/commerce/prices", deadline_seconds)
+    if response is None or response.status_code != 200:
+        logger.error(f"Error getting tradable item ids: {response.status_code if response is not None else 'no response'}")
+        return None
+
+    item_ids = response.json()
+    batches = [item_ids[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(item_ids), MAX_IDS_PER_REQUEST)]
+    items = []
+    for response in client.fetch_all([HttpRequest.get(f"{gw2_api_url}/items", {"ids": ",".join(map(str, batch))}) for batch in batches], deadline_seconds):
+        # 206: some of the ids have no details
+        if response is None or response.status_code not in (200, 206):
+            continue
+        items.extend(Item(id=record["id"], name=record["name"]) for record in response.json())
+    if len(items) < len(item_ids):
+        logger.debug(f"Got details of {len(items)} of {len(item_ids)} tradable items")
+
+    return items
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line; return the exit code."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("query", nargs="*", help="item id or (part of a) name")
+    parser.add_argument("--index", default="items.npz", help="saved index (default: %(default)s)")
+    parser.add_argument("--update", action="store_true", help="fetch every tradable item and save the index")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.update:
+        items = get_tradable_items()
+        if items is None:
+            return 1
+        index = (ItemIndex.load(args.index) or ItemIndex()).with_items(items)
+        index.save(args.index)
+        print(f"Saved {len(index)} items to {args.index}")
+    else:
+        index = ItemIndex.load(args.index)
+        if index is None:
+            print(f"No item index at {args.index}; run with --update first", file=sys.stderr)
+            return 1
+
+    if args.query:
+        for item in index.search(" ".join(args.query), args.limit):
+            print(f"{item.id:>8}  {item.name}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import time
+import logging
+import threading
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+from http_client import HttpClient, HttpRequest, default_client
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+gw2_api_url = "https://api.guildwars2.com/v2/commerce"
+
+# Most ids the trading post API accepts per request
+MAX_IDS_PER_REQUEST = 200
+
+# Values kept per item per snapshot, in ring buffer order. Depth is the
+# quantity ordered/listed within `depth_band` of the best price.
+SNAPSHOT_FIELDS = [
+    "buy_price",
+    "buy_quantity",
+    "sell_price",
+    "sell_quantity",
+    "buy_depth",
+    "sell_depth",
+]
+BUY_PRICE, BUY_QUANTITY, SELL_PRICE, SELL_QUANTITY, BUY_DEPTH, SELL_DEPTH = range(len(SNAPSHOT_FIELDS))
+
+# On-disk snapshot record; unknown values are stored as -1, and prices are
+# int64 copper like `CoinArray`
+SNAPSHOT_DTYPE = np.dtype([("utc_timestamp", "<i8"), ("id", "<i4")] + [(field, "<i8") for field in SNAPSHOT_FIELDS])
+
+class IntradayBuffer():
+    """Fixed-size ring buffer of the latest snapshots of each item.
+
+    Holds up to CAPACITY snapshots per item in preallocated arrays, so memory
+    stays bounded however long polling runs; the oldest snapshot is
+    overwritten first.
+    """
+
+    def __init__(self, item_ids: List[int], capacity: int):
+        """Initialize an empty buffer for ITEM_IDS."""
+
+        self.item_ids = list(item_ids)
+        self.capacity = capacity
+        self._rows = {item_id: row for row, item_id in enumerate(self.item_ids)}
+        self.timestamps = np.zeros((len(self.item_ids), capacity), dtype=np.int64)
+        self.values = np.full((len(self.item_ids), len(SNAPSHOT_FIELDS), capacity), np.nan)
+        # Slot the next snapshot of each item goes in
+        self._heads = np.zeros(len(self.item_ids), dtype=np.intp)
+        self._counts = np.zeros(len(self.item_ids), dtype=np.intp)
+
+    def __len__(self) -> int:
+        """Return number of items."""
+
+        return len(self.item_ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        """Return true if ITEM_ID is buffered."""
+
+        return item_id in self._rows
+
+    def row(self, item_id: int) -> int:
+        """Return ITEM_ID's row in the buffer's arrays."""
+
+        return self._rows[item_id]
+
+    def append(self, timestamp: int, item_ids: List[int], values: np.ndarray) -> None:
+        """Add a snapshot at TIMESTAMP with one row of SNAPSHOT_FIELDS VALUES per item in ITEM_IDS."""
+
+        rows = np.fromiter((self._rows[item_id] for item_id in item_ids), dtype=np.intp, count=len(item_ids))
+        heads = self._heads[rows]
+        self.timestamps[rows, heads] = timestamp
+        self.values[rows, :, heads] = values
+        self._heads[rows] = (heads + 1) % self.capacity
+        self._counts[rows] = np.minimum(self._counts[rows] + 1, self.capacity)
+
+    def latest(self) -> np.ndarray:
+        """Return item x SNAPSHOT_FIELDS values of each item's latest snapshot; NaN if it has none."""
+
+        latest = self.values[np.arange(len(self)), :, (self._heads - 1) % self.capacity]
+
+        return np.where((self._counts > 0)[:, np.newaxis], latest, np.nan)
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (item x slot timestamps, item x field x slot values), oldest first; empty slots are NaN/0."""
+
+        order = (self._heads[:, np.newaxis] + np.arange(self.capacity)) % self.capacity
+
+        return np.take_along_axis(self.timestamps, order, axis=1), np.take_along_axis(self.values, order[:, np.newaxis, :], axis=-1)
+
+class ListingsPoller():
+    """Regularly snapshots trading post prices and listings of ITEMS.
+
+    Each poll requests the prices (and, with a DEPTH_BAND, the listings) of
+    every item in batches of MAX_IDS_PER_REQUEST ids through CLIENT
+    (default `http_client.default_client()`), which rate-limits and retries
+    them, keeps the last HOURS of snapshots in an IntradayBuffer, and appends
+    them to PATH as SNAPSHOT_DTYPE records if given. A poll gives up on
+    requests still unanswered after INTERVAL_SECONDS.
+    """
+
+    def __init__(self, items: List[Item], interval_seconds: float = 300, hours: float = 24, depth_band: Optional[float] = 0.05, path: Optional[str] = None, client: Optional[HttpClient] = None, base_url: Optional[str] = None):
+        """Initialize a poller that hasn't polled yet."""
+
+        self.items = items
+        self.interval_seconds = interval_seconds
+        self.depth_band = depth_band
+        self.path = path
+        self.client = client or default_client()
+        self.base_url = base_url or gw2_api_url
+        self.buffer = IntradayBuffer([item.id for item in items], max(1, int(hours * 60 * 60 // interval_seconds)))
+
+    def poll(self) -> int:
+        """Take one snapshot of every item; return how many items it covered."""
+
+        timestamp = int(time.time())
+        item_ids = [item.id for item in self.items]
+        prices = self._get_all("prices", item_ids)
+        listings = self._get_all("listings", item_ids) if self.depth_band is not None else {}
+
+        item_ids = [item_id for item_id in item_ids if item_id in prices]
+        if not item_ids:
+            return 0
+
+        values = np.full((len(item_ids), len(SNAPSHOT_FIELDS)), np.nan)
+        for index, item_id in enumerate(item_ids):
+            price = prices[item_id]
+            values[index, BUY_PRICE] = price["buys"]["unit_price"] or np.nan
+            values[index, BUY_QUANTITY] = price["buys"]["quantity"]
+            values[index, SELL_PRICE] = price["sells"]["unit_price"] or np.nan
+            values[index, SELL_QUANTITY] = price["sells"]["quantity"]
+            if item_id in listings:
+                values[index, BUY_DEPTH], values[index, SELL_DEPTH] = _depths(listings[item_id], self.depth_band)
+
+        self.buffer.append(timestamp, item_ids, values)
+        if self.path is not None:
+            self._write(timestamp, item_ids, values)
+        logger.debug(f"Snapshot of {len(item_ids)} of {len(self.items)} items")
+
+        return len(item_ids)
+
+    def run(self, stop: threading.Event) -> None:
+        """Poll every `interval_seconds` until STOP is set."""
+
+        while not stop.is_set():
+            start = time.monotonic()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error polling listings: {e}")
+            stop.wait(max(0, self.interval_seconds - (time.monotonic() - start)))
+
+    def run_in_background(self) -> threading.Event:
+        """Poll on a daemon thread; set the returned event to stop."""
+
+        stop = threading.Event()
+        threading.Thread(target=self.run, args=(stop,), name="listings-poller", daemon=True).start()
+
+        return stop
+
+    def spreads(self) -> np.ndarray:
+        """Return each item's latest sell price less buy price, in copper."""
+
+        latest = self.buffer.latest()
+
+        return latest[:, SELL_PRICE] - latest[:, BUY_PRICE]
+
+    def spread(self, item_id: int) -> float:
+        """Return ITEM_ID's latest sell price less buy price, in copper."""
+
+        return float(self.spreads()[self.buffer.row(item_id)])
+
+    def depth(self, item_id: int) -> Tuple[float, float]:
+        """Return ITEM_ID's latest (buy, sell) depth within `depth_band` of the best prices."""
+
+        latest = self.buffer.latest()[self.buffer.row(item_id)]
+
+        return float(latest[BUY_DEPTH]), float(latest[SELL_DEPTH])
+
+    def volatilities(self, seconds: float = 60 * 60) -> np.ndarray:
+        """Return each item's sample standard deviation of mid-price log returns over the last SECONDS.
+
+        NaN for items with fewer than three snapshots in that time.
+        """
+
+        timestamps, values = self.buffer.ordered()
+        latest = timestamps.max(axis=1, initial=0)
+        recent = timestamps >= (latest - seconds)[:, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mid_prices = np.where(recent, (values[:, BUY_PRICE] + values[:, SELL_PRICE]) / 2, np.nan)
+            returns = np.diff(np.log(mid_prices), axis=1)
+        counts = np.count_nonzero(returns == returns, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.nansum(returns, axis=1) / counts
+            variances = np.nansum((returns - means[:, np.newaxis]) ** 2, axis=1) / (counts - 1)
+
+        return np.where(counts >= 2, np.sqrt(variances), np.nan)
+
+    def volatility(self, item_id: int, seconds: float = 60 * 60) -> float:
+        """Return ITEM_ID's volatility, as in `volatilities`."""
+
+        return float(self.volatilities(seconds)[self.buffer.row(item_id)])
+
+    def _get_all(self, endpoint: str, item_ids: List[int]) -> Dict[int, dict]:
+        """Return ENDPOINT's records for ITEM_IDS by id, leaving out batches that failed."""
+
+        batches = [item_ids[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(item_ids), MAX_IDS_PER_REQUEST)]
+        responses = self.client.fetch_all([HttpRequest.get(f"{self.base_url}/{endpoint}", {"ids": ",".join(map(str, batch))}) for batch in batches], self.interval_seconds)
+
+        records = {}
+        for response in responses:
+            # 404: none of the ids are on the trading post
+            if response is None or response.status_code == 404:
+                continue
+            if response.status_code >= 400:
+                logger.error(f"Error getting '{response.url}': {response.status_code}")
+                continue
+            # 206: some of the ids aren't on the trading post
+            for record in response.json():
+                records[record["id"]] = record
+
+        return records
+
+    def _write(self, timestamp: int, item_ids: List[int], values: np.ndarray) -> None:
+        """Append a snapshot to `path`."""
+
+        records = np.zeros(len(item_ids), dtype=SNAPSHOT_DTYPE)
+        records["utc_timestamp"] = timestamp
+        records["id"] = item_ids
+        for index, field in enumerate(SNAPSHOT_FIELDS):
+            records[field] = np.nan_to_num(values[:, index], nan=-1)
+        with open(self.path, "ab") as file:
+            file.write(records.tobytes())
+
+def read_snapshots(path: str) -> np.ndarray:
+    """Return every SNAPSHOT_DTYPE record appended to PATH, oldest first."""
+
+    return np.fromfile(path, dtype=SNAPSHOT_DTYPE)
+
+def _depths(listings: dict, depth_band: float) -> Tuple[int, int]:
+    """Return (buy, sell) quantity within DEPTH_BAND of the best prices in LISTINGS."""
+
+    buys, sells = listings.get("buys", []), listings.get("sells", [])
+    best_buy = max((listing["unit_price"] for listing in buys), default=0)
+    best_sell = min((listing["unit_price"] for listing in sells), default=0)
+
+    return (
+        sum(listing["quantity"] for listing in buys if listing["unit_price"] >= best_buy * (1 - depth_band)),
+        sum(listing["quantity"] for listing in sells if listing["unit_price"] <= best_sell * (1 + depth_band)))
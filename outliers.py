@@ -0,0 +1,206 @@
+import heapq
+import math
+import itertools
+
+import numpy as np
+
+from collections import Counter, deque
+from typing import Optional, Tuple
+from daily_flip import pct_change, sorted_nanquantile
+
+# Most window values sorted at once by the batch functions, to bound memory
+_MAX_CHUNK_VALUES = 1 << 22
+
+class OutlierTracker():
+    """Running outlier detection over one item's daily prices, e.g. one side of the book.
+
+    Keeps the day-over-day changes within the last HISTORY_SIZE days (default
+    twice the window) split into heaps at the ranks of the quartiles, so each
+    new price costs O(log HISTORY_SIZE) and the quartiles are read off the
+    heap tops. Counting outliers checks the last WINDOW_SIZE changes against
+    the fence. Agrees exactly with `daily_flip.outlier_counts` over the same
+    trailing days.
+    """
+
+    def __init__(self, window_size: int, iqr_factor: float = 1.5, history_size: Optional[int] = None):
+        """Initialize a tracker that has seen no prices."""
+
+        self.window_size = window_size
+        self.iqr_factor = iqr_factor
+        self.history_size = history_size or window_size * 2
+        self._last_price = math.nan
+        # Changes within the last HISTORY_SIZE days, oldest first; NaN for unknown
+        self._changes = deque(maxlen=self.history_size - 1)
+        self._quartiles = (_QuantileHeaps(0.25), _QuantileHeaps(0.75))
+
+    def __len__(self) -> int:
+        """Return number of known changes being tracked."""
+
+        return len(self._quartiles[0])
+
+    def push(self, price: float) -> None:
+        """Add the next day's PRICE; None or NaN for a missing day."""
+
+        price = math.nan if price is None else float(price)
+        try:
+            change = price / self._last_price - 1
+        except ZeroDivisionError:
+            # Same as numpy's x/0
+            change = math.nan if price == 0 or price != price else math.copysign(math.inf, price)
+        self._last_price = price
+
+        if len(self._changes) == self._changes.maxlen and self._changes[0] == self._changes[0]:
+            for heaps in self._quartiles:
+                heaps.remove(self._changes[0])
+        self._changes.append(change)
+        if change == change:
+            for heaps in self._quartiles:
+                heaps.add(change)
+
+    def quantiles(self) -> Tuple[float, float]:
+        """Return the 25th and 75th percentiles of the tracked changes, NaN if there are none."""
+
+        return self._quartiles[0].value(), self._quartiles[1].value()
+
+    def upper_fence(self) -> float:
+        """Return the change magnitude above which a change is an outlier."""
+
+        point_25_quantile, point_75_quantile = self.quantiles()
+
+        return point_75_quantile + (self.iqr_factor * (point_75_quantile - point_25_quantile))
+
+    def outlier_count(self, window_size: Optional[int] = None) -> int:
+        """Return how many of the last WINDOW_SIZE (default the tracker's) changes are outliers."""
+
+        fence = self.upper_fence()
+        if fence != fence:
+            return 0
+        window_size = window_size or self.window_size
+        changes = itertools.islice(self._changes, max(0, len(self._changes) - window_size), None)
+
+        return sum(1 for change in changes if abs(change) > fence)
+
+class _QuantileHeaps():
+    """Values split at the rank of one quantile: a max-heap of the lowest and a min-heap of the rest.
+
+    Removed values are only marked, and dropped once they reach the top of
+    their heap.
+    """
+
+    def __init__(self, quantile: float):
+        """Initialize empty heaps for QUANTILE."""
+
+        self.quantile = quantile
+        # Lower values are negated so heapq's min-heap gives their maximum
+        self._lower, self._upper = [], []
+        self._sizes = [0, 0]
+        self._removed = (Counter(), Counter())
+
+    def __len__(self) -> int:
+        """Return number of values held."""
+
+        return self._sizes[0] + self._sizes[1]
+
+    def add(self, value: float) -> None:
+        """Add VALUE."""
+
+        if self._sizes[0] and value <= -1*self._lower[0]:
+            heapq.heappush(self._lower, -1*value)
+            self._sizes[0] += 1
+        else:
+            heapq.heappush(self._upper, value)
+            self._sizes[1] += 1
+        self._rebalance()
+
+    def remove(self, value: float) -> None:
+        """Remove one VALUE, which must be held."""
+
+        # Every lower value is at most every upper one, so a value no larger than the lower maximum is in the lower heap
+        side = 0 if self._sizes[0] and value <= -1*self._lower[0] else 1
+        self._removed[side][value] += 1
+        self._sizes[side] -= 1
+        self._prune()
+        self._rebalance()
+
+    def value(self) -> float:
+        """Return the quantile of the values held, interpolating like `daily_flip.nanquantile`; NaN if there are none."""
+
+        count = len(self)
+        if count == 0:
+            return math.nan
+
+        virtual_index = (count - 1) * self.quantile
+        previous = -1*self._lower[0]
+        if not self._sizes[1]:
+            return previous
+        following = self._upper[0]
+        gamma = virtual_index - math.floor(virtual_index)
+        difference = following - previous
+
+        return following - difference * (1 - gamma) if gamma >= 0.5 else previous + difference * gamma
+
+    def _rebalance(self) -> None:
+        """Move values between heaps until the lower one ends at the quantile's rank."""
+
+        count = len(self)
+        lower_size = min(count, math.floor((count - 1) * self.quantile) + 1) if count else 0
+        while self._sizes[0] > lower_size:
+            heapq.heappush(self._upper, -1*heapq.heappop(self._lower))
+            self._sizes = [self._sizes[0] - 1, self._sizes[1] + 1]
+            self._prune()
+        while self._sizes[0] < lower_size:
+            heapq.heappush(self._lower, -1*heapq.heappop(self._upper))
+            self._sizes = [self._sizes[0] + 1, self._sizes[1] - 1]
+            self._prune()
+
+    def _prune(self) -> None:
+        """Drop removed values from the tops of both heaps."""
+
+        for heap, removed, sign in [(self._lower, self._removed[0], -1), (self._upper, self._removed[1], 1)]:
+            while heap and removed[sign*heap[0]]:
+                removed[sign*heapq.heappop(heap)] -= 1
+
+def rolling_outlier_fences(prices: np.ndarray, window_size: int, iqr_factor: float = 1.5, history_size: Optional[int] = None) -> np.ndarray:
+    """Return an item x day matrix of `OutlierTracker.upper_fence` as of each day of PRICES."""
+
+    history_size = history_size or window_size * 2
+    changes = pct_change(prices)
+    # Day t's fence comes from the changes of days t-HISTORY_SIZE+2 through t
+    padded = np.concatenate([np.full((len(changes), history_size - 2), np.nan), changes], axis=1)
+    fences = np.full(changes.shape, np.nan)
+    for rows in _row_chunks(changes.shape, history_size - 1):
+        # Sorted once for both quantiles
+        windows = np.sort(np.lib.stride_tricks.sliding_window_view(padded[rows], history_size - 1, axis=1), axis=-1).reshape(-1, history_size - 1)
+        counts = np.count_nonzero(windows == windows, axis=1)
+        point_75_quantile = sorted_nanquantile(windows, counts, 0.75)
+        point_25_quantile = sorted_nanquantile(windows, counts, 0.25)
+        with np.errstate(invalid="ignore"):
+            fences[rows] = (point_75_quantile + (iqr_factor * (point_75_quantile - point_25_quantile))).reshape(-1, changes.shape[1])
+
+    return fences
+
+def rolling_outlier_counts(prices: np.ndarray, window_size: int, iqr_factor: float = 1.5, history_size: Optional[int] = None) -> np.ndarray:
+    """Return an item x day matrix of `OutlierTracker.outlier_count` as of each day of PRICES.
+
+    The last column equals `daily_flip.outlier_counts` over each row's
+    trailing HISTORY_SIZE days.
+    """
+
+    fences = rolling_outlier_fences(prices, window_size, iqr_factor, history_size)
+    magnitudes = np.abs(pct_change(prices))
+    padded = np.concatenate([np.full((len(magnitudes), window_size - 1), np.nan), magnitudes], axis=1)
+    counts = np.zeros(magnitudes.shape, dtype=np.int64)
+    for rows in _row_chunks(magnitudes.shape, window_size):
+        windows = np.lib.stride_tricks.sliding_window_view(padded[rows], window_size, axis=1)
+        with np.errstate(invalid="ignore"):
+            counts[rows] = np.count_nonzero(windows > fences[rows, :, np.newaxis], axis=-1)
+
+    return counts
+
+def _row_chunks(shape: Tuple[int, int], window_length: int):
+    """Yield slices of rows whose sliding windows of WINDOW_LENGTH fit in _MAX_CHUNK_VALUES."""
+
+    rows, days = shape
+    chunk_rows = max(1, _MAX_CHUNK_VALUES // max(1, days * window_length))
+    for start in range(0, rows, chunk_rows):
+        yield slice(start, start + chunk_rows)
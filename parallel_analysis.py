@@ -0,0 +1,63 @@
+import os
+import logging
+
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import fields
+from typing import List, Optional
+from daily_flip import ANALYSIS_COLUMNS, DailyFlipReport, analyze_history_matrices
+from history_store import HistoryStore
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+# Store opened once per worker process by `_open_store`
+_worker_store: Optional[HistoryStore] = None
+
+def analyze_daily_flips_in_parallel(items: List[Item], store_path: str, moving_average_window_size: int, max_workers: Optional[int] = None, chunk_size: int = 2000) -> pd.DataFrame:
+    """Return a DailyFlipReport table for ITEMS, sharding them across a process pool.
+
+    Each worker memory-maps the HistoryStore at STORE_PATH, so history is
+    shared through the page cache instead of being pickled; only the items
+    and each chunk's report table cross process boundaries. ITEMS are split
+    into chunks of CHUNK_SIZE and reports come back in ITEMS order. Items
+    without stored history are skipped.
+
+    Runs serially in this process with MAX_WORKERS=1, for a single chunk, or
+    if the pool can't be started or breaks.
+    """
+
+    store = HistoryStore(store_path)
+    items = [item for item in items if item.id in store]
+    if not items:
+        return pd.DataFrame(columns=[field.name for field in fields(DailyFlipReport)])
+
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(chunks))
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_store, initargs=(store_path,)) as executor:
+                # `map` yields results in submission order, whichever worker finishes first
+                reports = list(executor.map(_analyze_chunk, chunks, [moving_average_window_size] * len(chunks)))
+            logger.debug(f"Analyzed {len(items)} items in {len(chunks)} chunks on {max_workers} processes")
+
+            return pd.concat(reports, ignore_index=True)
+        except (BrokenProcessPool, OSError) as e:
+            logger.error(f"Process pool failed, analyzing serially: {e}")
+
+    return analyze_history_matrices(items, store.matrices(items, moving_average_window_size*2, ANALYSIS_COLUMNS), moving_average_window_size)
+
+def _open_store(store_path: str) -> None:
+    """Open the HistoryStore at STORE_PATH for this worker process."""
+
+    global _worker_store
+    _worker_store = HistoryStore(store_path)
+
+def _analyze_chunk(items: List[Item], moving_average_window_size: int) -> pd.DataFrame:
+    """Return a DailyFlipReport table for ITEMS from this worker's store."""
+
+    history = _worker_store.matrices(items, moving_average_window_size*2, ANALYSIS_COLUMNS)
+
+    return analyze_history_matrices(items, history, moving_average_window_size)
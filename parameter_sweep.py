@@ -0,0 +1,131 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from itertools import product
+from typing import Dict, Iterable, List, Tuple
+from daily_flip import nanquantile, pct_change, roi_and_max_buy_count
+
+logger = logging.getLogger(__name__)
+
+# Moving-averaged history columns, whose prefix sums are shared across the sweep
+_AVERAGED_COLUMNS = [
+    "buy_price_avg",
+    "buy_price_stdev",
+    "buy_sold",
+    "sell_price_avg",
+    "sell_price_stdev",
+    "sell_sold",
+]
+# Price columns checked for outliers
+_OUTLIER_COLUMNS = [
+    "buy_price_avg",
+    "sell_price_avg",
+]
+
+SWEEP_RESULT_COLUMNS = [
+    "moving_average_window_size",
+    "buy_stdevs",
+    "sell_stdevs",
+    "outlier_iqr_factor",
+    # Items with return_on_investment > 1 and something to buy
+    "candidates",
+    # Of those, items without outliers
+    "outlier_free_candidates",
+    "mean_roi",
+    "median_roi",
+    # Total max_invest over candidates, in copper
+    "max_invest",
+]
+
+def sweep_daily_flips(history: Dict[str, np.ndarray], moving_average_window_sizes: Iterable[int], buy_stdevs: Iterable[float] = (1.0,), sell_stdevs: Iterable[float] = (1.0,), outlier_iqr_factors: Iterable[float] = (1.5,)) -> pd.DataFrame:
+    """Return one row of SWEEP_RESULT_COLUMNS per combination of the given parameters.
+
+    Each combination is analyzed like `analyze_history_matrices`: buy at the
+    moving average of `buy_price_avg` less BUY_STDEVS moving standard
+    deviations, sell at that of `sell_price_avg` plus SELL_STDEVS, counting
+    outliers with OUTLIER_IQR_FACTOR. HISTORY holds item x day matrices of
+    ANALYSIS_COLUMNS covering at least twice the largest window.
+
+    Prefix sums and percent changes are computed once; a window's averages
+    are then two lookups per item, and because an average of `avg - k*stdev`
+    is `avg_ma - k*stdev_ma`, stdev multipliers cost no extra averaging.
+    Results can differ from `analyze_history_matrices` in the last bits.
+    """
+
+    moving_average_window_sizes, buy_stdevs, sell_stdevs, outlier_iqr_factors = map(list, (moving_average_window_sizes, buy_stdevs, sell_stdevs, outlier_iqr_factors))
+    days = history["buy_price_avg"].shape[1]
+    if 2 * max(moving_average_window_sizes) > days:
+        raise ValueError(f"Sweeping a {max(moving_average_window_sizes)}-day window needs {2 * max(moving_average_window_sizes)} days of history, not {days}")
+
+    prefix_sums = {column: _prefix_sums(history[column]) for column in _AVERAGED_COLUMNS}
+    changes = {column: pct_change(history[column]) for column in _OUTLIER_COLUMNS}
+
+    rows = []
+    for window_size in moving_average_window_sizes:
+        means = {column: _latest_mean(*prefix_sums[column], window_size) for column in _AVERAGED_COLUMNS}
+        outlier_counts = _outlier_counts(changes, window_size, outlier_iqr_factors)
+        for buy_stdev, sell_stdev in product(buy_stdevs, sell_stdevs):
+            buy_price = means["buy_price_avg"] - (buy_stdev * means["buy_price_stdev"])
+            sell_price = means["sell_price_avg"] + (sell_stdev * means["sell_price_stdev"])
+            roi, max_buy_count = roi_and_max_buy_count(buy_price, sell_price, means["buy_sold"], means["sell_sold"])
+            candidates = (roi > 1.0) & (max_buy_count > 0)
+            candidate_roi = roi[candidates]
+            max_invest = float((np.floor(buy_price[candidates]) * max_buy_count[candidates]).sum())
+            for outlier_iqr_factor in outlier_iqr_factors:
+                rows.append((
+                    window_size,
+                    buy_stdev,
+                    sell_stdev,
+                    outlier_iqr_factor,
+                    int(np.count_nonzero(candidates)),
+                    int(np.count_nonzero(candidates & (outlier_counts[outlier_iqr_factor] == 0))),
+                    float(candidate_roi.mean()) if len(candidate_roi) else np.nan,
+                    float(np.median(candidate_roi)) if len(candidate_roi) else np.nan,
+                    max_invest,
+                ))
+    logger.debug(f"Swept {len(rows)} configurations over {history['buy_price_avg'].shape[0]} items")
+
+    return pd.DataFrame(rows, columns=SWEEP_RESULT_COLUMNS)
+
+def _prefix_sums(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return running sums and counts of MATRIX's present values along each row, from 0."""
+
+    present = matrix == matrix
+    sums = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(np.where(present, matrix, 0.0), axis=1, out=sums[:, 1:])
+    counts = np.zeros((matrix.shape[0], matrix.shape[1] + 1), dtype=np.int64)
+    np.cumsum(present, axis=1, out=counts[:, 1:])
+
+    return sums, counts
+
+def _latest_mean(sums: np.ndarray, counts: np.ndarray, window_size: int) -> np.ndarray:
+    """Return each row's mean over its last WINDOW_SIZE days; NaN unless all are present."""
+
+    window_sums = sums[:, -1] - sums[:, -1 - window_size]
+    window_counts = counts[:, -1] - counts[:, -1 - window_size]
+
+    return np.where(window_counts == window_size, window_sums / window_size, np.nan)
+
+def _outlier_counts(changes: Dict[str, np.ndarray], window_size: int, outlier_iqr_factors: List[float]) -> Dict[float, np.ndarray]:
+    """Return `outlier_counts` summed over price CHANGES for each of OUTLIER_IQR_FACTORS.
+
+    Like the analysis, only changes within the last `2*WINDOW_SIZE` days are
+    considered, and the last WINDOW_SIZE of them counted.
+    """
+
+    counts = {outlier_iqr_factor: 0 for outlier_iqr_factor in outlier_iqr_factors}
+    for column_changes in changes.values():
+        # The first of the last 2*WINDOW_SIZE days has no change within them
+        recent = column_changes[:, -(2 * window_size - 1):]
+        point_75_quantile = nanquantile(recent, 0.75)
+        point_25_quantile = nanquantile(recent, 0.25)
+        interquartile_range = point_75_quantile - point_25_quantile
+        magnitudes = np.abs(recent[:, -1*window_size:])
+        for outlier_iqr_factor in outlier_iqr_factors:
+            with np.errstate(invalid="ignore"):
+                outliers = magnitudes > (point_75_quantile + (outlier_iqr_factor * interquartile_range))[:, np.newaxis]
+            counts[outlier_iqr_factor] = counts[outlier_iqr_factor] + np.count_nonzero(outliers, axis=1)
+
+    return counts
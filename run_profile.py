@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Windows has no resource module; peak memory is left out there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_FORMATS = ["json", "prom"]
+
+def peak_memory_bytes() -> Optional[int]:
+    """Return the peak resident memory of this process so far, or None where unknown."""
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+@dataclass
+class StageMetrics():
+    """Time and size of one stage of a run."""
+
+    name: str
+    wall_seconds: float = 0
+    cpu_seconds: float = 0
+    # Items the stage worked on, where that's meaningful
+    items: Optional[int] = None
+    # Peak resident memory of the process when the stage ended
+    peak_memory_bytes: Optional[int] = None
+    # Times the stage was entered
+    calls: int = 0
+
+class StackSampler():
+    """Sampling profiler: records the call stack of one thread every INTERVAL_SECONDS.
+
+    Runs on its own thread and only looks at frames, so it costs the
+    profiled code little beyond the GIL hand-offs. Stacks are counted in
+    the collapsed format flame graph tools read (`a;b;c 12`).
+    """
+
+    def __init__(self, interval_seconds: float = 0.005, thread_id: Optional[int] = None):
+        """Initialize a stopped sampler of THREAD_ID (default: the calling thread)."""
+
+        self.interval_seconds = interval_seconds
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling."""
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Return the N functions seen running most often, with their sample counts."""
+
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        return leaves.most_common(n)
+
+    def write_collapsed(self, path: str) -> None:
+        """Write the sampled stacks to PATH in collapsed format."""
+
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def _sample(self) -> None:
+        """Record the sampled thread's stack until stopped."""
+
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+class RunProfile():
+    """Per-stage wall time, CPU time, item counts and peak memory of one run, and named counters.
+
+    Stages named in SAMPLED_STAGES also run under a StackSampler, kept in
+    `samplers` by stage name.
+    """
+
+    def __init__(self, sampled_stages: Iterable[str] = (), sample_interval_seconds: float = 0.005):
+        """Initialize an empty profile of a run starting now."""
+
+        self.sampled_stages = set(sampled_stages)
+        self.sample_interval_seconds = sample_interval_seconds
+        self.stages: Dict[str, StageMetrics] = {}
+        self.counters: Dict[str, float] = {}
+        self.samplers: Dict[str, StackSampler] = {}
+        self.started_at = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, items: Optional[int] = None) -> Iterator[StageMetrics]:
+        """Time the block as stage NAME working on ITEMS; the yielded metrics' `items` can be set inside.
+
+        Entering a stage again adds to its times and items.
+        """
+
+        metrics = self.stages.setdefault(name, StageMetrics(name))
+        if items is not None:
+            metrics.items = (metrics.items or 0) + items
+        sampler = None
+        if name in self.sampled_stages:
+            sampler = self.samplers.setdefault(name, StackSampler(self.sample_interval_seconds))
+            sampler.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_seconds += time.perf_counter() - wall_start
+            metrics.cpu_seconds += time.process_time() - cpu_start
+            metrics.calls += 1
+            metrics.peak_memory_bytes = peak_memory_bytes()
+            if sampler is not None:
+                sampler.stop()
+
+    def count(self, **counters: float) -> None:
+        """Add COUNTERS to the named counters."""
+
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the whole run's and every stage's metrics, and the counters, as plain data."""
+
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": time.perf_counter() - self._wall_start,
+            "cpu_seconds": time.process_time() - self._cpu_start,
+            "peak_memory_bytes": peak_memory_bytes(),
+            "stages": [asdict(metrics) for metrics in self.stages.values()],
+            "counters": dict(self.counters),
+        }
+
+    def to_json(self) -> str:
+        """Return `summary` as JSON."""
+
+        return json.dumps(self.summary(), indent=1)
+
+    def to_prometheus(self, prefix: str = "gw2trader_") -> str:
+        """Return `summary` in the Prometheus text exposition format, e.g. for node_exporter's textfile collector."""
+
+        summary = self.summary()
+        lines = []
+
+        def gauge(name: str, help_text: str, samples: List[Tuple[str, Optional[float]]]) -> None:
+            samples = [(labels, value) for labels, value in samples if value is not None]
+            if samples:
+                lines.extend([f"# HELP {prefix}{name} {help_text}", f"# TYPE {prefix}{name} gauge"])
+                lines.extend(f"{prefix}{name}{labels} {value}" for labels, value in samples)
+
+        gauge("run_started_timestamp_seconds", "When the run started.", [("", summary["started_at"])])
+        gauge("run_wall_seconds", "Wall time of the run.", [("", summary["wall_seconds"])])
+        gauge("run_cpu_seconds", "CPU time of the run.", [("", summary["cpu_seconds"])])
+        gauge("run_peak_memory_bytes", "Peak resident memory of the process.", [("", summary["peak_memory_bytes"])])
+        for field, help_text in [
+                ("wall_seconds", "Wall time of each stage."),
+                ("cpu_seconds", "CPU time of each stage."),
+                ("items", "Items each stage worked on."),
+                ("peak_memory_bytes", "Peak resident memory of the process when each stage ended.")]:
+            gauge(f"stage_{field}", help_text, [(f'{{stage="{stage["name"]}"}}', stage[field]) for stage in summary["stages"]])
+        for name, value in summary["counters"].items():
+            gauge(name, f"Run counter {name}.", [("", value)])
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, metrics_format: Optional[str] = None) -> bool:
+        """Write the summary to PATH as METRICS_FORMAT (default from PATH's extension); return false on failure.
+
+        The file is replaced atomically, so scrapers never see a partial one.
+        """
+
+        metrics_format = metrics_format or os.path.splitext(path)[1].lstrip(".").lower()
+        if metrics_format not in METRICS_FORMATS:
+            logger.error(f"Unknown metrics format '{metrics_format}'; expected one of {', '.join(METRICS_FORMATS)}")
+            return False
+
+        temporary_path = f"{path}.tmp"
+        try:
+            with open(temporary_path, "w") as file:
+                file.write(self.to_json() if metrics_format == "json" else self.to_prometheus())
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.error(f"Error writing metrics to '{path}': {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return False
+
+        return True
+
+    def log(self, level: int = logging.INFO) -> None:
+        """Log one line per stage, then the counters."""
+
+        for metrics in self.stages.values():
+            items = f", {metrics.items} items" if metrics.items is not None else ""
+            memory = f", peak {metrics.peak_memory_bytes / 2**20:.0f} MiB" if metrics.peak_memory_bytes is not None else ""
+            logger.log(level, f"Stage {metrics.name}: {metrics.wall_seconds:.3f}s wall, {metrics.cpu_seconds:.3f}s CPU{items}{memory}")
+        if self.counters:
+            logger.log(level, "Counters: " + ", ".join(f"{name}={value:g}" for name, value in self.counters.items()))
+        for name, sampler in self.samplers.items():
+            logger.log(level, f"Stage {name} hottest functions: " + ", ".join(f"{function} ({count})" for function, count in sampler.top(5)))
@@ -0,0 +1,69 @@
+import numpy as np
+
+import pytest
+
+from backtest import BACKTEST_COLUMNS, backtest_daily_flips, flip_plan_matrices
+from benchmarks.synthetic import generate_history_columns
+from daily_flip import ANALYSIS_COLUMNS, analyze_history_matrices
+from flip_screener import Predicate, flip_predicates
+
+WINDOW = 14
+ITEMS, DAYS = 60, 120
+
+@pytest.fixture
+def history():
+    items, columns = generate_history_columns(ITEMS, DAYS, seed=8, spike_rate=0.05)
+
+    return items, {column: columns[column].reshape(ITEMS, DAYS) for column in BACKTEST_COLUMNS}
+
+def test_plan_matches_the_analysis_of_the_same_days(history):
+    items, history = history
+    day = 80
+    plan = flip_plan_matrices({column: values[:, :day + 1] for column, values in history.items()}, WINDOW)
+    flips = analyze_history_matrices(items, {column: history[column][:, day + 1 - WINDOW * 2:day + 1] for column in ANALYSIS_COLUMNS}, WINDOW)
+
+    assert (plan["outlier_count"][:, -1] == flips["outlier_count"]).all()
+    assert (np.nan_to_num(plan["buy_price"][:, -1]) == flips["buy_price"]).all()
+    assert np.array_equal(plan["return_on_investment"][:, -1], flips["return_on_investment"], equal_nan=True)
+    assert np.allclose(plan["buy_volume"][:, -1], flips["buy_volume"], rtol=1e-12, equal_nan=True)
+
+def test_fills_use_only_the_previous_days_plan(history):
+    _, history = history
+    day = 60
+    result = backtest_daily_flips(history, WINDOW)
+
+    # Whatever happens after DAY doesn't change what happened up to it
+    future = {column: values.copy() for column, values in history.items()}
+    for column in future:
+        future[column][:, day + 1:] = future[column][:, day + 1:] * 3
+    changed = backtest_daily_flips(future, WINDOW)
+    assert np.array_equal(changed.bought[:, :day + 1], result.bought[:, :day + 1])
+    assert np.array_equal(changed.pnl[:, :day + 1], result.pnl[:, :day + 1])
+
+    # Day DAY's fills follow from the plan made from the days before it
+    plan = flip_plan_matrices({column: values[:, :day] for column, values in history.items()}, WINDOW, outliers=False)
+    planned = np.where(plan["return_on_investment"][:, -1] >= 1, np.nan_to_num(plan["max_buy_count"][:, -1]), 0)
+    with np.errstate(invalid="ignore"):
+        expected = np.where(history["buy_price_min"][:, day] <= plan["buy_price"][:, -1], np.minimum(planned, history["buy_sold"][:, day] // 10), 0)
+    assert expected.any()
+    assert np.array_equal(result.bought[:, day], expected)
+
+def test_fills_are_capped_at_a_tenth_of_the_days_volume(history):
+    _, history = history
+    # Every buy order fills, on days with few trades
+    history["buy_price_min"][:] = 0
+    history["buy_sold"][:, 1::2] = 25
+    result = backtest_daily_flips(history, WINDOW)
+
+    assert (result.bought <= history["buy_sold"] // 10).all()
+    assert (result.bought[:, 1::2] <= 2).all()
+    assert (result.bought[:, 1::2] == 2).any()
+
+def test_predicates_screen_what_is_traded(history):
+    _, history = history
+    everything = backtest_daily_flips(history, WINDOW)
+    outlier_free = backtest_daily_flips(history, WINDOW, predicates=flip_predicates() + [Predicate("outlier_count", maximum=0)])
+    nothing = backtest_daily_flips(history, WINDOW, predicates=flip_predicates(min_buy_count=10**9))
+
+    assert 0 < np.count_nonzero(outlier_free.bought) < np.count_nonzero(everything.bought)
+    assert not nothing.bought.any() and nothing.total_pnl == 0
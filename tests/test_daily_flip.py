@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from benchmarks.synthetic import entries_from_columns, generate_history_columns
+from daily_flip import ANALYSIS_COLUMNS, analysis_to_daily_flip_report, analyze_daily_flip, analyze_daily_flips, analyze_history_matrices, daily_flip_reports_to_pandas, history_to_matrices
+
+WINDOW = 14
+# Shorter than the window, between one and two windows, exactly two, and longer
+DAY_COUNTS = [5, 20, 28, 40]
+
+@pytest.fixture(scope="module")
+def dailies():
+    item_count, day_count = 24, max(DAY_COUNTS)
+    items, columns = generate_history_columns(item_count, day_count, seed=7, spike_rate=0.05)
+    rng = np.random.default_rng(7)
+    # A third of the items have days without trades at a price, and a third days with no price at all
+    kind = np.repeat(np.arange(item_count) % 3, day_count)
+    for column in ["buy_price_avg", "sell_price_avg"]:
+        columns[column][(kind == 1) & (rng.random(item_count * day_count) < 0.1)] = 0.0
+    gaps = (kind == 2) & (rng.random(item_count * day_count) < 0.05)
+    for column in ["buy_price_avg", "buy_price_stdev", "sell_price_avg", "sell_price_stdev"]:
+        columns[column][gaps & (rng.random(item_count * day_count) < 0.5)] = np.nan
+    entries = entries_from_columns(columns)
+
+    # Every history length for every kind of item, newest days last
+    return items, {item.id: entries[item.id][-1*DAY_COUNTS[(index // 3) % len(DAY_COUNTS)]:] for index, item in enumerate(items)}
+
+def per_item_table(items, entries) -> pd.DataFrame:
+    return daily_flip_reports_to_pandas([analysis_to_daily_flip_report(analyze_daily_flip(item, entries[item.id][-2 * WINDOW:], WINDOW)) for item in items])
+
+def assert_same_table(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert list(actual.columns) == list(expected.columns)
+    for column in expected.columns:
+        assert actual[column].dtype == expected[column].dtype, column
+        if expected[column].dtype == object:
+            assert actual[column].tolist() == expected[column].tolist(), column
+        else:
+            np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+
+def test_analyze_daily_flips_matches_per_item_analysis(dailies):
+    items, entries = dailies
+
+    assert_same_table(analyze_daily_flips(items, entries, WINDOW), per_item_table(items, entries))
+
+def test_analyze_history_matrices_matches_per_item_analysis(dailies):
+    items, entries = dailies
+    history = history_to_matrices(items, entries, WINDOW * 2, ANALYSIS_COLUMNS)
+
+    assert_same_table(analyze_history_matrices(items, history, WINDOW), per_item_table(items, entries))
+
+def test_items_without_history_are_skipped(dailies):
+    items, entries = dailies
+    entries = dict(entries)
+    del entries[items[0].id]
+
+    assert_same_table(analyze_daily_flips(items, entries, WINDOW), per_item_table(items[1:], entries))
@@ -0,0 +1,56 @@
+import numpy as np
+
+import pytest
+
+from benchmarks.synthetic import generate_dailies
+from coins import Coins
+from daily_flip import analyze_daily_flips
+from flip_portfolio import _solve_bounded_knapsack, plan_flip_portfolio
+
+def brute_force(cost: np.ndarray, value: np.ndarray, count: np.ndarray, capacity: int) -> float:
+    """Return the best total VALUE within CAPACITY, one unit at a time."""
+
+    best = np.zeros(capacity + 1)
+    for item_cost, item_value, item_count in zip(cost.tolist(), value.tolist(), count.tolist()):
+        for _ in range(item_count if item_cost <= capacity else 0):
+            best[item_cost:] = np.maximum(best[item_cost:], best[:capacity + 1 - item_cost] + item_value)
+
+    return float(best[capacity])
+
+def random_instance(rng: np.random.Generator) -> tuple:
+    item_count = int(rng.integers(1, 12))
+    # Multiples of a stack size, with many near ties like real flips
+    cost = rng.integers(1, 40, item_count) * 25
+    value = np.floor(cost * rng.choice([0.2, 0.25, 0.3, 1 / 3], item_count) + rng.integers(-3, 4, item_count)).clip(1)
+    count = rng.integers(1, 6, item_count)
+    order = np.argsort(-value / cost, kind="stable")
+
+    return cost[order], value[order], count[order], int(rng.integers(0, 3000))
+
+@pytest.mark.parametrize("max_dp_cells", [10**8, 0])
+def test_small_instances_match_brute_force(max_dp_cells):
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        cost, value, count, capacity = random_instance(rng)
+        stacks, upper_bound, optimal = _solve_bounded_knapsack(cost, value, count, capacity, node_limit=10**6, max_dp_cells=max_dp_cells)
+
+        assert optimal
+        assert (stacks >= 0).all() and (stacks <= count).all()
+        assert stacks @ cost <= capacity
+        assert stacks @ value == brute_force(cost, value, count, capacity)
+        assert upper_bound >= stacks @ value - 1e-6
+
+@pytest.fixture(scope="module")
+def flips():
+    # Same instances as `python -m benchmarks.portfolio --sizes 10000`
+    items, entries = generate_dailies(10000, 28)
+
+    return analyze_daily_flips(items, entries, 14)
+
+@pytest.mark.parametrize("gold", [100, 1000, 10000])
+def test_benchmark_sized_plans_are_optimal(flips, gold):
+    portfolio = plan_flip_portfolio(flips, Coins(gold=gold), 250)
+
+    assert portfolio.optimal
+    assert portfolio.invest.to_copper() <= Coins(gold=gold).to_copper()
+    assert portfolio.profit <= portfolio.upper_bound
@@ -0,0 +1,53 @@
+import json
+import os
+import logging
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_dailies
+from daily_flip import analyze_daily_flips
+from flip_scan import EXIT_ERROR, EXIT_FETCH_FAILED, EXIT_NO_FLIPS, EXIT_OK, filter_flips, run
+
+class FakeScanner():
+    """Scans by returning RESULT, or raising it if it's an exception."""
+
+    def __init__(self, result):
+        self.result = result
+
+    def scan(self, profile):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+def test_unexpected_error_exits_with_the_error_code(tmp_path):
+    metrics_path = os.path.join(tmp_path, "metrics.json")
+
+    assert run(FakeScanner(RuntimeError("boom")), os.path.join(tmp_path, "flips.csv"), metrics_path=metrics_path) == EXIT_ERROR
+    with open(metrics_path) as file:
+        assert json.load(file)["counters"]["exit_code"] == EXIT_ERROR
+
+def test_no_flips_succeeds_unless_asked_to_fail(tmp_path):
+    output = os.path.join(tmp_path, "flips.csv")
+    scanner = FakeScanner((EXIT_NO_FLIPS, pd.DataFrame(columns=["item_id"])))
+
+    assert run(scanner, output) == EXIT_OK
+    assert os.path.exists(output)
+    assert run(scanner, output, fail_on_no_flips=True) == EXIT_NO_FLIPS
+
+def test_failed_fetch_writes_no_report(tmp_path):
+    output = os.path.join(tmp_path, "flips.csv")
+
+    assert run(FakeScanner((EXIT_FETCH_FAILED, pd.DataFrame())), output) == EXIT_FETCH_FAILED
+    assert not os.path.exists(output)
+
+def test_filter_flips_logs_only_what_it_removed(caplog):
+    flips = analyze_daily_flips(*generate_dailies(50, 28), 14)
+    caplog.set_level(logging.DEBUG, logger="flip_scan")
+
+    kept = filter_flips(flips, min_buy_count=1)
+    assert len([record for record in caplog.records if record.message.startswith("Removed")]) == 1
+
+    # Filtering again removes nothing, so there's nothing to log
+    caplog.clear()
+    assert len(filter_flips(kept, min_buy_count=1)) == len(kept)
+    assert not [record for record in caplog.records if record.message.startswith("Removed")]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from flip_screener import FlipScreener, Predicate
+
+@pytest.fixture
+def screener():
+    return FlipScreener(pd.DataFrame({
+        "buy_price": [30.0, 10.0, 20.0, 40.0],
+        "sell_volume": [5.0, np.nan, 5.0, 1.0],
+    }))
+
+def passing(screener: FlipScreener, predicate: Predicate) -> list:
+    return sorted(screener.screen([predicate]).flips.index)
+
+@pytest.mark.parametrize("ranks, rows", [
+    ((0, 4), [0, 1, 2, 3]),
+    ((1, 3), [0, 2]),
+    ((0, 1), [1]),
+    ((3, 4), [3]),
+    ((0, 0), []),
+    ((2, 2), []),
+    ((4, 4), []),
+])
+def test_ranked_predicate_passes_the_rows_at_its_ranks(screener, ranks, rows):
+    assert passing(screener, screener.ranked_predicate("buy_price", *ranks)) == rows
+
+def test_ranked_predicate_skips_unknown_values_and_keeps_ties(screener):
+    # Sorted: 1, 5, 5, then NaN
+    assert passing(screener, screener.ranked_predicate("sell_volume", 0, 3)) == [0, 2, 3]
+    assert passing(screener, screener.ranked_predicate("sell_volume", 2, 3)) == [0, 2]
+    assert passing(screener, screener.ranked_predicate("sell_volume", 3, 3)) == []
+
+def test_screen_counts_first_failed_predicate(screener):
+    predicates = [Predicate("buy_price", 15), Predicate("sell_volume", 2)]
+    screen = screener.screen(predicates)
+
+    assert sorted(screen.flips.index) == [0, 2]
+    assert screen.eliminated == {predicates[0]: 1, predicates[1]: 1}
+    assert screen.failing == {predicates[0]: 1, predicates[1]: 2}
+    unsorted = FlipScreener(screener.flips, presorted=False).screen(predicates)
+    assert unsorted.flips.equals(screen.flips) and unsorted.eliminated == screen.eliminated and unsorted.failing == screen.failing
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from benchmarks.synthetic import generate_search_page
+from item import Item
+from http_client import HttpClient
+
+import gw2bltc
+
+PAGE_SIZE = 20
+PAGES = 5
+
+class Gw2BltcStandIn(ThreadingHTTPServer):
+    """Serves generated search results pages, each after its own delay, failing some.
+
+    Earlier pages are slower, so they finish out of order.
+    """
+
+    def __init__(self, failing_pages=(), slow_pages=()):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.failing_pages = set(failing_pages)
+        self.slow_pages = set(slow_pages)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/en/tp/search"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        page, page_size = int(query["page"][0]), int(query["ipg"][0])
+        time.sleep(5 if page in self.server.slow_pages else 0.02 * (PAGES - page))
+        if page in self.server.failing_pages:
+            self._send(500, b"server error")
+            return
+        first = (page - 1) * page_size + 1
+        self._send(200, generate_search_page([Item(id=item_id, name=f"Item {item_id}") for item_id in range(first, first + page_size)]).encode())
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    servers = []
+
+    def start(**kwargs) -> Gw2BltcStandIn:
+        server = Gw2BltcStandIn(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        monkeypatch.setattr(gw2bltc, "gw2bltc_url", server.url)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def client():
+    client = HttpClient(default_rate_limit=(100, 100), retries=1, backoff_seconds=0.01)
+    yield client
+    client.close()
+
+def ids(items) -> list:
+    return [item.id for item in items]
+
+@pytest.mark.parametrize("parser", ["stream", "soup"])
+def test_pages_are_joined_in_order(stand_in, client, parser):
+    stand_in()
+    items = gw2bltc.get_top_n_sold_items(PAGES * PAGE_SIZE, PAGE_SIZE, client=client, parser=parser)
+
+    assert ids(items) == list(range(1, PAGES * PAGE_SIZE + 1))
+
+def test_result_is_cut_to_n(stand_in, client):
+    stand_in()
+
+    assert ids(gw2bltc.get_top_n_sold_items(PAGE_SIZE * 2 + 5, PAGE_SIZE, client=client)) == list(range(1, PAGE_SIZE * 2 + 6))
+
+def test_failed_pages_are_left_out(stand_in, client):
+    stand_in(failing_pages={2, 4})
+    items = gw2bltc.get_top_n_sold_items(PAGES * PAGE_SIZE, PAGE_SIZE, client=client)
+
+    assert ids(items) == [item_id for page in [1, 3, 5] for item_id in range((page - 1) * PAGE_SIZE + 1, page * PAGE_SIZE + 1)]
+    assert client.metrics.retries == 2
+
+def test_pages_past_the_deadline_are_left_out(stand_in, client):
+    stand_in(slow_pages={3})
+    start = time.monotonic()
+    items = gw2bltc.get_top_n_sold_items(PAGES * PAGE_SIZE, PAGE_SIZE, deadline_seconds=0.5, client=client)
+
+    assert time.monotonic() - start < 2
+    assert ids(items) == [item_id for page in [1, 2, 4, 5] for item_id in range((page - 1) * PAGE_SIZE + 1, page * PAGE_SIZE + 1)]
+
+def test_stream_parser_falls_back_to_soup(monkeypatch):
+    html = generate_search_page([Item(id=item_id, name=f"Item {item_id}") for item_id in range(1, 4)])
+    monkeypatch.setitem(gw2bltc.PARSERS, "stream", lambda html: [])
+
+    assert ids(gw2bltc.parse_top_sold_items(html, "stream")) == [1, 2, 3]
+    assert gw2bltc.parse_top_sold_items(html, "soup") == gw2bltc.parse_with_soup(html)
@@ -0,0 +1,102 @@
+import os
+import time
+import logging
+
+import numpy as np
+
+from benchmarks.synthetic import entries_from_columns, generate_history_columns
+from daily_flip import HISTORY_COLUMNS
+from history_store import CURRENT_FILE, HistoryStore
+
+DAY = 24 * 60 * 60
+
+def columns(item_count: int, day_count: int, seed: int = 0) -> dict:
+    return generate_history_columns(item_count, day_count, seed)[1]
+
+def assert_aligned(store: HistoryStore):
+    """Every item's series belongs to it and is in timestamp order."""
+
+    for item_id in store._version.positions:
+        series = store.series(item_id)
+        assert (series["id"] == item_id).all()
+        assert (np.diff(series["utc_timestamp"]) > 0).all()
+
+def test_reader_keeps_its_version_while_writer_replaces_it(tmp_path):
+    writer = HistoryStore(str(tmp_path))
+    writer.refresh_columns(columns(3, 10))
+    reader = HistoryStore(str(tmp_path))
+    before = {column: np.array(values) for column, values in reader.series(1).items()}
+
+    new_columns = columns(5, 20, seed=1)
+    new_columns["utc_timestamp"] = new_columns["utc_timestamp"] + 100 * DAY
+    for _ in range(3):
+        new_columns["utc_timestamp"] = new_columns["utc_timestamp"] + 20 * DAY
+        writer.refresh_columns(new_columns)
+
+    assert len(reader) == 3
+    assert all((reader.series(1)[column] == before[column]).all() for column in HISTORY_COLUMNS)
+    assert_aligned(reader)
+    assert len(HistoryStore(str(tmp_path)).series(1)["id"]) == 70
+    assert_aligned(HistoryStore(str(tmp_path)))
+    # Only the current and previous versions are kept
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.startswith("v")) == ["v3", "v4"]
+
+def test_concurrent_writers_get_their_own_versions(tmp_path):
+    first = HistoryStore(str(tmp_path))
+    first.refresh_columns(columns(3, 10))
+    second = HistoryStore(str(tmp_path))
+    # Left by a write that's still running, or crashed
+    os.mkdir(os.path.join(tmp_path, "v2"))
+
+    new_columns = columns(3, 1, seed=1)
+    new_columns["utc_timestamp"] = new_columns["utc_timestamp"] + 20 * DAY
+    first.refresh_columns(new_columns)
+    second.refresh_columns(new_columns)
+
+    assert (first._version.name, second._version.name) == ("v3", "v4")
+    # The unfinished version is still fresh, so only v1 is gone
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.startswith("v")) == ["v2", "v3", "v4"]
+    assert open(os.path.join(tmp_path, CURRENT_FILE)).read() == "v4"
+    assert len(first.series(1)["id"]) == 11
+    assert len(HistoryStore(str(tmp_path)).series(1)["id"]) == 11
+
+    os.utime(os.path.join(tmp_path, "v2"), (0, 0))
+    new_columns["utc_timestamp"] = new_columns["utc_timestamp"] + DAY
+    second.refresh_columns(new_columns)
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.startswith("v")) == ["v4", "v5"]
+
+class FakeDb():
+    """Serves ENTRIES from `get_dailies`, recording which ids were asked for."""
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+        self.requested = []
+
+    def get_dailies(self, item_ids):
+        self.requested.append(list(item_ids))
+        return {item_id: self.entries[item_id] for item_id in item_ids if item_id in self.entries}
+
+def dailies(item_count: int, day_count: int, last_day: float) -> dict:
+    """Return generated entries for ITEM_COUNT items, the last of DAY_COUNT days at LAST_DAY."""
+
+    history = columns(item_count, day_count)
+    history["utc_timestamp"] = history["utc_timestamp"] - history["utc_timestamp"].max() + int(last_day)
+
+    return entries_from_columns(history)
+
+def test_refresh_from_db_fetches_only_missing_and_stale_items(tmp_path, caplog):
+    now = time.time()
+    store = HistoryStore(str(tmp_path))
+    db = FakeDb({**dailies(2, 5, now - DAY / 2), **{item_id + 2: entries for item_id, entries in dailies(2, 5, now - 3 * DAY).items()}})
+
+    with caplog.at_level(logging.ERROR):
+        assert store.refresh_from_db(db, [])
+        assert store.refresh_from_db(db, [1, 2, 3, 4])
+        # 1 and 2 are fresh, 3 and 4 were just fetched
+        assert store.refresh_from_db(db, [1, 2, 3, 4])
+    assert db.requested == [[1, 2, 3, 4]]
+    assert not caplog.records
+
+    # Another process's store only knows 3 and 4 are old
+    assert HistoryStore(str(tmp_path)).refresh_from_db(db, [1, 2, 3, 4, 5])
+    assert db.requested[-1] == [3, 4, 5]
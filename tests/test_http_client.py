@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import HttpClient
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers the first request to /retry with 429, and sends header names in lower case."""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            first = self.server.requests == 1
+        if self.path == "/retry" and first:
+            self._send(429, {"retry-after": "1"})
+        else:
+            self._send(200, {"etag": '"abc"', "last-modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+
+    def _send(self, status: int, headers: dict):
+        self.send_response(status)
+        self.send_header("content-length", "2")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url(server: ThreadingHTTPServer, path: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def test_deadline_before_first_attempt_fails_the_request_only(server):
+    client = HttpClient(default_rate_limit=(1, 1))
+    # Empty the bucket, so the next request has to wait past the deadline
+    client._bucket(f"127.0.0.1:{server.server_address[1]}").reserve()
+
+    assert client.fetch_all([url(server, "/a"), url(server, "/b")], deadline_seconds=0.1) == [None, None]
+    assert client.metrics.failures == 2
+    assert server.requests == 0
+    client.close()
+
+def test_header_names_are_case_insensitive(server):
+    client = HttpClient()
+    response = client.fetch(url(server, "/page"))
+
+    assert response.headers["ETag"] == '"abc"'
+    assert response.headers.get("Last-Modified") == "Wed, 21 Oct 2015 07:28:00 GMT"
+    client.close()
+
+def test_lower_case_retry_after_is_honored(server):
+    client = HttpClient(backoff_seconds=0.001)
+    start = time.monotonic()
+    response = client.fetch(url(server, "/retry"))
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 1
+    assert client.metrics.retries == 1
+    client.close()
@@ -0,0 +1,43 @@
+import numpy as np
+
+from benchmarks.synthetic import entries_from_columns, generate_history_columns
+from daily_flip import ANALYSIS_COLUMNS, analyze_history_matrices
+from incremental_flip import DailyFlipState
+
+WINDOW = 14
+COIN_COLUMNS = ["buy_price", "sell_price", "max_invest"]
+FLOAT_COLUMNS = ["return_on_investment", "max_buy_count", "buy_volume", "sell_volume", "outlier_count"]
+
+def test_many_updates_match_a_full_analysis():
+    item_count, day_count = 40, 600
+    items, columns = generate_history_columns(item_count, day_count, seed=3)
+    entries = entries_from_columns(columns)
+    state = DailyFlipState(WINDOW)
+    state.update(items, {item.id: entries[item.id][:WINDOW * 2] for item in items})
+
+    for day in range(WINDOW * 2, day_count):
+        # A few items skip a poll now and then, and catch up on the next
+        polled = [item for item in items if (item.id + day) % 7 or day == day_count - 1]
+        reports = state.update(polled, {item.id: entries[item.id][max(0, day - 2):day + 1] for item in polled})
+        assert sorted(reports["item_id"]) == sorted(item.id for item in polled)
+
+    expected = analyze_history_matrices(items, {column: columns[column].reshape(item_count, day_count)[:, -WINDOW * 2:] for column in ANALYSIS_COLUMNS}, WINDOW)
+    actual = state.reports()
+    for column in COIN_COLUMNS:
+        assert (actual[column].to_numpy() == expected[column].to_numpy()).all(), column
+    for column in FLOAT_COLUMNS:
+        assert np.allclose(actual[column], expected[column], rtol=1e-9, equal_nan=True), column
+    assert state.check_consistency({item.id: entries[item.id][-WINDOW * 2:] for item in items}) == []
+
+def test_running_sums_are_summed_afresh():
+    items, columns = generate_history_columns(5, 300, seed=4)
+    entries = entries_from_columns(columns)
+    state = DailyFlipState(WINDOW, resum_every=10)
+    state.update(items, {item.id: entries[item.id][:WINDOW * 2] for item in items})
+    for day in range(WINDOW * 2, 300):
+        state.update(items, {item.id: entries[item.id][day:day + 1] for item in items})
+
+    fresh = DailyFlipState(WINDOW)
+    fresh.update(items, {item.id: entries[item.id][-WINDOW * 2:] for item in items})
+    assert (state._updates < 10).all()
+    assert np.allclose(state._sums, fresh._sums, rtol=1e-12)
@@ -0,0 +1,64 @@
+import logging
+
+import numpy as np
+
+from item import Item
+from item_index import ItemIndex, trigrams
+
+ITEMS = [
+    Item(id=12134, name="Bag of Coffee Beans"),
+    Item(id=12135, name="Coffee"),
+    Item(id=19712, name="Seasoned Wood Log"),
+    Item(id=19713, name="Seasoned Wood Plank"),
+    Item(id=19714, name="Soft Wood Log"),
+    Item(id=95833, name="Dragonfish"),
+    Item(id=24, name="Sealed Package of Snowballs"),
+]
+
+def dice(query: str, name: str) -> float:
+    query_trigrams, name_trigrams = set(trigrams(query)), set(trigrams(name))
+
+    return 2 * len(query_trigrams & name_trigrams) / (len(query_trigrams) + len(name_trigrams))
+
+def test_similar_names_are_ranked_by_dice_coefficient():
+    index = ItemIndex(ITEMS)
+
+    for query in ["seasoned wod", "cofee beans", "dragon fish", "wood log"]:
+        results = index.similar_to(query, limit=3, min_similarity=0.0)
+        # Ties keep the order items were indexed in
+        expected = sorted(((item, dice(query, item.name)) for item in ITEMS if dice(query, item.name) > 0), key=lambda pair: (-pair[1], ITEMS.index(pair[0])))[:3]
+        assert [item.id for item, _ in results] == [item.id for item, _ in expected], query
+        assert np.allclose([similarity for _, similarity in results], [similarity for _, similarity in expected])
+
+    assert index.similar_to("xyzzy") == []
+
+def test_search_by_id_prefix_and_misspelling():
+    index = ItemIndex(ITEMS)
+
+    assert index.search("24") == [index[24]]
+    assert [item.id for item in index.search("seasoned wood", limit=2)] == [19712, 19713]
+    assert index.search("Dragnfish", limit=1) == [index[95833]]
+    assert index.starting_with("COFFEE") == [index[12135]]
+
+def test_save_and_load_round_trip(tmp_path):
+    # Names with separators and non-ASCII letters survive
+    items = ITEMS + [Item(id=7, name="Line\nbreak"), Item(id=8, name="Mini Cœur Élégant")]
+    path = str(tmp_path / "items.npz")
+    ItemIndex(items).save(path)
+
+    loaded = ItemIndex.load(path)
+    assert list(loaded) == items
+    assert loaded.search("mini cœur", limit=1) == [loaded[8]]
+
+    ItemIndex().save(path)
+    assert len(ItemIndex.load(path)) == 0
+
+def test_missing_index_loads_as_none_quietly(tmp_path, caplog):
+    caplog.set_level(logging.DEBUG)
+
+    assert ItemIndex.load(str(tmp_path / "items.npz")) is None
+    assert not caplog.records
+
+    (tmp_path / "broken.npz").write_bytes(b"not an index")
+    assert ItemIndex.load(str(tmp_path / "broken.npz")) is None
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
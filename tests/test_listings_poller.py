@@ -0,0 +1,80 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+import pytest
+
+from benchmarks.trading_post import TradingPostStandIn
+from item import Item
+from http_client import HttpClient
+from listings_poller import BUY_QUANTITY, MAX_IDS_PER_REQUEST, SELL_QUANTITY, SNAPSHOT_FIELDS, ListingsPoller, read_snapshots
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(**kwargs) -> TradingPostStandIn:
+        server = TradingPostStandIn(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def client():
+    client = HttpClient(default_rate_limit=(1000, 1000), retries=3, backoff_seconds=0.001)
+    yield client
+    client.close()
+
+def items(count: int) -> list:
+    return [Item(id=item_id, name=f"Item {item_id}") for item_id in range(1, count + 1)]
+
+def test_poll_covers_every_listed_item(stand_in, client, tmp_path):
+    server = stand_in(max_item_id=1000)
+    path = os.path.join(tmp_path, "snapshots.bin")
+    poller = ListingsPoller(items(2 * MAX_IDS_PER_REQUEST + 50), interval_seconds=10, path=path, client=client, base_url=server.url)
+
+    assert poller.poll() == 2 * MAX_IDS_PER_REQUEST + 50
+    records = read_snapshots(path)
+    assert records["id"].tolist() == list(range(1, 2 * MAX_IDS_PER_REQUEST + 51))
+    assert (records["buy_quantity"] == records["id"] * 3).all()
+    assert (records["sell_quantity"] == records["id"] * 2).all()
+    assert (records["sell_price"] > records["buy_price"]).all()
+    assert (records["buy_depth"] > 0).all() and (records["sell_depth"] > 0).all()
+    assert (poller.spreads() == records["sell_price"] - records["buy_price"]).all()
+
+def test_rate_limited_requests_are_retried(stand_in, client):
+    server = stand_in(max_item_id=1000, rate_limit_every=3)
+    poller = ListingsPoller(items(5 * MAX_IDS_PER_REQUEST), interval_seconds=10, client=client, base_url=server.url)
+
+    assert poller.poll() == 5 * MAX_IDS_PER_REQUEST
+    assert server.rate_limited > 0
+    assert client.metrics.retries == server.rate_limited
+    assert client.metrics.failures == 0
+
+def test_ids_not_on_the_trading_post_are_left_out(stand_in, client, caplog):
+    # One whole batch (200) of listed ids, one partly listed (206), one not at all (404)
+    server = stand_in(max_item_id=MAX_IDS_PER_REQUEST + 50)
+    poller = ListingsPoller(items(3 * MAX_IDS_PER_REQUEST), interval_seconds=10, client=client, base_url=server.url)
+
+    with caplog.at_level(logging.ERROR):
+        assert poller.poll() == MAX_IDS_PER_REQUEST + 50
+    assert not caplog.records
+    latest = poller.buffer.latest()
+    assert not np.isnan(latest[:MAX_IDS_PER_REQUEST + 50, BUY_QUANTITY]).any()
+    assert np.isnan(latest[MAX_IDS_PER_REQUEST + 50:, SELL_QUANTITY]).all()
+
+def test_snapshots_keep_values_past_32_bits(tmp_path):
+    path = os.path.join(tmp_path, "snapshots.bin")
+    poller = ListingsPoller(items(1), path=path, client=object())
+    values = np.array([[2**40, 3 * 2**31, 5, np.nan, 2**33, 0]], dtype=np.float64)
+    poller._write(1700000000, [1], values)
+
+    record = read_snapshots(path)[0]
+    assert [int(record[field]) for field in SNAPSHOT_FIELDS] == [2**40, 3 * 2**31, 5, -1, 2**33, 0]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from benchmarks.synthetic import entries_from_columns, generate_history_columns
+from daily_flip import outlier_counts
+from incremental_flip import BUY_PRICE_AVG, SELL_PRICE_AVG, DailyFlipState
+from outliers import OutlierTracker, rolling_outlier_counts
+
+WINDOW = 14
+
+def random_prices(rng: np.random.Generator, item_count: int, day_count: int) -> np.ndarray:
+    """Return prices with repeats, spikes, zeros and NaN gaps."""
+
+    prices = rng.choice([100.0, 101.0, 104.0, 110.0, 250.0], (item_count, day_count))
+    prices[rng.random(prices.shape) < 0.05] = 0.0
+    prices[rng.random(prices.shape) < 0.1] = np.nan
+
+    return prices
+
+def test_tracker_matches_outlier_counts_every_day():
+    rng = np.random.default_rng(5)
+    prices = random_prices(rng, 30, 200)
+    trackers = [OutlierTracker(WINDOW) for _ in prices]
+    rolling = rolling_outlier_counts(prices, WINDOW)
+
+    for day in range(prices.shape[1]):
+        for tracker, price in zip(trackers, prices[:, day]):
+            tracker.push(price)
+        expected = outlier_counts(prices[:, max(0, day + 1 - WINDOW * 2):day + 1], WINDOW)
+        assert [tracker.outlier_count() for tracker in trackers] == expected.tolist()
+        assert (rolling[:, day] == expected).all()
+
+def test_flip_state_outlier_counts_match_its_history():
+    item_count, day_count = 20, 120
+    items, columns = generate_history_columns(item_count, day_count, seed=6)
+    entries = entries_from_columns(columns)
+    state = DailyFlipState(WINDOW)
+    state.update(items, {item.id: entries[item.id][:WINDOW * 2] for item in items})
+    for day in range(WINDOW * 2, day_count):
+        state.update(items, {item.id: entries[item.id][day - 1:day + 1] for item in items})
+        # Now and then the latest day is revised with a price spike
+        if day % 5 == 0:
+            revised = {item.id: [entries[item.id][day]._replace(sell_price_avg=entries[item.id][day].sell_price_avg * 3)] for item in items[::3]}
+            state.update(items[::3], revised)
+            for item in items[::3]:
+                entries[item.id][day] = revised[item.id][0]
+
+    history = state._ordered_history(np.arange(item_count))
+    expected = outlier_counts(history[:, BUY_PRICE_AVG], WINDOW) + outlier_counts(history[:, SELL_PRICE_AVG], WINDOW)
+    assert state.reports()["outlier_count"].tolist() == expected.tolist()
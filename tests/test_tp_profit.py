@@ -0,0 +1,61 @@
+import numpy as np
+
+import pytest
+
+from decimal import Decimal, ROUND_HALF_UP
+from tp_profit import EXCHANGE_FEE_PERCENT, LISTING_FEE_PERCENT, MIN_FEE, break_even_sell_price, copper_profit, exchange_fee, listing_fee, max_buy_price, proceeds
+
+def reference_fee(sell_price: int, percent: int) -> int:
+    """Return PERCENT of SELL_PRICE rounded half up to whole copper, at least MIN_FEE, one price at a time."""
+
+    if sell_price <= 0:
+        return 0
+
+    return max(MIN_FEE, int((Decimal(sell_price) * percent / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+def reference_proceeds(sell_price: int) -> int:
+    """Return what selling at SELL_PRICE keeps after both fees, one price at a time."""
+
+    return sell_price - reference_fee(sell_price, LISTING_FEE_PERCENT) - reference_fee(sell_price, EXCHANGE_FEE_PERCENT)
+
+# Every price up to 10 silver, and random ones up to 10,000 gold
+PRICES = {
+    "consecutive": np.arange(0, 100_001, dtype=np.int64),
+    "random": np.random.default_rng(0).integers(1, 100_000_000, 20_000),
+}
+
+@pytest.fixture(params=PRICES.keys())
+def prices(request) -> np.ndarray:
+    return PRICES[request.param]
+
+def test_proceeds_match_the_reference(prices):
+    reference = np.array([reference_proceeds(int(price)) for price in prices])
+
+    assert (proceeds(prices) == reference).all(), prices[proceeds(prices) != reference][:5]
+
+def test_fees_are_at_least_the_minimum(prices):
+    prices = prices[prices > 0]
+
+    assert (listing_fee(prices) >= MIN_FEE).all()
+    assert (exchange_fee(prices) >= MIN_FEE).all()
+
+def test_proceeds_never_fall_as_the_price_rises(prices):
+    assert (np.diff(proceeds(np.unique(prices[prices > 0]))) >= 0).all()
+
+@pytest.mark.parametrize("min_profit", [0, 1, 25])
+def test_break_even_sell_price_is_the_lowest_with_min_profit(prices, min_profit):
+    break_even = break_even_sell_price(prices, min_profit)
+    enough = copper_profit(prices, break_even) >= min_profit
+    lowest = (break_even == 1) | (copper_profit(prices, break_even - 1) < min_profit)
+
+    assert (enough & lowest).all(), prices[~(enough & lowest)][:5]
+
+@pytest.mark.parametrize("min_profit", [0, 1, 25])
+def test_max_buy_price_is_the_highest_with_min_profit(prices, min_profit):
+    highest_buy = max_buy_price(prices, min_profit)
+    sellable = proceeds(prices) - min_profit > 0
+    enough = copper_profit(highest_buy, prices) >= min_profit
+    highest = copper_profit(highest_buy + 1, prices) < min_profit
+
+    assert (enough & highest)[sellable].all(), prices[~(enough & highest) & sellable][:5]
+    assert (highest_buy[~sellable] == 0).all()
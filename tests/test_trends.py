@@ -0,0 +1,85 @@
+import numpy as np
+
+import pytest
+
+from datetime import timedelta
+from benchmarks.synthetic import generate_dailies
+from benchmarks.trends import reference_trends
+from history_store import HistoryStore
+from item import Item
+from trends import DAYS_PER_YEAR, TREND_COLUMNS, TREND_HISTORY_COLUMNS, TrendCache, analyze_trends
+
+WEEKEND_EFFECT = 0.1
+DAY = 24 * 60 * 60
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    """A store of 400 items x 730 days; every other item's prices are raised on weekends."""
+
+    items, entries = generate_dailies(400, 730)
+    for item in items[::2]:
+        entries[item.id] = [entry._replace(buy_price_avg=entry.buy_price_avg * (1 + WEEKEND_EFFECT), sell_price_avg=entry.sell_price_avg * (1 + WEEKEND_EFFECT))
+                            if entry.utc_timestamp.weekday() >= 5 else entry for entry in entries[item.id]]
+    history_store = HistoryStore(str(tmp_path_factory.mktemp("store")))
+    history_store.refresh(entries)
+
+    return items, history_store
+
+def test_trends_match_a_per_item_fit(store):
+    items, history_store = store
+    report = analyze_trends(*history_store.rows(items, TREND_HISTORY_COLUMNS))
+    trends, weekend_effects = reference_trends(history_store, items[:100])
+
+    assert np.allclose(report.table["price_trend"][:100], trends, rtol=1e-6, atol=1e-9)
+    assert np.allclose(report.table["price_weekend_effect"][:100], weekend_effects, rtol=1e-6, atol=1e-9)
+
+def test_injected_weekend_effect_is_detected(store):
+    items, history_store = store
+    detected = analyze_trends(*history_store.rows(items, TREND_HISTORY_COLUMNS)).table["price_weekend_effect"].to_numpy()
+
+    # Prices also wander day to day, so only the averages are close
+    assert abs(np.mean(detected[::2]) - WEEKEND_EFFECT) < 0.01
+    assert abs(np.mean(detected[1::2])) < 0.01
+
+def test_robust_trend_skips_rows_on_the_same_day():
+    # Most pairs of rows half the history apart fall on day 5
+    days = np.concatenate([np.full(50, 5), np.arange(6, 16)])
+    history = {
+        "utc_timestamp": days * DAY,
+        "buy_price_avg": np.exp(0.001 * days),
+        "sell_price_avg": np.exp(0.001 * days),
+        "buy_sold": np.full(len(days), 10.0),
+        "sell_sold": np.full(len(days), 10.0),
+    }
+    report = analyze_trends(history, np.array([len(days)]))
+
+    assert np.isclose(report.table["price_robust_trend"][0], np.expm1(0.001 * DAYS_PER_YEAR))
+
+def test_cache_recomputes_only_items_with_new_days(tmp_path):
+    items, entries = generate_dailies(50, 120)
+    history_store = HistoryStore(str(tmp_path))
+    history_store.refresh(entries)
+    cache = TrendCache()
+    first = cache.trends(history_store, items)
+    cache.trends(history_store, items)
+    assert (cache.hits, cache.misses) == (50, 50)
+
+    changed = items[:5]
+    history_store.refresh({item.id: [entries[item.id][-1]._replace(utc_timestamp=entries[item.id][-1].utc_timestamp + timedelta(days=1))] for item in changed})
+    again = cache.trends(history_store, items)
+    assert cache.misses == 55
+    assert (again.table["days"][:5] == first.table["days"][:5] + 1).all()
+    assert again.table[5:].equals(first.table[5:])
+
+def test_cache_gives_nan_for_items_not_in_the_store(tmp_path):
+    items, entries = generate_dailies(3, 120)
+    history_store = HistoryStore(str(tmp_path))
+    history_store.refresh(entries)
+    missing = Item(id=1000, name="Missing")
+
+    report = TrendCache().trends(history_store, [missing] + items)
+
+    assert list(report.table.columns) == TREND_COLUMNS
+    assert report.table["item_id"].tolist() == [1000] + [item.id for item in items]
+    assert report.table.iloc[0, 2:].isna().all() and report.table["days"][0] == 0
+    assert np.isnan(report.weekday_profiles["price"][0]).all() and np.isfinite(report.weekday_profiles["price"][1:]).all()
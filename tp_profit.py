@@ -1,14 +1,89 @@
-import pandas as pd
+import numpy as np
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # 'Listing fee'
 fee_percent_on_list = 0.05
 # 'Exchange fee'
 fee_percent_on_sell = 0.10
 
-def profit(buy_price_column: str, sell_price_column: str) -> pd.DataFrame:
-    """Return sales profit; revenue, less trading post cuts."""
+# The same fees in whole percent, for exact integer arithmetic
+LISTING_FEE_PERCENT = 5
+EXCHANGE_FEE_PERCENT = 10
+# Each fee is at least this many copper
+MIN_FEE = 1
+
+def profit(buy_price_column: "pd.Series", sell_price_column: "pd.Series") -> "pd.Series":
+    """Return sales profit; revenue, less trading post cuts.
+
+    Works elementwise on Series, numpy arrays and plain numbers alike, with
+    fees as unrounded fractions; see `copper_profit` for what the trading
+    post actually pays out.
+    """
 
     return sell_price_column - \
         buy_price_column - \
         (fee_percent_on_list * sell_price_column) - \
         (fee_percent_on_sell * sell_price_column)
+
+def _fee(sell_price: np.ndarray, percent: int) -> np.ndarray:
+    """Return PERCENT of whole-copper SELL_PRICE, rounded half up to whole copper, at least MIN_FEE.
+
+    Nothing is listed at a price of 0 or less, so no fee is paid.
+    """
+
+    sell_price = np.asarray(sell_price, dtype=np.int64)
+
+    return np.where(sell_price > 0, np.maximum(((sell_price * percent) + 50) // 100, MIN_FEE), 0)
+
+def listing_fee(sell_price: np.ndarray) -> np.ndarray:
+    """Return the int64 copper fee, paid up front, for listing an item at each of SELL_PRICE."""
+
+    return _fee(sell_price, LISTING_FEE_PERCENT)
+
+def exchange_fee(sell_price: np.ndarray) -> np.ndarray:
+    """Return the int64 copper fee taken when an item listed at each of SELL_PRICE sells."""
+
+    return _fee(sell_price, EXCHANGE_FEE_PERCENT)
+
+def proceeds(sell_price: np.ndarray) -> np.ndarray:
+    """Return the int64 copper kept from selling an item at each of SELL_PRICE, after both fees."""
+
+    sell_price = np.asarray(sell_price, dtype=np.int64)
+
+    return sell_price - listing_fee(sell_price) - exchange_fee(sell_price)
+
+def copper_profit(buy_price: np.ndarray, sell_price: np.ndarray) -> np.ndarray:
+    """Return the int64 copper profit of buying an item at BUY_PRICE and selling it at SELL_PRICE, elementwise."""
+
+    return proceeds(sell_price) - np.asarray(buy_price, dtype=np.int64)
+
+def max_buy_price(sell_price: np.ndarray, min_profit: int = 1) -> np.ndarray:
+    """Return the highest whole-copper buy price that makes at least MIN_PROFIT selling at each of SELL_PRICE.
+
+    0 where no buy price would.
+    """
+
+    return np.maximum(proceeds(sell_price) - min_profit, 0)
+
+def break_even_sell_price(buy_price: np.ndarray, min_profit: int = 0) -> np.ndarray:
+    """Return the lowest whole-copper sell price that makes at least MIN_PROFIT on items bought at each of BUY_PRICE.
+
+    Proceeds never fall as the price rises (the two fees step up at
+    different prices), and are within 2 copper of 85% of it, so counting up
+    from just under the exact quotient takes a few steps, and only for the
+    prices not yet enough.
+    """
+
+    shape = np.shape(buy_price)
+    target = (np.asarray(buy_price, dtype=np.int64) + min_profit).reshape(-1)
+    sell_price = np.maximum(((target * 100) // (100 - LISTING_FEE_PERCENT - EXCHANGE_FEE_PERCENT)) - 3, 1)
+    short = np.flatnonzero(proceeds(sell_price) < target)
+    while len(short):
+        sell_price[short] += 1
+        short = short[proceeds(sell_price[short]) < target[short]]
+
+    return sell_price.reshape(shape)
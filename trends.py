@@ -0,0 +1,308 @@
+import pickle
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Self, Tuple
+from history_store import HistoryStore
+from item import Item
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+DAYS_PER_YEAR = 365.25
+
+# History columns the trends are computed from
+TREND_HISTORY_COLUMNS = [
+    "utc_timestamp",
+    "buy_price_avg",
+    "sell_price_avg",
+    "buy_sold",
+    "sell_sold",
+]
+
+# Series analyzed for trends: the mid price and the total quantity sold
+SERIES = ["price", "volume"]
+
+# Per-series statistics; changes are fractions, e.g. 0.1 for +10%
+TREND_STATISTICS = [
+    # Change per year, fitted by least squares on the log series
+    "trend",
+    # Change per year, the median slope between days half the history apart
+    "robust_trend",
+    # Weekend (Saturday and Sunday) level compared with weekdays, detrended
+    "weekend_effect",
+    # Highest month's level compared with the lowest month's, detrended
+    "seasonal_amplitude",
+    # The latest day's month's level compared with the whole year, detrended
+    "month_effect",
+]
+
+TREND_COLUMNS = ["item_id", "days"] + [f"{series}_{statistic}" for series in SERIES for statistic in TREND_STATISTICS]
+
+@dataclass
+class TrendReport():
+    """Trends of a list of items, one row per item in every table."""
+
+    # TREND_COLUMNS
+    table: pd.DataFrame
+    # Series: item x weekday (Monday first) mean detrended log level
+    weekday_profiles: Dict[str, np.ndarray]
+    # Series: item x month (January first) mean detrended log level
+    annual_profiles: Dict[str, np.ndarray]
+
+def analyze_trends(history: Dict[str, np.ndarray], lengths: np.ndarray, min_days: int = 56) -> TrendReport:
+    """Return trends of items whose TREND_HISTORY_COLUMNS rows are back to back in HISTORY.
+
+    LENGTHS holds each item's number of rows, as returned by
+    `HistoryStore.rows`. Every statistic is a grouped reduction (`bincount`
+    or one sort) over all items' rows at once. Items with fewer than
+    MIN_DAYS known days get NaN.
+    """
+
+    item_count = len(lengths)
+    groups = np.repeat(np.arange(item_count), lengths)
+    days = history["utc_timestamp"].astype(np.int64) // SECONDS_PER_DAY
+    # 1970-01-01 was a Thursday
+    weekdays = (days + 3) % 7
+    # Converting every row to datetime64 is slow, so convert each distinct day once
+    first_day, last_day = (days.min(), days.max()) if len(days) else (0, -1)
+    months = (np.arange(first_day, last_day + 1).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12)[days - first_day]
+    # Items without rows get January, and NaN statistics anyway
+    last_months = months[np.maximum(np.cumsum(lengths) - 1, 0)] if len(months) else np.zeros(item_count, dtype=np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        series_values = {
+            "price": np.log((history["buy_price_avg"] + history["sell_price_avg"]) / 2),
+            "volume": np.log1p(history["buy_sold"] + history["sell_sold"]),
+        }
+
+    layout = _RowLayout.of(days, groups, weekdays, months, item_count)
+    table = {"item_id": None, "days": layout.counts}
+    weekday_profiles = {}
+    annual_profiles = {}
+    for series, values in series_values.items():
+        statistics, weekday_profiles[series], annual_profiles[series] = _series_trends(values, layout, last_months, min_days)
+        for statistic, column in zip(TREND_STATISTICS, statistics):
+            table[f"{series}_{statistic}"] = column
+
+    return TrendReport(pd.DataFrame(table, columns=TREND_COLUMNS), weekday_profiles, annual_profiles)
+
+@dataclass
+class _RowLayout():
+    """What the statistics of any series over the same rows share: their items, days and calendar groups.
+
+    Each item's rows are back to back, so per-item sums are `reduceat`
+    segments rather than scattered `bincount`s.
+    """
+
+    item_count: int
+    # Row: item, item * 7 + weekday, item * 12 + month
+    groups: np.ndarray
+    weekday_groups: np.ndarray
+    month_groups: np.ndarray
+    # Row: day, less its item's mean day
+    days: np.ndarray
+    centered_days: np.ndarray
+    # Item: rows, sum of squared centered days; item x weekday and item x month: rows
+    counts: np.ndarray
+    centered_days_squares: np.ndarray
+    weekday_counts: np.ndarray
+    month_counts: np.ndarray
+    # The robust slope of an item with n rows is the median slope between
+    # its i-th and (i + n/2)-th rows. Pairing the two halves of the history
+    # gives n/2 slopes over long spans, whose median, like Theil-Sen's,
+    # ignores a minority of outlying days. Slopes are mapped into (-2, 2)
+    # and offset by 4 per item so one plain sort orders every item's at once.
+    # Pairs of rows on the same day have no slope and are left out.
+    # Pair: rows, days between them, sort offset
+    pair_firsts: np.ndarray
+    pair_seconds: np.ndarray
+    pair_spans: np.ndarray
+    pair_offsets: np.ndarray
+    # Item: has pairs; item with pairs: sorted positions of its middle pairs, sort offset
+    has_pairs: np.ndarray
+    pair_lowers: np.ndarray
+    pair_uppers: np.ndarray
+    median_offsets: np.ndarray
+
+    @classmethod
+    def of(cls, days: np.ndarray, groups: np.ndarray, weekdays: np.ndarray, months: np.ndarray, item_count: int) -> Self:
+        """Return the layout of rows on DAYS, WEEKDAYS and MONTHS of GROUPS, numbered items."""
+
+        days = days.astype(np.float64)
+        counts = np.bincount(groups, minlength=item_count)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            centered_days = days - np.repeat(_item_sums(days, counts) / counts, counts)
+        weekday_groups = (groups * 7) + weekdays
+        month_groups = (groups * 12) + months
+
+        halves = counts // 2
+        pair_groups = np.repeat(np.arange(item_count), halves)
+        pair_firsts = np.repeat((np.cumsum(counts) - counts) - (np.cumsum(halves) - halves), halves) + np.arange(halves.sum())
+        pair_seconds = pair_firsts + halves[pair_groups]
+        spanned = days[pair_seconds] > days[pair_firsts]
+        pair_groups, pair_firsts, pair_seconds = pair_groups[spanned], pair_firsts[spanned], pair_seconds[spanned]
+        pair_counts = np.bincount(pair_groups, minlength=item_count)
+        pair_starts = np.cumsum(pair_counts) - pair_counts
+        has_pairs = pair_counts > 0
+
+        return cls(
+            item_count, groups, weekday_groups, month_groups, days, centered_days, counts,
+            _item_sums(centered_days ** 2, counts),
+            np.bincount(weekday_groups, minlength=item_count * 7).reshape(item_count, 7),
+            np.bincount(month_groups, minlength=item_count * 12).reshape(item_count, 12),
+            pair_firsts, pair_seconds, days[pair_seconds] - days[pair_firsts], pair_groups * 4.0,
+            has_pairs,
+            (pair_starts + ((pair_counts - 1) // 2))[has_pairs],
+            (pair_starts + (pair_counts // 2))[has_pairs],
+            np.flatnonzero(has_pairs) * 4.0)
+
+    def subset(self, rows: np.ndarray) -> Self:
+        """Return the layout of just ROWS, a boolean mask."""
+
+        return _RowLayout.of(self.days[rows], self.groups[rows], self.weekday_groups[rows] % 7, self.month_groups[rows] % 12, self.item_count)
+
+def _series_trends(values: np.ndarray, layout: _RowLayout, last_months: np.ndarray, min_days: int) -> Tuple[List[np.ndarray], np.ndarray, np.ndarray]:
+    """Return (TREND_STATISTICS columns, weekday profiles, annual profiles) of one log series over LAYOUT's rows.
+
+    Rows where VALUES aren't finite are left out.
+    """
+
+    known = np.isfinite(values)
+    if not known.all():
+        values, layout = values[known], layout.subset(known)
+    item_count = layout.item_count
+    enough = layout.counts >= max(min_days, 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Least squares on centered days, per item
+        means = _item_sums(values, layout.counts) / layout.counts
+        slopes = _item_sums(layout.centered_days * values, layout.counts) / layout.centered_days_squares
+        residuals = values - np.repeat(means, layout.counts) - (np.repeat(slopes, layout.counts) * layout.centered_days)
+
+        weekday_sums = np.bincount(layout.weekday_groups, residuals, item_count * 7).reshape(item_count, 7)
+        weekday_profiles = weekday_sums / layout.weekday_counts
+        weekend_effect = np.expm1((weekday_sums[:, 5:].sum(axis=1) / layout.weekday_counts[:, 5:].sum(axis=1)) - (weekday_sums[:, :5].sum(axis=1) / layout.weekday_counts[:, :5].sum(axis=1)))
+        annual_profiles = np.bincount(layout.month_groups, residuals, item_count * 12).reshape(item_count, 12) / layout.month_counts
+        seasonal_amplitude = np.expm1(np.fmax.reduce(annual_profiles, axis=1) - np.fmin.reduce(annual_profiles, axis=1))
+        month_effect = np.expm1(annual_profiles[np.arange(item_count), last_months])
+
+        statistics = [
+            np.expm1(slopes * DAYS_PER_YEAR),
+            np.expm1(_robust_slopes(values, layout) * DAYS_PER_YEAR),
+            weekend_effect,
+            seasonal_amplitude,
+            month_effect,
+        ]
+
+    return [np.where(enough, statistic, np.nan) for statistic in statistics], np.where(enough[:, np.newaxis], weekday_profiles, np.nan), np.where(enough[:, np.newaxis], annual_profiles, np.nan)
+
+def _item_sums(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Return the sums of VALUES in back-to-back segments of COUNTS rows each."""
+
+    sums = np.zeros(len(counts))
+    nonempty = counts > 0
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(values, (np.cumsum(counts) - counts)[nonempty])
+
+    return sums
+
+def _robust_slopes(values: np.ndarray, layout: _RowLayout) -> np.ndarray:
+    """Return each item's median slope of VALUES between LAYOUT's pairs of days."""
+
+    keys = np.sort(np.arctan((values[layout.pair_seconds] - values[layout.pair_firsts]) / layout.pair_spans) + layout.pair_offsets)
+    medians = np.full(layout.item_count, np.nan)
+    medians[layout.has_pairs] = (np.tan(keys[layout.pair_lowers] - layout.median_offsets) + np.tan(keys[layout.pair_uppers] - layout.median_offsets)) / 2
+
+    return medians
+
+class TrendCache():
+    """Trends of items in a HistoryStore, recomputed only for items with new days.
+
+    Each item's row of every TrendReport table is kept with the timestamp of
+    the latest day it was computed from. Save it between sessions with
+    `save` and `load`.
+    """
+
+    def __init__(self, min_days: int = 56):
+        """Initialize an empty cache of trends of items with at least MIN_DAYS days."""
+
+        self.min_days = min_days
+        # Item id: (latest timestamp, table row, weekday profiles, annual profiles)
+        self._entries: Dict[int, Tuple[int, tuple, Dict[str, np.ndarray], Dict[str, np.ndarray]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return number of cached items."""
+
+        return len(self._entries)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Self]:
+        """Return a cache saved at PATH, or None if there is none."""
+
+        try:
+            with open(path, "rb") as file:
+                cache = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError) as e:
+            logger.error(f"Ignoring unreadable trend cache '{path}': {e}")
+            return None
+
+        if not isinstance(cache, cls):
+            logger.error(f"Ignoring trend cache '{path}': not a {cls.__name__}")
+            return None
+
+        return cache
+
+    def save(self, path: str) -> None:
+        """Save the cache to PATH."""
+
+        with open(path, "wb") as file:
+            pickle.dump(self, file)
+
+    def trends(self, history_store: HistoryStore, items: List[Item]) -> TrendReport:
+        """Return trends of ITEMS over their whole history in HISTORY_STORE; items it doesn't hold get NaN."""
+
+        last_timestamps = [history_store.last_timestamp(item.id) for item in items]
+        stale = [index for index, (item, last_timestamp) in enumerate(zip(items, last_timestamps)) if last_timestamp is not None and self._entries.get(item.id, (None,))[0] != last_timestamp]
+        self.hits += len(items) - len(stale)
+        self.misses += len(stale)
+
+        if stale:
+            history, lengths = history_store.rows([items[index] for index in stale], TREND_HISTORY_COLUMNS)
+            report = analyze_trends(history, lengths, self.min_days)
+            report.table["item_id"] = [items[index].id for index in stale]
+            for row, (index, values) in enumerate(zip(stale, report.table.itertuples(index=False, name=None))):
+                self._entries[items[index].id] = (
+                    last_timestamps[index],
+                    values,
+                    {series: profiles[row] for series, profiles in report.weekday_profiles.items()},
+                    {series: profiles[row] for series, profiles in report.annual_profiles.items()})
+            logger.debug(f"Computed trends of {len(stale)} of {len(items)} items")
+
+        entries = [self._entries[item.id] if last_timestamp is not None else _unknown_trends(item) for item, last_timestamp in zip(items, last_timestamps)]
+
+        return TrendReport(
+            pd.DataFrame([entry[1] for entry in entries], columns=TREND_COLUMNS),
+            {series: np.array([entry[2][series] for entry in entries]).reshape(len(items), 7) for series in SERIES},
+            {series: np.array([entry[3][series] for entry in entries]).reshape(len(items), 12) for series in SERIES})
+
+def _unknown_trends(item: Item) -> Tuple[None, tuple, Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Return a `TrendCache` entry of ITEM without history."""
+
+    return (
+        None,
+        (item.id, 0) + ((np.nan,) * (len(TREND_COLUMNS) - 2)),
+        {series: np.full(7, np.nan) for series in SERIES},
+        {series: np.full(12, np.nan) for series in SERIES})
+
+def add_trends(flips: pd.DataFrame, trends: pd.DataFrame) -> pd.DataFrame:
+    """Return FLIPS, a DailyFlipReport table, with the TREND_COLUMNS of their items from TRENDS."""
+
+    return flips.merge(trends, on="item_id", how="left")